@@ -0,0 +1,122 @@
+"""
+Benchmark đọc file bài viết JSONL: peak RSS khi nạp cả file vào list (cách `load_articles` cũ)
+so với duyệt streaming (`iter_articles`), và thời gian tra ngẫu nhiên qua index offset (`ArticleFile`).
+
+Mỗi cách đọc chạy trong một tiến trình con riêng để đo peak RSS độc lập.
+
+Ví dụ:
+    python src/benchmarks/bench_article_stream.py --articles 20000 --text-size 20000
+"""
+
+import argparse
+import json
+import random
+import resource
+import sys
+import tempfile
+import time
+from multiprocessing import get_context
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.article_jsonl import ArticleFile, iter_article_offsets, iter_articles
+
+MODES = ("list", "stream")
+
+
+def make_synthetic_articles(path: Path, count: int, text_size: int, seed: int = 0):
+    rng = random.Random(seed)
+    words = ["vua", "triều", "Nguyễn", "[[Huế]]", "{{Infobox}}", "năm", "chiến", "tranh"]
+    with open(path, "w", encoding="utf-8") as out:
+        for page_id in range(1, count + 1):
+            size = rng.randint(text_size // 2, text_size * 3 // 2)
+            text = " ".join(rng.choice(words) for _ in range(size // 5))
+            out.write(json.dumps({"title": f"Bài {page_id}", "page_id": page_id, "wikitext": text},
+                                 ensure_ascii=False) + "\n")
+
+
+def load_articles_list(path: Path):
+    """Bản cũ: nạp toàn bộ file vào list."""
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except Exception:
+                continue
+    return items
+
+
+def run_mode(mode: str, path: str, queue):
+    start = time.perf_counter()
+    articles = load_articles_list(Path(path)) if mode == "list" else iter_articles(Path(path))
+    count = chars = 0
+    for art in articles:
+        count += 1
+        chars += len(art.get("wikitext", ""))
+    elapsed = time.perf_counter() - start
+    # Linux: ru_maxrss tính bằng KB
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    queue.put({"mode": mode, "count": count, "chars": chars, "seconds": elapsed, "peak_rss_mb": peak_mb})
+
+
+def bench_random_access(path: Path, lookups: int):
+    start = time.perf_counter()
+    store = ArticleFile(path)
+    build_seconds = time.perf_counter() - start
+    all_titles = [title for title, _, _, _ in iter_article_offsets(path)]
+    titles = random.Random(1).sample(all_titles, min(lookups, len(all_titles)))
+    start = time.perf_counter()
+    for title in titles:
+        art = store.get(title)
+        assert art is not None and art["title"] == title
+    lookup_seconds = time.perf_counter() - start
+    store.close()
+    return build_seconds, len(titles), lookup_seconds
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark đọc JSONL bài viết: list vs streaming + index offset.")
+    parser.add_argument("--articles", type=int, default=5000, help="Số bài của file tổng hợp")
+    parser.add_argument("--text-size", type=int, default=20000, help="Độ dài wikitext trung bình (ký tự)")
+    parser.add_argument("--input", default=None, help="Dùng file JSONL có sẵn thay vì sinh file tổng hợp")
+    parser.add_argument("--lookups", type=int, default=1000, help="Số lần tra ngẫu nhiên theo title")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    ctx = get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.input:
+            # Chép sang thư mục tạm để index sidecar không nằm cạnh file dữ liệu thật
+            path = Path(tmp) / Path(args.input).name
+            path.write_bytes(Path(args.input).read_bytes())
+        else:
+            path = Path(tmp) / "articles.jsonl"
+            print(f"⚙️ Sinh {args.articles} bài tổng hợp...")
+            make_synthetic_articles(path, args.articles, args.text_size)
+        print(f"ℹ️ File: {path.stat().st_size / 1024 / 1024:.1f} MB\n")
+
+        results = []
+        for mode in MODES:
+            queue = ctx.Queue()
+            proc = ctx.Process(target=run_mode, args=(mode, str(path), queue))
+            proc.start()
+            results.append(queue.get())
+            proc.join()
+
+        build_seconds, lookups, lookup_seconds = bench_random_access(path, args.lookups)
+
+    print(f"{'mode':<10}{'số bài':>10}{'giây':>9}{'peak RSS (MB)':>16}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['count']:>10}{r['seconds']:>9.2f}{r['peak_rss_mb']:>16.1f}")
+    print(f"\nIndex offset: dựng {build_seconds:.2f}s, {lookups} lần tra theo title "
+          f"{lookup_seconds * 1e6 / max(lookups, 1):.0f} µs/lần")
+    if len({(r["count"], r["chars"]) for r in results}) > 1:
+        print("❌ Các cách đọc cho kết quả khác nhau!")
+        sys.exit(1)
+    print("✅ Các cách đọc cho cùng kết quả.")
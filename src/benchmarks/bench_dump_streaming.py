@@ -0,0 +1,128 @@
+"""
+Benchmark đọc tuần tự dump XML: peak RSS và số trang/giây trên một dump tổng hợp.
+
+So sánh 3 cách đọc (mỗi cách chạy trong một tiến trình con riêng để đo peak RSS độc lập):
+- iterparse : ET.iterparse chỉ clear() thẻ <page> (cách cũ của create_seed_list_from_xml,
+              thẻ gốc vẫn giữ các phần tử con rỗng => bộ nhớ tăng theo số trang)
+- iterparse_root : ET.iterparse + xóa các phần tử đã xử lý khỏi thẻ gốc
+- stream    : common.xml_dump.stream_pages (expat, bỏ qua sớm ns != 0 và trang đổi hướng)
+
+Ví dụ:
+    python src/benchmarks/bench_dump_streaming.py --pages 200000 --text-size 2000
+"""
+
+import argparse
+import random
+import resource
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from multiprocessing import get_context
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.xml_dump import stream_pages
+
+NS = "{http://www.mediawiki.org/xml/export-0.10/}"
+MODES = ("iterparse", "iterparse_root", "stream")
+
+
+def make_synthetic_dump(path: Path, pages: int, text_size: int, seed: int = 0):
+    """Dump giả lập: ~1/3 trang khác namespace 0, ~1/8 là trang đổi hướng."""
+    rng = random.Random(seed)
+    words = ["vua", "triều", "Nguyễn", "[[Huế]]", "{{Infobox}}", "năm", "&amp;", "chiến", "tranh"]
+    with open(path, "w", encoding="utf-8") as out:
+        out.write('<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/" version="0.10">\n')
+        for page_id in range(1, pages + 1):
+            ns = rng.choice((0, 0, 0, 0, 1, 2, 4, 10, 14))
+            redirect = ns == 0 and rng.random() < 0.125
+            out.write(f"  <page>\n    <title>Trang {page_id}</title>\n    <ns>{ns}</ns>\n    <id>{page_id}</id>\n")
+            if redirect:
+                out.write(f'    <redirect title="Trang {page_id + 1}" />\n')
+                text = f"#REDIRECT [[Trang {page_id + 1}]]"
+            else:
+                size = rng.randint(text_size // 2, text_size * 3 // 2)
+                text = " ".join(rng.choice(words) for _ in range(size // 5))
+            out.write(f"    <revision>\n      <id>{page_id * 10}</id>\n"
+                      f'      <text xml:space="preserve">{escape(text)}</text>\n    </revision>\n  </page>\n')
+        out.write("</mediawiki>\n")
+
+
+def scan_iterparse(dump_path: Path, clear_root: bool):
+    kept = chars = 0
+    context = ET.iterparse(str(dump_path), events=("start", "end"))
+    _, root = next(context)
+    for event, elem in context:
+        if event != "end" or elem.tag != f"{NS}page":
+            continue
+        if elem.findtext(f"{NS}ns") == "0" and elem.find(f"{NS}redirect") is None:
+            text = elem.findtext(f"{NS}revision/{NS}text") or ""
+            kept += 1
+            chars += len(text)
+        elem.clear()
+        if clear_root:
+            root.clear()
+    return kept, chars
+
+
+def scan_stream(dump_path: Path):
+    kept = chars = 0
+    for page in stream_pages(dump_path, namespaces=(0,), skip_redirects=True):
+        kept += 1
+        chars += len(page["wikitext"])
+    return kept, chars
+
+
+def run_mode(mode: str, dump_path: str, total_pages: int, queue):
+    start = time.perf_counter()
+    if mode == "stream":
+        kept, chars = scan_stream(Path(dump_path))
+    else:
+        kept, chars = scan_iterparse(Path(dump_path), clear_root=(mode == "iterparse_root"))
+    elapsed = time.perf_counter() - start
+    # Linux: ru_maxrss tính bằng KB
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    queue.put({"mode": mode, "kept": kept, "chars": chars, "seconds": elapsed,
+               "pages_per_sec": total_pages / elapsed if elapsed else 0.0, "peak_rss_mb": peak_mb})
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark đọc dump XML: peak RSS và pages/sec.")
+    parser.add_argument("--pages", type=int, default=100000, help="Số trang của dump tổng hợp")
+    parser.add_argument("--text-size", type=int, default=2000, help="Độ dài wikitext trung bình (ký tự)")
+    parser.add_argument("--dump", default=None, help="Dùng dump có sẵn thay vì sinh dump tổng hợp")
+    parser.add_argument("--modes", default=",".join(MODES))
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    ctx = get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.dump:
+            dump_path = Path(args.dump)
+            total_pages = sum(1 for _ in open(dump_path, "rb") if _.strip() == b"<page>")
+        else:
+            dump_path = Path(tmp) / "synthetic.xml"
+            print(f"⚙️ Sinh dump tổng hợp {args.pages} trang...")
+            make_synthetic_dump(dump_path, args.pages, args.text_size)
+            total_pages = args.pages
+        print(f"ℹ️ Dump: {dump_path.stat().st_size / 1024 / 1024:.1f} MB, {total_pages} trang\n")
+
+        results = []
+        for mode in args.modes.split(","):
+            queue = ctx.Queue()
+            proc = ctx.Process(target=run_mode, args=(mode, str(dump_path), total_pages, queue))
+            proc.start()
+            results.append(queue.get())
+            proc.join()
+
+    print(f"{'mode':<16}{'trang giữ':>10}{'giây':>9}{'trang/s':>12}{'peak RSS (MB)':>16}")
+    for r in results:
+        print(f"{r['mode']:<16}{r['kept']:>10}{r['seconds']:>9.2f}{r['pages_per_sec']:>12.0f}{r['peak_rss_mb']:>16.1f}")
+    if len({(r["kept"], r["chars"]) for r in results}) > 1:
+        print("❌ Các cách đọc cho kết quả khác nhau!")
+        sys.exit(1)
+    print("✅ Các cách đọc cho cùng kết quả.")
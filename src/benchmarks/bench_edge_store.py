@@ -0,0 +1,100 @@
+"""
+Benchmark bộ nhớ / thời gian của kho cạnh trong RelationRefiner: list dict + set tuple chuỗi
+(cách cũ) so với EdgeStore (id số nguyên + cột array), trên đồ thị tổng hợp gồm --edges cạnh
+thuận cộng với lượt sinh cạnh ngược. Mỗi cách chạy trong một tiến trình con riêng để đo peak RSS.
+
+Ví dụ:
+    python src/benchmarks/bench_edge_store.py --edges 1000000 --nodes 200000
+"""
+
+import argparse
+import random
+import resource
+import sys
+import time
+from multiprocessing import get_context
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from build_network.remake_edges import INVERSE_MAPPING, RELATION_WEIGHTS, RelationRefiner
+
+MODES = ("dicts", "edge_store")
+
+
+class LegacyEdges:
+    """Bản cũ: list dict + set (source, target, type), sinh cạnh ngược trên bản sao danh sách."""
+
+    def __init__(self):
+        self.final_edges = []
+        self.existing_edges_set = set()
+
+    def add_edge(self, source, target, rel_type, evidence):
+        edge_signature = (source, target, rel_type)
+        if edge_signature not in self.existing_edges_set:
+            self.final_edges.append({"source": source, "target": target, "type": rel_type, "evidence": evidence})
+            self.existing_edges_set.add(edge_signature)
+
+    def generate_inverse_edges(self):
+        for edge in list(self.final_edges):
+            inverse_type = INVERSE_MAPPING.get(edge["type"])
+            if inverse_type:
+                if inverse_type == "LÀ_CHA_HOẶC_MẸ_CỦA": inverse_type = "LÀ_CHA_CỦA"
+                self.add_edge(edge["target"], edge["source"], inverse_type,
+                              f"[SUY LUẬN] Từ việc {edge['source']} là {edge['type']} của {edge['target']}.")
+
+
+def synthetic_edges(num_edges, num_nodes, seed=0):
+    """Sinh cạnh (source, target, type, evidence); evidence dùng lại từ một tập câu hữu hạn như dữ liệu thật."""
+    rng = random.Random(seed)
+    # Tên node được tạo mới cho mỗi cạnh (giống chuỗi đọc từ CSV / API, không dùng chung object)
+    types = list(RELATION_WEIGHTS)
+    sentences = [f"Câu bằng chứng số {i} nói về quan hệ giữa hai nhân vật trong lịch sử triều Nguyễn." for i in range(num_edges // 4)]
+    for _ in range(num_edges):
+        yield (f"Nhân vật {rng.randrange(num_nodes)}", f"Nhân vật {rng.randrange(num_nodes)}",
+               rng.choice(types), rng.choice(sentences))
+
+
+def run_mode(mode, num_edges, num_nodes, queue):
+    start = time.perf_counter()
+    if mode == "dicts":
+        store = LegacyEdges()
+    else:
+        store = RelationRefiner()
+    for source, target, rel_type, evidence in synthetic_edges(num_edges, num_nodes):
+        store.add_edge(source, target, rel_type, evidence)
+    if mode == "dicts":
+        store.generate_inverse_edges()
+        total = len(store.final_edges)
+    else:
+        store.generate_inverse_edges()
+        total = len(store.edges)
+    elapsed = time.perf_counter() - start
+    queue.put({"mode": mode, "edges": total, "seconds": elapsed,
+               "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024})
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark kho cạnh: list dict vs EdgeStore.")
+    parser.add_argument("--edges", type=int, default=1000000)
+    parser.add_argument("--nodes", type=int, default=200000)
+    parser.add_argument("--modes", default=",".join(MODES))
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    ctx = get_context("spawn")
+    results = []
+    for mode in args.modes.split(","):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=run_mode, args=(mode, args.edges, args.nodes, queue))
+        proc.start()
+        results.append(queue.get())
+        proc.join()
+
+    print(f"{'mode':<12}{'tổng cạnh':>12}{'giây':>9}{'peak RSS (MB)':>16}")
+    for r in results:
+        print(f"{r['mode']:<12}{r['edges']:>12}{r['seconds']:>9.2f}{r['peak_rss_mb']:>16.1f}")
+    if len({r["edges"] for r in results}) > 1:
+        print("❌ Số cạnh khác nhau giữa các cách!")
+        sys.exit(1)
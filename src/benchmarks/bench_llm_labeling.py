@@ -0,0 +1,102 @@
+"""
+Benchmark thông lượng gán nhãn quan hệ bằng LLM trên server giả lập (llm_stub_server.py):
+mỗi cặp một request, tuần tự (cách cũ của llm_re) so với BatchLabeler (gói nhiều cặp một prompt,
+nhiều request song song, token bucket, retry 429/5xx).
+
+Các cặp (subject, target, sentence) lấy từ final_relations.csv. Thoát với mã 1 nếu hai cách
+cho nhãn khác nhau (server giả lập gán nhãn chỉ theo câu nên kết quả phải trùng khớp).
+
+Ví dụ:
+    python src/benchmarks/bench_llm_labeling.py --pairs 500 --batch-size 20 --concurrency 8 --error-rate 0.05
+"""
+
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from benchmarks.llm_stub_server import start_stub_server
+from common.llm_labeling import BatchLabeler, OpenAIChatBackend, PairItem
+
+DEFAULT_RELATIONS = "data/processed/final_relations.csv"
+# Thời gian nghỉ sau mỗi call của vòng lặp cũ trong llm_re (RATE_LIMIT_DELAY)
+OLD_RATE_LIMIT_DELAY = 0.5
+
+
+def load_pairs(path: str, limit: int):
+    pairs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            pairs.append(PairItem(row["source"], row["target"], row["evidence"]))
+            if len(pairs) >= limit:
+                break
+    return pairs
+
+
+def run_labeler(base_url: str, pairs, **kwargs):
+    labeler = BatchLabeler(OpenAIChatBackend("", "stub", base_url=base_url), backoff_base=0.05, **kwargs)
+    labels = [None] * len(pairs)
+
+    def on_result(index, item, label):
+        labels[index] = label
+
+    start = time.perf_counter()
+    stats = labeler.run(pairs, on_result)
+    return labels, time.perf_counter() - start, stats
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark gán nhãn LLM: từng cặp tuần tự vs theo lô song song.")
+    parser.add_argument("--relations", default=DEFAULT_RELATIONS, help="CSV source,target,type,evidence")
+    parser.add_argument("--pairs", type=int, default=200, help="Số cặp cần gán nhãn")
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rpm", type=float, default=0, help="Giới hạn request / phút phía client (0 = không)")
+    parser.add_argument("--latency", type=float, default=0.1, help="Độ trễ mỗi request của server giả lập (giây)")
+    parser.add_argument("--per-item", type=float, default=0.005, help="Độ trễ thêm cho mỗi cặp (giây)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Tỉ lệ lỗi 500 của server giả lập")
+    parser.add_argument("--server-rpm", type=int, default=0, help="Server trả 429 khi vượt số request / phút")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    pairs = load_pairs(args.relations, args.pairs)
+    if not pairs:
+        print(f"❌ Không có cặp nào trong '{args.relations}'.")
+        sys.exit(1)
+    server, state, base_url = start_stub_server(latency=args.latency, per_item=args.per_item,
+                                                rpm=args.server_rpm, error_rate=args.error_rate)
+    print(f"ℹ️ {len(pairs)} cặp, stub server {base_url} (latency {args.latency}s, lỗi {args.error_rate:.0%})\n")
+
+    results = {}
+    modes = [
+        ("từng cặp", dict(batch_size=1, concurrency=1)),
+        ("theo lô", dict(batch_size=args.batch_size, concurrency=args.concurrency, requests_per_minute=args.rpm)),
+    ]
+    for name, kwargs in modes:
+        results[name] = run_labeler(base_url, pairs, **kwargs)
+    server.shutdown()
+
+    print(f"{'cách':<10}{'giây':>9}{'cặp/giây':>11}{'request':>10}{'retry':>8}{'lô lỗi':>9}")
+    for name, (_, seconds, stats) in results.items():
+        print(f"{name:<10}{seconds:>9.2f}{len(pairs) / seconds:>11.1f}{stats['requests']:>10}"
+              f"{stats['retries']:>8}{stats['failed_batches']:>9}")
+    serial_seconds = results["từng cặp"][1]
+    batched_seconds = results["theo lô"][1]
+    print(f"\n⚙️ Tăng tốc: x{serial_seconds / batched_seconds:.1f} "
+          f"(x{(serial_seconds + OLD_RATE_LIMIT_DELAY * len(pairs)) / batched_seconds:.1f} "
+          f"nếu tính cả sleep {OLD_RATE_LIMIT_DELAY}s / call của vòng lặp cũ)")
+    print(f"ℹ️ Server: {state.stats}")
+
+    serial_labels, batched_labels = results["từng cặp"][0], results["theo lô"][0]
+    if any(stats["failed_batches"] for _, _, stats in results.values()):
+        print("⚠️ Có lô hết lượt retry, bỏ qua so sánh nhãn.")
+    elif serial_labels != batched_labels:
+        diff = sum(1 for a, b in zip(serial_labels, batched_labels) if a != b)
+        print(f"❌ {diff} cặp nhận nhãn khác nhau!")
+        sys.exit(1)
+    else:
+        print("✅ Hai cách cho cùng nhãn.")
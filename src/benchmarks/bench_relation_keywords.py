@@ -0,0 +1,72 @@
+"""
+Benchmark phân loại quan hệ theo từ khóa của RelationRefiner: vòng lặp `kw in câu` cũ
+so với automaton Aho-Corasick (build_relation_automaton), trên các câu evidence của
+final_relations.csv (nhân lên --repeat lần để đạt quy mô lớn hơn).
+
+Ví dụ:
+    python src/benchmarks/bench_relation_keywords.py --repeat 5
+"""
+
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from build_network.remake_edges import RELATION_RULES, RELATION_WEIGHTS, RelationRefiner
+
+DEFAULT_INPUT = "data/processed/final_relations.csv"
+
+
+def analyze_sentence_context_loop(context_sentence):
+    """Bản cũ: với mỗi loại, thử từng từ khóa bằng `in`."""
+    context_lower = context_sentence.lower()
+    found_types = []
+    for rel_type, keywords in RELATION_RULES.items():
+        for kw in keywords:
+            if kw in context_lower:
+                found_types.append(rel_type)
+                break
+    if not found_types:
+        return "LIÊN_KẾT_TỚI"
+    return max(found_types, key=lambda t: RELATION_WEIGHTS.get(t, 1))
+
+
+def load_sentences(path: Path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [row["evidence"] for row in csv.DictReader(f) if row.get("evidence")]
+
+
+def timed(fn, sentences):
+    start = time.perf_counter()
+    results = [fn(s) for s in sentences]
+    return results, time.perf_counter() - start
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark phân loại quan hệ: vòng lặp từ khóa vs Aho-Corasick.")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="CSV có cột evidence (mặc định final_relations.csv)")
+    parser.add_argument("--repeat", type=int, default=3, help="Nhân bản tập câu bao nhiêu lần")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    sentences = load_sentences(Path(args.input)) * args.repeat
+    print(f"ℹ️ {len(sentences)} câu, {sum(len(v) for v in RELATION_RULES.values())} từ khóa / {len(RELATION_RULES)} loại\n")
+
+    refiner = RelationRefiner()
+    old, t_old = timed(analyze_sentence_context_loop, sentences)
+    new, t_new = timed(refiner.analyze_sentence_context, sentences)
+
+    print(f"{'cách':<16}{'giây':>9}{'câu/s':>12}")
+    print(f"{'vòng lặp cũ':<16}{t_old:>9.2f}{len(sentences) / t_old:>12.0f}")
+    print(f"{'aho-corasick':<16}{t_new:>9.2f}{len(sentences) / t_new:>12.0f}")
+    print(f"⚙️ Tăng tốc: x{t_old / t_new:.2f}")
+
+    diff = sum(1 for a, b in zip(old, new) if a != b)
+    if diff:
+        print(f"❌ {diff} câu cho kết quả khác nhau!")
+        sys.exit(1)
+    print("✅ Hai cách cho cùng loại quan hệ trên mọi câu.")
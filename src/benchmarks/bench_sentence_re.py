@@ -0,0 +1,107 @@
+"""
+Kiểm tra hồi quy + benchmark thông lượng cho sentence_re: quét từng câu với mọi title
+(cách cũ, O(số câu × số node)) so với chỉ mục ứng viên theo câu (sentence_candidates).
+
+Chạy trên articles_raw_wikitext.filtered.jsonl nếu có; nếu không, dựng bài tổng hợp từ các câu
+evidence của final_relations.csv. Thoát với mã 1 nếu hai cách cho quan hệ khác nhau.
+
+Ví dụ:
+    python src/benchmarks/bench_sentence_re.py --repeat 3
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import mwparserfromhell
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.article_jsonl import iter_articles
+from common.sentences import iter_sentences, sentence_spans
+from enrich.sentence_re import ARTICLES_IN, build_target_matcher, classify_relation, sentence_candidates
+
+DEFAULT_NODES = "data/processed/network_nodes_full.filtered.json"
+FALLBACK_RELATIONS = "data/processed/final_relations.csv"
+
+
+def sentence_candidates_scan(plain_text, src_title, title_lookup):
+    """Bản cũ của sentence_re.main: với mỗi câu, thử mọi title."""
+    for sent in iter_sentences(plain_text):
+        sent_low = sent.lower()
+        matched_targets = [
+            tgt_title for tgt_low, tgt_title in title_lookup.items()
+            if tgt_title != src_title and tgt_low in sent_low and len(tgt_low) >= 4
+        ]
+        if matched_targets:
+            yield sent, matched_targets
+
+
+def synthetic_articles(path):
+    texts = defaultdict(list)
+    with open(path, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            texts[row["source"]].append(row["evidence"])
+    return [{"title": title, "wikitext": " ".join(sents)} for title, sents in texts.items()]
+
+
+def extract(articles, candidates):
+    """Chạy phần trích quan hệ của sentence_re với hàm tìm ứng viên `candidates`."""
+    relations = []
+    for art in articles:
+        for sent, matched_targets in candidates(art["plain_text"], art["title"]):
+            rel_type = classify_relation(sent)
+            relations.extend((art["title"], tgt, rel_type) for tgt in matched_targets)
+    return relations
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Hồi quy + benchmark chỉ mục ứng viên theo câu của sentence_re.")
+    parser.add_argument("--articles", default=None, help="JSONL {title, wikitext} (mặc định ARTICLES_IN)")
+    parser.add_argument("--nodes", default=DEFAULT_NODES)
+    parser.add_argument("--repeat", type=int, default=1, help="Nhân bản tập bài bao nhiêu lần")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    articles_path = Path(args.articles) if args.articles else ARTICLES_IN
+    if articles_path.exists():
+        articles = list(iter_articles(articles_path))
+    else:
+        print(f"ℹ️ Không có '{articles_path}', dùng bài tổng hợp từ {FALLBACK_RELATIONS}")
+        articles = synthetic_articles(FALLBACK_RELATIONS)
+    nodes = json.load(open(args.nodes, "r", encoding="utf-8"))
+    title_lookup = {}
+    for n in nodes:
+        if n.get("title"):
+            title_lookup[n["title"].lower()] = n["title"]
+
+    # strip_code giống nhau ở hai cách => làm trước, không tính vào thời gian
+    articles = [{"title": a["title"], "plain_text": mwparserfromhell.parse(a["wikitext"]).strip_code()}
+                for a in articles if a.get("title") and a.get("wikitext")] * args.repeat
+    sentences = sum(len(sentence_spans(a["plain_text"])) for a in articles)
+    print(f"ℹ️ {len(articles)} bài, {sentences} câu, {len(title_lookup)} node\n")
+
+    start = time.perf_counter()
+    old = extract(articles, lambda text, src: sentence_candidates_scan(text, src, title_lookup))
+    t_old = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matcher, targets = build_target_matcher(title_lookup)
+    new = extract(articles, lambda text, src: sentence_candidates(text, src, matcher, targets))
+    t_new = time.perf_counter() - start
+
+    print(f"{'cách':<20}{'giây':>9}{'câu/s':>12}")
+    print(f"{'quét câu × title':<20}{t_old:>9.2f}{sentences / t_old:>12.0f}")
+    print(f"{'chỉ mục theo câu':<20}{t_new:>9.2f}{sentences / t_new:>12.0f}")
+    print(f"⚙️ Tăng tốc: x{t_old / t_new:.2f}")
+
+    if old != new:
+        print(f"❌ Kết quả khác nhau: {len(old)} vs {len(new)} quan hệ "
+              f"({len(set(old) ^ set(new))} khác biệt)")
+        sys.exit(1)
+    print(f"✅ Cùng {len(new)} quan hệ (kể cả thứ tự).")
@@ -0,0 +1,174 @@
+"""
+Server giả lập endpoint OpenAI /v1/chat/completions để benchmark việc gán nhãn bằng LLM offline.
+
+- Đọc các dòng JSON {"id", "subject", "target", "sentence"} trong prompt (định dạng của
+  common/llm_labeling.build_batch_prompt) và trả về mảng [{"id", "label"}]; nhãn chỉ phụ thuộc
+  vào câu (luật từ khóa đơn giản) nên cùng một cặp luôn nhận cùng nhãn dù gửi theo lô nào.
+- Độ trễ giả lập = latency + per_item * số cặp trong prompt.
+- `rpm` > 0: vượt số request / phút => 429 kèm Retry-After; `error_rate`: tỉ lệ trả 500 ngẫu nhiên.
+
+Ví dụ:
+    python src/benchmarks/llm_stub_server.py --port 8765 --latency 0.3
+    python src/enrich/llm_re.py --base-url http://127.0.0.1:8765/v1
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+STUB_RULES = [
+    ("PHOI_NGAU", ("vợ", "chồng", "kết hôn")),
+    ("LA_CON_CUA", ("con trai", "con gái", "con của")),
+    ("DOI_DAU", ("đánh", "chống", "giao chiến")),
+    ("KE_NHIEM", ("kế vị", "nối ngôi")),
+]
+
+
+def stub_label(sentence: str) -> str:
+    low = sentence.lower()
+    for label, keywords in STUB_RULES:
+        if any(kw in low for kw in keywords):
+            return label
+    return "LIEN_KET"
+
+
+def prompt_items(prompt: str) -> List[Dict]:
+    items = []
+    for line in prompt.splitlines():
+        line = line.strip()
+        if not line.startswith('{"id"'):
+            continue
+        try:
+            items.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return items
+
+
+class StubState:
+    def __init__(self, latency: float, per_item: float, rpm: int, error_rate: float, seed: int = 0):
+        self.latency = latency
+        self.per_item = per_item
+        self.rpm = rpm
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.recent = deque()
+        self.stats = {"requests": 0, "rate_limited": 0, "errors": 0, "items": 0}
+
+    def admit(self) -> Tuple[int, float]:
+        """Trả về (HTTP status, Retry-After) cho một request mới."""
+        with self.lock:
+            self.stats["requests"] += 1
+            now = time.monotonic()
+            while self.recent and now - self.recent[0] >= 60:
+                self.recent.popleft()
+            if self.rpm and len(self.recent) >= self.rpm:
+                self.stats["rate_limited"] += 1
+                return 429, 60 - (now - self.recent[0])
+            if self.error_rate and self.rng.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return 500, 0.0
+            self.recent.append(now)
+            return 200, 0.0
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, data: Dict, headers: Dict = None):
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self._send_json(400, {"error": {"message": "invalid JSON"}})
+                return
+            if not self.path.endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+                return
+
+            status, retry_after = state.admit()
+            if status == 429:
+                self._send_json(429, {"error": {"message": "rate limited"}}, {"Retry-After": f"{retry_after:.2f}"})
+                return
+            if status != 200:
+                self._send_json(status, {"error": {"message": "stub server error"}})
+                return
+
+            content = (payload.get("messages") or [{}])[-1].get("content", "")
+            if isinstance(content, list):
+                content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+            items = prompt_items(content)
+            with state.lock:
+                state.stats["items"] += len(items)
+            time.sleep(state.latency + state.per_item * len(items))
+            if items:
+                answer = json.dumps([{"id": it["id"], "label": stub_label(it.get("sentence", ""))} for it in items],
+                                    ensure_ascii=False)
+            else:
+                answer = stub_label(content)
+            self._send_json(200, {
+                "id": "stub",
+                "object": "chat.completion",
+                "model": payload.get("model", "stub"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(content) // 3, "completion_tokens": len(answer) // 3},
+            })
+
+    return Handler
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, latency: float = 0.3, per_item: float = 0.01,
+                      rpm: int = 0, error_rate: float = 0.0):
+    """Chạy server trên thread nền; trả về (server, state, base_url). Dừng bằng server.shutdown()."""
+    state = StubState(latency, per_item, rpm, error_rate)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://{host}:{server.server_address[1]}/v1"
+    return server, state, base_url
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Server giả lập OpenAI chat/completions cho benchmark gán nhãn.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3, help="Độ trễ cố định mỗi request (giây)")
+    parser.add_argument("--per-item", type=float, default=0.01, help="Độ trễ thêm cho mỗi cặp trong prompt (giây)")
+    parser.add_argument("--rpm", type=int, default=0, help="Giới hạn request / phút (0 = không giới hạn)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Tỉ lệ trả lỗi 500 ngẫu nhiên")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server, state, base_url = start_stub_server(args.host, args.port, args.latency, args.per_item,
+                                                args.rpm, args.error_rate)
+    print(f"🚀 Stub LLM server tại {base_url} (Ctrl+C để dừng)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"\nℹ️ Thống kê: {state.stats}")
@@ -0,0 +1,82 @@
+"""
+Journal append-only (JSONL) cho DirectGraphCrawler, dùng để resume sau khi crash.
+
+Các bản ghi (mỗi dòng một JSON, trường "op"):
+- snapshot   : toàn bộ state sau khi nén journal (visited, valid_nodes, potential_edges, queue)
+- level      : bắt đầu một tầng BFS (depth, frontier)
+- page       : một trang của tầng đã fetch + parse (node được chấp nhận và các link/cạnh tìm được)
+- level_done : đã áp dụng xong mọi trang của tầng vào state
+
+Dòng cuối bị ghi dở khi crash được bỏ qua lúc đọc lại.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+
+class CrawlJournal:
+    def __init__(self, path: Path, compact_every: int = 2000):
+        self.path = Path(path)
+        self.compact_every = compact_every
+        self.records_since_compact = 0
+        self._f = None
+
+    def reset(self):
+        """Bắt đầu journal mới (xóa journal của lần chạy trước)."""
+        self.close()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path, "w", encoding="utf-8")
+        self.records_since_compact = 0
+
+    def open_for_append(self):
+        self.close()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path, "a", encoding="utf-8")
+
+    def exists(self) -> bool:
+        return self.path.exists() and self.path.stat().st_size > 0
+
+    def read(self) -> Iterator[Dict]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Dòng ghi dở lúc crash => dừng tại đây
+                    break
+
+    def append(self, record: Dict):
+        self._f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.records_since_compact += 1
+
+    def sync(self):
+        """Đẩy dữ liệu xuống đĩa (gọi sau mỗi batch)."""
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def should_compact(self) -> bool:
+        return self.records_since_compact >= self.compact_every
+
+    def compact(self, snapshot: Dict, tail: List[Dict] = ()):
+        """Ghi đè journal bằng một snapshot (+ các bản ghi còn dang dở), thay thế nguyên tử."""
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"op": "snapshot", **snapshot}, ensure_ascii=False) + "\n")
+            for record in tail:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.close()
+        os.replace(tmp_path, self.path)
+        self.open_for_append()
+        self.records_since_compact = 0
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
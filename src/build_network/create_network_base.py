@@ -4,6 +4,18 @@ import mwparserfromhell
 from collections import deque
 import time
 import csv
+import asyncio
+import threading
+import argparse
+from requests.adapters import HTTPAdapter
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.http_cache import CacheMiss, get_cache, get_json, print_stats
+from build_network.crawl_journal import CrawlJournal
+from common.xml_dump import DumpPageSource
+from common.bz2_dump import MultistreamDumpReader
 
 # --- 1. CẤU HÌNH ---
 SEED_NODES = [
@@ -21,6 +33,17 @@ HEADERS = {
 OUTPUT_NODES_FILE = "data/processed/nodes_metadata.json"
 OUTPUT_EDGES_FILE = "data/processed/initial_edges.csv"
 
+# Engine crawl: "serial" (tuần tự, mặc định) hoặc "async" (asyncio, nhiều request song song)
+CRAWL_ENGINE = "serial"
+# Số request tối đa đang chạy cùng lúc ở engine async (cũng là kích thước pool kết nối keep-alive)
+ASYNC_CONCURRENCY = 8
+# Số title tối đa trong một request (giới hạn của MediaWiki API cho prop=revisions&rvprop=content)
+BATCH_SIZE = 50
+
+# Journal append-only để resume khi crash (--resume); nén lại sau mỗi JOURNAL_COMPACT_EVERY bản ghi
+JOURNAL_FILE = "data/processed/crawl_journal.jsonl"
+JOURNAL_COMPACT_EVERY = 2000
+
 # --- 2. TỪ KHÓA LỌC ---
 VALID_STARTS = {
     # Họ phổ biến
@@ -38,12 +61,30 @@ PERSON_TEMPLATE_KEYWORDS = [
     "lãnh đạo", "quân sự", "tướng", "quan", "thần", "chức vụ"
 ]
 
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
 class DirectGraphCrawler:
-    def __init__(self):
+    def __init__(self, concurrency=ASYNC_CONCURRENCY, page_source=None):
+        self.concurrency = max(concurrency, 1)
+        # Nguồn trang thay cho API (vd. DumpPageSource đọc từ dump XML); None => gọi API
+        self.page_source = page_source
         self.visited = set()         
         self.valid_nodes = {}        
         self.potential_edges = []    
         self.queue = deque()         
+        self.depths = {}             # title (đã queue) -> depth, dùng khi refresh
+        self.api_calls = 0
+        self.stats_lock = threading.Lock()
+        self.journal = CrawlJournal(Path(JOURNAL_FILE), compact_every=JOURNAL_COMPACT_EVERY)
+
+        # Session dùng chung => tái sử dụng kết nối keep-alive thay vì mở TCP/TLS mới mỗi lần
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount("https://", adapter)
 
     def is_capitalized(self, title):
         if not title: return False
@@ -54,27 +95,83 @@ class DirectGraphCrawler:
         first_word = title.split()[0]
         return first_word in VALID_STARTS
 
-    def fetch_wikitext(self, title):
+    def fetch_wikitext_batch(self, titles):
+        """
+        Fetch wikitext cho tối đa BATCH_SIZE title trong một request (titles=A|B|...).
+        Trả về dict {title đã queue: raw_data}; các title bị API chuẩn hóa (normalized)
+        hoặc đổi hướng (redirects) được map ngược về đúng tên đã đưa vào hàng đợi.
+        """
+        if self.page_source is not None:
+            return self.page_source.fetch_wikitext_batch(titles)
+
         url = "https://vi.wikipedia.org/w/api.php"
         params = {
-            "action": "query", "prop": "revisions", "titles": title,
-            "rvprop": "content|ids", "rvslots": "main", "format": "json", "formatversion": 2
+            "action": "query", "prop": "revisions", "titles": "|".join(titles),
+            "rvprop": "content|ids", "rvslots": "main", "redirects": 1,
+            "format": "json", "formatversion": 2
         }
+        pages_by_title = {}
+        aliases = {}
         try:
-            resp = requests.get(url, params=params, headers=HEADERS, timeout=10).json()
-            if 'query' in resp and 'pages' in resp['query']:
-                page = resp['query']['pages'][0]
-                if 'missing' in page: return None
-                if 'revisions' not in page: return None
-                
-                return {
-                    "page_id": page['pageid'],
-                    "title": page['title'],
-                    "wikitext": page['revisions'][0]['slots']['main']['content']
-                }
+            cont = {}
+            while True:
+                resp = get_json(url, {**params, **cont}, timeout=30, session=self.session)
+                with self.stats_lock:
+                    self.api_calls += 1
+                query = resp.get('query', {})
+                for item in query.get('normalized', []) + query.get('redirects', []):
+                    aliases[item['from']] = item['to']
+                for page in query.get('pages', []):
+                    if 'missing' in page or 'invalid' in page: continue
+                    # Khi nội dung quá lớn, API trả trang chưa có revisions và đẩy sang lượt 'continue'
+                    if 'revisions' not in page: continue
+                    revision = page['revisions'][0]
+                    pages_by_title[page['title']] = {
+                        "page_id": page['pageid'],
+                        "title": page['title'],
+                        "lastrevid": revision.get('revid'),
+                        "wikitext": revision['slots']['main']['content']
+                    }
+                if 'continue' not in resp: break
+                cont = resp['continue']
+        except CacheMiss:
+            raise
         except Exception as e:
-            print(f"❌ Lỗi fetch '{title}': {e}")
-            return None
+            print(f"❌ Lỗi fetch batch {len(titles)} title ('{titles[0]}'...): {e}")
+
+        results = {}
+        for title in titles:
+            # Đi theo chuỗi normalized -> redirect (có chặn vòng lặp)
+            resolved, seen = title, set()
+            while resolved in aliases and resolved not in seen:
+                seen.add(resolved)
+                resolved = aliases[resolved]
+            if resolved in pages_by_title:
+                results[title] = pages_by_title[resolved]
+        return results
+
+    def fetch_wikitext(self, title):
+        return self.fetch_wikitext_batch([title]).get(title)
+
+    def fetch_revids(self, page_ids):
+        """
+        Hỏi revid mới nhất (prop=info, không kèm nội dung) cho danh sách page_id, BATCH_SIZE id/request.
+        Luôn gọi mạng, bỏ qua cache. Trả về {page_id: lastrevid}; trang đã bị xóa không có trong kết quả.
+        """
+        url = "https://vi.wikipedia.org/w/api.php"
+        revids = {}
+        for batch in chunked(list(page_ids), BATCH_SIZE):
+            params = {
+                "action": "query", "prop": "info", "pageids": "|".join(str(i) for i in batch),
+                "format": "json", "formatversion": 2
+            }
+            resp = get_json(url, params, timeout=30, session=self.session, use_cache=False)
+            with self.stats_lock:
+                self.api_calls += 1
+            for page in resp.get('query', {}).get('pages', []):
+                if 'missing' in page or 'lastrevid' not in page: continue
+                revids[page['pageid']] = page['lastrevid']
+        return revids
 
     def validate_and_parse_node(self, raw_data):
         title = raw_data['title']
@@ -127,61 +224,245 @@ class DirectGraphCrawler:
         else:
             return None
 
-    def run(self):
-        # 1. Khởi tạo
-        for seed in SEED_NODES:
-            self.queue.append((seed, 0))
+    def parse_page(self, current_title, depth, raw_data):
+        """
+        Validate + lọc link của một trang vừa fetch, không thay đổi state của crawler.
+        Trả về bản ghi 'page' {title, depth, node, links} (cũng là bản ghi được ghi vào journal).
+        """
+        node, links = None, []
+        # B. Validate & Parse
+        parsed_node = self.validate_and_parse_node(raw_data) if raw_data else None
 
-        print(f"--- BẮT ĐẦU CRAWL TỪ {len(SEED_NODES)} NODE HẠT GIỐNG ---")
+        if parsed_node:
+            node = {
+                "page_id": parsed_node['page_id'],
+                "title": parsed_node['title'],
+                "lastrevid": raw_data.get('lastrevid'),
+                "infobox": parsed_node['infobox']
+            }
+            if depth < MAX_DEPTH:
+                # D. Xử lý Links (sắp xếp để thứ tự duyệt ổn định giữa các lần chạy)
+                raw_links = parsed_node['raw_links']
+                potential_links = sorted(set([l for l in raw_links if self.is_capitalized(l)]))
+                # Chỉ đi vào link nếu nó có tiềm năng (Đúng họ/niên hiệu)
+                links = [l for l in potential_links if l != current_title and self.has_valid_start(l)]
 
-        while self.queue:
-            current_title, depth = self.queue.popleft()
-            
-            if depth > MAX_DEPTH: continue
-            if current_title in self.visited: continue
-            
-            print(f"Depth {depth}: Đang xử lý '{current_title}'...")
-            self.visited.add(current_title)
+        return {"op": "page", "title": current_title, "depth": depth, "node": node, "links": links}
 
-            # A. Fetch
-            raw_data = self.fetch_wikitext(current_title)
-            if not raw_data: continue
+    def apply_page(self, record):
+        """Lưu node + cạnh của một trang vào state, trả về các link cần đưa vào depth + 1."""
+        if not record['node']:
+            return []
 
-            # B. Validate & Parse
-            parsed_node = self.validate_and_parse_node(raw_data)
-            
-            if not parsed_node: 
+        # C. Lưu Node
+        current_title = record['title']
+        self.valid_nodes[current_title] = record['node']
+        self.depths[current_title] = record['depth']
+
+        next_links = []
+        for link in record['links']:
+            self.potential_edges.append({
+                "source": current_title,
+                "target": link,
+                "type": "LIÊN_KẾT_TỚI"
+            })
+            if link not in self.visited:
+                next_links.append(link)
+        return next_links
+
+    def apply_level(self, frontier, records):
+        """Áp dụng các trang của một tầng theo đúng thứ tự frontier => output ổn định giữa các engine."""
+        next_frontier = {}
+        for current_title in frontier:
+            record = records.get(current_title)
+            if not record: continue
+            for link in self.apply_page(record):
+                if link not in self.visited:
+                    next_frontier[link] = None
+        return list(next_frontier)
+
+    def _record_batch(self, depth, batch, pages, records):
+        for title in batch:
+            record = self.parse_page(title, depth, pages.get(title))
+            records[title] = record
+            self.journal.append(record)
+        self.journal.sync()
+
+    def snapshot(self):
+        return {
+            "visited": sorted(self.visited),
+            "valid_nodes": self.valid_nodes,
+            "depths": self.depths,
+            "potential_edges": self.potential_edges,
+            "queue": [[t, d] for t, d in self.queue],
+        }
+
+    def restore_from_journal(self):
+        """
+        Dựng lại visited / valid_nodes / potential_edges / queue từ journal.
+        Trả về (depth, frontier, records) của tầng đang làm dở, hoặc None.
+        """
+        pending = None
+        for record in self.journal.read():
+            op = record['op']
+            if op == 'snapshot':
+                self.visited = set(record['visited'])
+                self.valid_nodes = record['valid_nodes']
+                # Snapshot cũ / ghi dở có thể chưa có 'depths'
+                self.depths = record.get('depths', {})
+                self.potential_edges = record['potential_edges']
+                self.queue = deque((t, d) for t, d in record['queue'])
+                pending = None
+            elif op == 'level':
+                # Giống crawl_levels: chỉ bỏ các mục của tầng vừa bắt đầu, giữ mục ở các depth khác
+                # (sau refresh, queue có thể chứa link ở nhiều depth)
+                self.queue = deque((t, d) for t, d in self.queue if d != record['depth'])
+                self.visited.update(record['frontier'])
+                pending = (record['depth'], record['frontier'], {})
+            elif op == 'page' and pending:
+                pending[2][record['title']] = record
+            elif op == 'level_done' and pending:
+                depth, frontier, records = pending
+                self.queue.extend((link, depth + 1) for link in self.apply_level(frontier, records))
+                pending = None
+        return pending
+
+    def crawl_levels(self, fetch_level, resume=False):
+        """
+        BFS đồng bộ theo tầng: `fetch_level(titles, on_batch)` fetch frontier của một depth và gọi
+        on_batch(batch, {title: raw_data}) cho từng batch. Mỗi trang được parse và ghi journal ngay,
+        còn state chỉ được cập nhật khi cả tầng xong, theo đúng thứ tự frontier.
+        """
+        pending = None
+        if resume and self.journal.exists():
+            pending = self.restore_from_journal()
+            self.journal.open_for_append()
+            print(f"↻ Resume từ journal: {len(self.visited)} trang đã duyệt, {len(self.valid_nodes)} node.")
+        else:
+            self.journal.reset()
+            self.queue = deque((seed, 0) for seed in dict.fromkeys(SEED_NODES))
+
+        while pending or self.queue:
+            if pending:
+                depth, frontier, records = pending
+                pending = None
+            else:
+                depth = min(d for _, d in self.queue)
+                if depth > MAX_DEPTH: break
+                frontier = list(dict.fromkeys(t for t, d in self.queue if d == depth and t not in self.visited))
+                self.queue = deque((t, d) for t, d in self.queue if d != depth)
+                self.visited.update(frontier)
+                self.journal.append({"op": "level", "depth": depth, "frontier": frontier})
+                records = {}
+
+            todo = [t for t in frontier if t not in records]
+            print(f"Depth {depth}: Đang xử lý {len(todo)}/{len(frontier)} trang...")
+            fetch_level(todo, lambda batch, pages: self._record_batch(depth, batch, pages, records))
+
+            self.queue.extend((link, depth + 1) for link in self.apply_level(frontier, records))
+            self.journal.append({"op": "level_done", "depth": depth})
+            if self.journal.should_compact():
+                self.journal.compact(self.snapshot())
+            self.journal.sync()
+
+        self.journal.close()
+        print(f"ℹ️ Tổng số request API: {self.api_calls}")
+        print_stats()
+
+    def refresh(self, fetch_level):
+        """
+        Re-crawl tăng dần: dựng lại state từ journal của lần crawl trước, hỏi revid hàng loạt,
+        chỉ tải + parse lại các trang đã đổi, vá node/cạnh tại chỗ, rồi crawl tiếp các link mới
+        (cùng phần frontier còn trong queue nếu lần crawl trước dừng giữa hai tầng).
+        """
+        if self.page_source is not None:
+            print("❌ --refresh cần hỏi revid từ API, không dùng được với --dump.")
+            return False
+        if not self.journal.exists() or self.restore_from_journal():
+            print("❌ Không có journal của một lần crawl hoàn chỉnh (hãy chạy đầy đủ hoặc --resume trước).")
+            return False
+
+        print(f"--- REFRESH: kiểm tra revid của {len(self.valid_nodes)} node ---")
+        current = self.fetch_revids(n['page_id'] for n in self.valid_nodes.values())
+
+        deleted = [k for k, n in self.valid_nodes.items() if n['page_id'] not in current]
+        changed = [k for k, n in self.valid_nodes.items()
+                   if n['page_id'] in current and n.get('lastrevid') != current[n['page_id']]]
+        print(f"   > {len(changed)} trang thay đổi, {len(deleted)} trang đã bị xóa.")
+
+        # Bỏ response cũ trong HTTP cache của các trang đã đổi để fetch lấy bản mới
+        cache = get_cache()
+        if cache is not None and changed:
+            cache.invalidate_changed({self.valid_nodes[k]['title']: current[self.valid_nodes[k]['page_id']]
+                                      for k in changed})
+
+        records = {}
+
+        def on_batch(batch, pages):
+            for title in batch:
+                records[title] = self.parse_page(title, self.depths.get(title, MAX_DEPTH), pages.get(title))
+
+        fetch_level(changed, on_batch)
+
+        # Vá state: xóa node/cạnh cũ của trang đổi hoặc bị xóa, áp dụng lại bản parse mới
+        touched = set(changed) | set(deleted)
+        self.potential_edges = [e for e in self.potential_edges if e['source'] not in touched]
+        for key in deleted:
+            del self.valid_nodes[key]
+        # Giữ nguyên queue đã khôi phục: lần crawl trước có thể dừng giữa hai tầng (sau level_done,
+        # trước tầng kế tiếp) và frontier chưa duyệt vẫn nằm trong đó; link mới được nối thêm vào sau
+        new_links = 0
+        for key in changed:
+            record = records.get(key)
+            if not record or not record['node']:
+                self.valid_nodes.pop(key, None)
                 continue
+            for link in self.apply_page(record):
+                self.queue.append((link, record['depth'] + 1))
+                new_links += 1
 
-            # C. Lưu Node
-            self.valid_nodes[current_title] = {
-                "page_id": parsed_node['page_id'],
-                "title": parsed_node['title'],
-                "infobox": parsed_node['infobox']
-            }
+        pending_links = sum(1 for _, d in self.queue if d <= MAX_DEPTH)
+        print(f"   > {new_links} link mới, {pending_links} link (depth <= {MAX_DEPTH}) trong hàng đợi cần crawl.")
+        self.journal.compact(self.snapshot())
+        return True
 
-            if depth == MAX_DEPTH: continue
+    def _fetch_level_serial(self, titles, on_batch):
+        for batch in chunked(titles, BATCH_SIZE):
+            on_batch(batch, self.fetch_wikitext_batch(batch))
+            if self.page_source is None:
+                time.sleep(0.1)
 
-            # D. Xử lý Links
-            raw_links = parsed_node['raw_links']
-            potential_links = set([l for l in raw_links if self.is_capitalized(l)])
-            
-            for link in potential_links:
-                if link == current_title: continue
+    def run(self, resume=False, refresh=False):
+        if refresh:
+            if not self.refresh(self._fetch_level_serial): return
+            resume = True
+        print(f"--- BẮT ĐẦU CRAWL TỪ {len(SEED_NODES)} NODE HẠT GIỐNG ---")
+        self.crawl_levels(self._fetch_level_serial, resume=resume)
+        self.save_data()
 
-                # Chỉ đi vào link nếu nó có tiềm năng (Đúng họ/niên hiệu)
-                if self.has_valid_start(link):
-                    self.potential_edges.append({
-                        "source": current_title,
-                        "target": link,
-                        "type": "LIÊN_KẾT_TỚI"
-                    })
-
-                    if link not in self.visited:
-                        self.queue.append((link, depth + 1))
-            
-            time.sleep(0.1)
+    async def _fetch_level_async(self, titles, on_batch):
+        """Fetch song song các batch của một tầng BFS, tối đa `self.concurrency` request cùng lúc."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_one(batch):
+            async with semaphore:
+                pages = await asyncio.to_thread(self.fetch_wikitext_batch, batch)
+            # Chạy trên thread của event loop => ghi journal tuần tự, không cần khóa
+            on_batch(batch, pages)
 
+        await asyncio.gather(*(fetch_one(b) for b in chunked(titles, BATCH_SIZE)))
+
+    def run_async(self, resume=False, refresh=False):
+        """
+        Engine asyncio: duyệt BFS theo từng tầng, fetch các batch trong tầng song song
+        (giới hạn bởi `self.concurrency`) qua pool kết nối keep-alive của `self.session`.
+        """
+        fetch_level = lambda titles, on_batch: asyncio.run(self._fetch_level_async(titles, on_batch))
+        if refresh:
+            if not self.refresh(fetch_level): return
+            resume = True
+        print(f"--- BẮT ĐẦU CRAWL (ASYNC, concurrency={self.concurrency}) TỪ {len(SEED_NODES)} NODE HẠT GIỐNG ---")
+        self.crawl_levels(fetch_level, resume=resume)
         self.save_data()
 
     def save_data(self):
@@ -220,6 +501,30 @@ class DirectGraphCrawler:
         print(f"✅ Đã lưu {len(final_edges)} Edges vào '{OUTPUT_EDGES_FILE}'")
         print(f"   (Đã loại bỏ {rejected_count} cạnh rác)")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Crawl mạng quan hệ từ các node hạt giống.")
+    parser.add_argument("--engine", choices=["serial", "async"], default=CRAWL_ENGINE,
+                        help="Engine crawl: serial (tuần tự) hoặc async (song song có giới hạn).")
+    parser.add_argument("--concurrency", type=int, default=ASYNC_CONCURRENCY,
+                        help="Số request đồng thời tối đa cho engine async.")
+    parser.add_argument("--resume", action="store_true",
+                        help=f"Tiếp tục lần crawl bị gián đoạn từ journal ({JOURNAL_FILE}).")
+    parser.add_argument("--dump", default=None,
+                        help="Crawl offline từ dump: file XML đã giải nén (index title -> offset tạo ở lần đầu) "
+                             "hoặc *-multistream.xml.bz2 (đọc kèm *-multistream-index.txt.bz2).")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Re-crawl tăng dần: chỉ tải lại các trang có revid mới so với lần crawl trước.")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    crawler = DirectGraphCrawler()
-    crawler.run()
\ No newline at end of file
+    args = parse_args()
+    page_source = None
+    if args.dump:
+        dump_path = Path(args.dump)
+        page_source = MultistreamDumpReader(dump_path) if dump_path.suffix == ".bz2" else DumpPageSource(dump_path)
+    crawler = DirectGraphCrawler(concurrency=args.concurrency, page_source=page_source)
+    if args.engine == "async":
+        crawler.run_async(resume=args.resume, refresh=args.refresh)
+    else:
+        crawler.run(resume=args.resume, refresh=args.refresh)
\ No newline at end of file
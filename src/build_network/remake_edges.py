@@ -1,19 +1,49 @@
-import requests
 import json
 import csv
-import re
+import hashlib
+import os
 import time
-from collections import defaultdict
+import queue
+import threading
+import argparse
+from bisect import bisect_right
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from tqdm import tqdm
+import mwparserfromhell
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.aho_corasick import AhoCorasick
+from common.edge_store import EdgeStore
+from common.http_cache import CacheMiss, get_cache, get_json, print_stats
+from common.sentences import SEGMENTER_VERSION, sentence_spans
 
 # --- CẤU HÌNH ---
 INPUT_EDGES_FILE = "data/processed/initial_edges.csv"
 OUTPUT_FINAL_FILE = "data/processed/final_relations.csv"
+# Manifest cho chế độ --incremental: hash wikitext, danh sách target và phiên bản luật của từng nguồn
+MANIFEST_FILE = "data/processed/final_relations.manifest.json"
+INFERRED_PREFIX = "[SUY LUẬN]"
 
 HEADERS = {
     "User-Agent": "VietnameseHistoryNetwork/1.0 (Relation Refiner; contact: 22024527@vnu.edu.vn)"
 }
 
+# Chế độ pipeline (--pipeline)
+# Số title mỗi lượt gọi prop=revisions (giới hạn titles của API). Không dùng prop=extracts cho batch:
+# TextExtracts chỉ trả toàn văn 1 bài / request (trừ khi exintro), các bài còn lại bị đẩy sang 'continue'
+WIKITEXT_BATCH_SIZE = 50
+
+# Wikitext -> plaintext: link tới các namespace này (ảnh + chú thích ảnh, thể loại) không thuộc thân bài
+NON_TEXT_NAMESPACES = ("tập tin", "hình", "file", "image", "thể loại", "category")
+# Đổi khi cách chuyển wikitext -> plaintext đổi (manifest hash wikitext nên cần tính vào rules_version)
+PLAINTEXT_VERSION = "1"
+FETCH_WORKERS = 4
+SCORE_WORKERS = os.cpu_count() or 1
+PREFETCH_BATCHES = 8
+
 # --- 1. QUY TẮC TỪ KHÓA ---
 RELATION_RULES = {
     # =========================================================================
@@ -201,26 +231,150 @@ RELATION_WEIGHTS = {
     "LÀ_CON_CỦA": 8
 }
 
+def build_relation_automaton(rules):
+    """
+    Biên dịch RELATION_RULES thành một automaton Aho-Corasick duy nhất.
+    Trả về (automaton, {pattern_id: [các loại quan hệ chứa từ khóa đó]}); một từ khóa
+    có thể thuộc nhiều loại (vd. "cha là").
+    """
+    automaton = AhoCorasick(kw for keywords in rules.values() for kw in keywords)
+    keyword_types = defaultdict(list)
+    for rel_type, keywords in rules.items():
+        for kw in keywords:
+            types = keyword_types[automaton.pattern_id(kw)]
+            if rel_type not in types:
+                types.append(rel_type)
+    return automaton, dict(keyword_types)
+
+
+def json_hash(obj):
+    return hashlib.sha256(json.dumps(obj, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def rules_version():
+    """Đổi khi từ khóa / trọng số / cách tách câu đổi => mọi nguồn phải chấm điểm lại."""
+    return json_hash([RELATION_RULES, RELATION_WEIGHTS, SEGMENTER_VERSION, PLAINTEXT_VERSION])
+
+
+def inverse_version():
+    """Đổi khi INVERSE_MAPPING đổi => sinh lại toàn bộ quan hệ ngược (không cần chấm điểm lại)."""
+    return json_hash(INVERSE_MAPPING)
+
+
+def is_inferred(row):
+    """Cạnh do generate_inverse_edges sinh ra: evidence đúng mẫu "[SUY LUẬN] Từ việc {target} là ... của {source}." """
+    evidence = row['evidence']
+    return (evidence.startswith(f"{INFERRED_PREFIX} Từ việc {row['target']} là ")
+            and evidence.endswith(f" của {row['source']}."))
+
+
+def inferred_evidence(src, rel_type, tgt):
+    return f"{INFERRED_PREFIX} Từ việc {src} là {rel_type} của {tgt}."
+
+
+def content_hash(content):
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+
+def wikitext_to_plaintext(wikitext):
+    """
+    Plaintext thân bài: bỏ [[Tập tin:...]] / [[Hình:...]] (kèm tùy chọn, chú thích ảnh), [[Thể loại:...]]
+    và <gallery> rồi strip_code phần còn lại (CPU-bound => chạy ở tầng chấm điểm).
+    """
+    if not wikitext:
+        return ""
+    code = mwparserfromhell.parse(wikitext)
+    for link in code.filter_wikilinks():
+        namespace, sep, _ = str(link.title).partition(":")
+        if sep and namespace.strip().lower() in NON_TEXT_NAMESPACES:
+            try:
+                code.remove(link)
+            except ValueError:
+                pass  # nằm trong một link đã bị bỏ (vd. link trong chú thích ảnh)
+    for tag in code.filter_tags(matches=lambda node: str(node.tag).strip().lower() == "gallery"):
+        try:
+            code.remove(tag)
+        except ValueError:
+            pass
+    return code.strip_code().strip()
+
+
+RELATION_AUTOMATON, KEYWORD_TYPES = build_relation_automaton(RELATION_RULES)
+# Thứ tự khai báo trong RELATION_RULES, dùng để phá hòa khi hai loại cùng trọng số
+RELATION_ORDER = {rel_type: i for i, rel_type in enumerate(RELATION_RULES)}
+
+
+def score_batch(jobs):
+    """Chạy trong tiến trình con của run_pipelined: chấm điểm một batch [(source, targets, wikitext)]."""
+    refiner = RelationRefiner()
+    return [refiner.score_wikitext(source, targets, wikitext) for source, targets, wikitext in jobs]
+
+
 class RelationRefiner:
     def __init__(self):
         self.edges_map = defaultdict(list)
-        self.final_edges = []
-        # Key để khử trùng lặp: (Source, Target, Type)
+        # Kho cạnh gọn (id số nguyên + cột array); khử trùng lặp theo (Source, Target, Type)
         # Cho phép A->B (Cha) và A->B (Tiền nhiệm) cùng tồn tại vì Type khác nhau
-        self.existing_edges_set = set()
+        self.edges = EdgeStore(inferred_evidence=inferred_evidence)
         self.skipped_no_mention = 0 
-
-    def fetch_plaintext(self, title):
+        # {source: {content_hash, targets, rules_version, skipped}} => ghi ra MANIFEST_FILE
+        self.manifest_sources = {}
+
+    def fetch_wikitext(self, title):
+        return self.fetch_wikitext_batch([title]).get(title, "")
+
+    def fetch_wikitext_batch(self, titles):
+        """
+        Lấy wikitext của tối đa WIKITEXT_BATCH_SIZE trang trong một lượt gọi (prop=revisions trả nội dung
+        cho cả lô; bài quá lớn bị đẩy sang `continue`). Chỉ gọi mạng; chuyển sang plaintext ở `score_wikitext`.
+        Trả về {title yêu cầu: wikitext}; trang lỗi / không tồn tại => "".
+        """
         url = "https://vi.wikipedia.org/w/api.php"
-        params = { "action": "query", "format": "json", "titles": title, "prop": "extracts", "explaintext": 1 }
+        params = { "action": "query", "format": "json", "formatversion": 2, "titles": "|".join(titles),
+                   "prop": "revisions", "rvprop": "content|ids", "rvslots": "main" }
+        results = {t: "" for t in titles}
+        # title trả về (đã chuẩn hóa) -> title yêu cầu
+        aliases = {t: t for t in titles}
+        cont = {}
         try:
-            resp = requests.get(url, params=params, headers=HEADERS, timeout=10).json()
-            page = next(iter(resp['query']['pages'].values()))
-            return page.get("extract", "")
-        except: return ""
+            while True:
+                resp = get_json(url, {**params, **cont}, headers=HEADERS, timeout=30)
+                query = resp.get("query", {})
+                for item in query.get("normalized", []):
+                    aliases[item["to"]] = aliases.get(item["from"], item["from"])
+                for page in query.get("pages", []):
+                    requested = aliases.get(page.get("title"))
+                    if requested is None or "revisions" not in page:
+                        continue
+                    results[requested] = page["revisions"][0]["slots"]["main"]["content"]
+                if "continue" not in resp:
+                    break
+                cont = resp["continue"]
+        except CacheMiss: raise
+        except Exception as e:
+            print(f"  ! Lỗi gọi API cho batch {len(titles)} trang: {e}")
+        return results
+
+    def fetch_lastrevids(self, titles):
+        """
+        Hỏi revid mới nhất (prop=info, không kèm nội dung) của các trang, WIKITEXT_BATCH_SIZE title / request.
+        Luôn gọi mạng, bỏ qua cache. Trả về {title do API trả về: lastrevid}; trang không tồn tại bị bỏ qua.
+        """
+        url = "https://vi.wikipedia.org/w/api.php"
+        revids = {}
+        titles = list(titles)
+        for i in range(0, len(titles), WIKITEXT_BATCH_SIZE):
+            params = { "action": "query", "format": "json", "formatversion": 2, "prop": "info",
+                       "titles": "|".join(titles[i:i + WIKITEXT_BATCH_SIZE]) }
+            resp = get_json(url, params, headers=HEADERS, timeout=30, use_cache=False)
+            for page in resp.get("query", {}).get("pages", []):
+                if "missing" in page or "lastrevid" not in page: continue
+                revids[page["title"]] = page["lastrevid"]
+        return revids
 
     def split_sentences(self, text):
-        return re.split(r'(?<=[.?!])\s+(?=[A-ZĐ])', text)
+        """(start, end) của từng câu trong text (bộ tách câu dùng chung, không sao chép câu)."""
+        return sentence_spans(text)
 
     # def refine_relation_direction(self, found_type, context):
     #     context_lower = context.lower()
@@ -234,14 +388,18 @@ class RelationRefiner:
     #         if "kế nhiệm" in context_lower or "nối ngôi" in context_lower: return "KẾ_NHIỆM_CỦA"
     #     return found_type
 
+    def match_relations(self, context_sentence):
+        """Mọi loại quan hệ khớp trong câu kèm vị trí (start, end, từ khóa), một lượt duyệt."""
+        matches = defaultdict(list)
+        for start, end, pattern_id in RELATION_AUTOMATON.finditer(context_sentence.lower()):
+            for rel_type in KEYWORD_TYPES[pattern_id]:
+                matches[rel_type].append((start, end, RELATION_AUTOMATON.patterns[pattern_id]))
+        return {t: matches[t] for t in sorted(matches, key=RELATION_ORDER.get)}
+
     def analyze_sentence_context(self, context_sentence):
-        context_lower = context_sentence.lower()
-        found_types = []
-        for rel_type, keywords in RELATION_RULES.items():
-            for kw in keywords:
-                if kw in context_lower:
-                    found_types.append(rel_type)
-                    break 
+        matched = RELATION_AUTOMATON.matched_ids(context_sentence.lower())
+        found_types = sorted({t for pattern_id in matched for t in KEYWORD_TYPES[pattern_id]},
+                             key=RELATION_ORDER.get)
         
         if not found_types: return "LIÊN_KẾT_TỚI"
         
@@ -249,110 +407,334 @@ class RelationRefiner:
         best_type = max(found_types, key=lambda t: RELATION_WEIGHTS.get(t, 1))
         return best_type
 
+    def find_mentions(self, content, spans, targets):
+        """
+        Một lượt duyệt cả văn bản với automaton của mọi target của nguồn, rồi chia mention vào câu
+        theo vị trí: trả về {target: [chỉ số các câu chứa target]} (cùng kết quả với `target in câu`).
+        """
+        automaton = AhoCorasick(targets)
+        starts = [start for start, _ in spans]
+        found = defaultdict(set)
+        for start, end, pattern_id in automaton.finditer(content):
+            idx = bisect_right(starts, start) - 1
+            # chỉ nhận mention nằm trọn trong một câu
+            if idx >= 0 and end <= spans[idx][1]:
+                found[automaton.patterns[pattern_id]].add(idx)
+        mentions = {target: sorted(idx_set) for target, idx_set in found.items()}
+        if "" in targets:
+            mentions[""] = list(range(len(spans)))
+        return mentions
+
+    @property
+    def final_edges(self):
+        """Danh sách cạnh dạng dict (dựng lại từ kho cạnh, chỉ dùng khi cần tương thích)."""
+        return list(self.edges.iter_rows())
+
     def add_edge(self, source, target, rel_type, evidence):
         """Chỉ thêm nếu bộ 3 (Source, Target, Type) chưa có"""
-        edge_signature = (source, target, rel_type)
-        if edge_signature not in self.existing_edges_set:
-            self.final_edges.append({
-                "source": source,
-                "target": target,
-                "type": rel_type,
-                "evidence": evidence
-            })
-            self.existing_edges_set.add(edge_signature)
-
-    def generate_inverse_edges(self):
+        return self.edges.add(source, target, rel_type, evidence)
+
+    def generate_inverse_edges(self, pairs=None):
+        """pairs: chỉ sinh cho các cặp frozenset({source, target}) này (None = mọi cạnh)."""
         print("\n--- ĐANG SINH QUAN HỆ NGƯỢC (ĐA CHIỀU) ---")
-        current_edges = list(self.final_edges)
+        edges = self.edges
         count_generated = 0
 
-        for edge in current_edges:
-            src = edge['source']
-            tgt = edge['target']
-            rel_type = edge['type']
-            original_evidence = edge['evidence']
-
+        # Duyệt theo chỉ số trên các cột (không sao chép danh sách cạnh);
+        # cạnh mới được nối vào sau nên chỉ duyệt tới số cạnh lúc bắt đầu
+        # Ánh xạ ngược tính một lần theo id loại quan hệ
+        inverse_of = {}
+        for rel_id, rel_type in enumerate(list(edges.types.values)):
             inverse_type = INVERSE_MAPPING.get(rel_type)
             if inverse_type:
                 if inverse_type == "LÀ_CHA_HOẶC_MẸ_CỦA": inverse_type = "LÀ_CHA_CỦA"
+                inverse_of[rel_id] = edges.types.intern(inverse_type)
 
-                inverse_evidence = f"[SUY LUẬN] Từ việc {src} là {rel_type} của {tgt}."
-                
-                # Logic này tự động support đa quan hệ ngược
-                # Nếu có A->B (Cha) => Sinh B->A (Con)
-                # Nếu có A->B (Tiền nhiệm) => Sinh B->A (Kế nhiệm)
-                initial_len = len(self.existing_edges_set)
-                self.add_edge(tgt, src, inverse_type, inverse_evidence)
-                
-                if len(self.existing_edges_set) > initial_len:
-                    count_generated += 1
+        for i in range(len(edges)):
+            inverse_rel = inverse_of.get(edges.rel[i])
+            if inverse_rel is None:
+                continue
+            if pairs is not None and frozenset((edges.source_of(i), edges.target_of(i))) not in pairs:
+                continue
+
+            # Logic này tự động support đa quan hệ ngược
+            # Nếu có A->B (Cha) => Sinh B->A (Con)
+            # Nếu có A->B (Tiền nhiệm) => Sinh B->A (Kế nhiệm)
+            # Evidence "[SUY LUẬN] ..." được dựng từ cạnh gốc khi xuất
+            if edges.add_ids(edges.tgt[i], edges.src[i], inverse_rel, origin=i):
+                count_generated += 1
 
         print(f"✅ Đã suy luận thêm {count_generated} quan hệ mới!")
 
-    def run(self):
+    def score_wikitext(self, source, targets, wikitext):
+        return self.score_source(source, targets, wikitext_to_plaintext(wikitext))
+
+    def score_source(self, source, targets, content):
+        """
+        Chấm điểm quan hệ source -> từng target từ plaintext của source (CPU-bound, không gọi mạng).
+        Trả về (danh sách (target, rel_type, evidence) theo thứ tự, số target không có mention).
+        """
+        if not content:
+            # Nếu không có content, đành chấp nhận LIÊN_KẾT_TỚI
+            return [(t, "LIÊN_KẾT_TỚI", "") for t in targets], 0
+
+        edges = []
+        skipped = 0
+        spans = self.split_sentences(content)
+        mentions = self.find_mentions(content, spans, targets)
+        
+        for target in targets:
+            target_mentions = [content[spans[i][0]:spans[i][1]] for i in mentions.get(target, ())]
+            
+            if not target_mentions:
+                skipped += 1
+                continue
+
+            # 1. Thu thập tất cả các Votes
+            relation_scores = defaultdict(int)
+            relation_evidence = defaultdict(list)
+            
+            for sent in target_mentions:
+                detected_rel = self.analyze_sentence_context(sent)
+                weight = RELATION_WEIGHTS.get(detected_rel, 1)
+                relation_scores[detected_rel] += weight
+                relation_evidence[detected_rel].append(sent)
+            
+            # --- LOGIC MỚI: CHỌN TOP 2 QUAN HỆ TỐT NHẤT ---
+            
+            # A. Nếu có bất kỳ quan hệ cụ thể nào (khác LIÊN_KẾT_TỚI), 
+            # hãy loại bỏ LIÊN_KẾT_TỚI để đỡ loãng.
+            if len(relation_scores) > 1 and "LIÊN_KẾT_TỚI" in relation_scores:
+                del relation_scores["LIÊN_KẾT_TỚI"]
+
+            # B. Sắp xếp các quan hệ theo điểm số giảm dần
+            # sorted_rels trả về list các tuple: [('LÀ_CHA_CỦA', 15), ('TIỀN_NHIỆM_CỦA', 10), ...]
+            sorted_rels = sorted(relation_scores.items(), key=lambda item: item[1], reverse=True)
+
+            # C. Chọn Top 2 (Nếu chỉ có 1 thì lấy 1)
+            top_relations = sorted_rels[:2]
+
+            # D. Tạo cạnh cho các quan hệ này
+            for rel_type, score in top_relations:
+                # Lấy bằng chứng (chọn câu đầu tiên tìm thấy của loại đó)
+                evidence_text = relation_evidence[rel_type][0].replace('\n', ' ').strip()
+                if len(evidence_text) > 200: evidence_text = evidence_text[:200] + "..."
+                
+                edges.append((target, rel_type, evidence_text))
+        return edges, skipped
+
+    def apply_scored(self, source, edges, skipped):
+        for target, rel_type, evidence in edges:
+            self.add_edge(source, target, rel_type, evidence)
+        self.skipped_no_mention += skipped
+        if source in self.manifest_sources:
+            self.manifest_sources[source]["skipped"] = skipped
+
+    def record_source(self, source, targets, content):
+        self.manifest_sources[source] = {
+            "content_hash": content_hash(content),
+            "targets": list(targets),
+            "rules_version": rules_version(),
+            "skipped": 0,
+        }
+
+    def load_input(self):
         print("--- ĐANG ĐỌC DỮ LIỆU ---")
         try:
             with open(INPUT_EDGES_FILE, 'r', encoding='utf-8') as f:
                 reader = csv.DictReader(f)
                 for row in reader:
                     self.edges_map[row['source']].append(row['target'])
-        except FileNotFoundError: return
+        except FileNotFoundError: return False
+        return True
+
+    def run(self):
+        if not self.load_input(): return
 
         print(f"🔹 Phân tích ngữ cảnh cho {len(self.edges_map)} nhân vật...")
         
         for source, targets in tqdm(self.edges_map.items()):
-            content = self.fetch_plaintext(source)
-            if not content:
-                # Nếu không có content, đành chấp nhận LIÊN_KẾT_TỚI
-                for t in targets: self.add_edge(source, t, "LIÊN_KẾT_TỚI", "")
-                continue
-
-            sentences = self.split_sentences(content)
-            
-            for target in targets:
-                target_mentions = [s for s in sentences if target in s]
-                
-                if not target_mentions:
-                    self.skipped_no_mention += 1
-                    continue
-
-                # 1. Thu thập tất cả các Votes
-                relation_scores = defaultdict(int)
-                relation_evidence = defaultdict(list)
-                
-                for sent in target_mentions:
-                    detected_rel = self.analyze_sentence_context(sent)
-                    weight = RELATION_WEIGHTS.get(detected_rel, 1)
-                    relation_scores[detected_rel] += weight
-                    relation_evidence[detected_rel].append(sent)
-                
-                # --- LOGIC MỚI: CHỌN TOP 2 QUAN HỆ TỐT NHẤT ---
-                
-                # A. Nếu có bất kỳ quan hệ cụ thể nào (khác LIÊN_KẾT_TỚI), 
-                # hãy loại bỏ LIÊN_KẾT_TỚI để đỡ loãng.
-                if len(relation_scores) > 1 and "LIÊN_KẾT_TỚI" in relation_scores:
-                    del relation_scores["LIÊN_KẾT_TỚI"]
-
-                # B. Sắp xếp các quan hệ theo điểm số giảm dần
-                # sorted_rels trả về list các tuple: [('LÀ_CHA_CỦA', 15), ('TIỀN_NHIỆM_CỦA', 10), ...]
-                sorted_rels = sorted(relation_scores.items(), key=lambda item: item[1], reverse=True)
-
-                # C. Chọn Top 2 (Nếu chỉ có 1 thì lấy 1)
-                top_relations = sorted_rels[:2]
-
-                # D. Tạo cạnh cho các quan hệ này
-                for rel_type, score in top_relations:
-                    # Lấy bằng chứng (chọn câu đầu tiên tìm thấy của loại đó)
-                    evidence_text = relation_evidence[rel_type][0].replace('\n', ' ').strip()
-                    if len(evidence_text) > 200: evidence_text = evidence_text[:200] + "..."
-                    
-                    self.add_edge(source, target, rel_type, evidence_text)
-            
+            wikitext = self.fetch_wikitext(source)
+            self.record_source(source, targets, wikitext)
+            self.apply_scored(source, *self.score_wikitext(source, targets, wikitext))
             time.sleep(0.05)
 
         # Kích hoạt suy luận ngược
+        print_stats()
+        self.generate_inverse_edges()
+        self.save_data()
+        self.save_manifest()
+
+    # --- CHẾ ĐỘ PIPELINE: fetch (thread) song song với chấm điểm (process) ---
+    def run_pipelined(self, fetch_workers=FETCH_WORKERS, score_workers=SCORE_WORKERS, prefetch=PREFETCH_BATCHES):
+        """
+        Giống run() nhưng chồng lấp phần gọi mạng với phần chấm điểm:
+        - tầng fetch: thread pool, mỗi lượt gọi lấy wikitext của WIKITEXT_BATCH_SIZE nguồn;
+        - tầng chấm điểm: process pool (score_batch: wikitext -> plaintext rồi chấm điểm);
+        - hai tầng nối bằng hàng đợi có giới hạn `prefetch` batch, cửa sổ chấm điểm cũng có giới hạn
+          => fetch không chạy quá xa phía trước (backpressure).
+        Kết quả được áp dụng theo đúng thứ tự nguồn trong input => final_edges giống hệt run().
+        """
+        if not self.load_input(): return
+
+        items = list(self.edges_map.items())
+        batches = [items[i:i + WIKITEXT_BATCH_SIZE] for i in range(0, len(items), WIKITEXT_BATCH_SIZE)]
+        print(f"🔹 Phân tích ngữ cảnh cho {len(items)} nhân vật (pipeline: {fetch_workers} luồng fetch, "
+              f"{score_workers} tiến trình chấm điểm, {len(batches)} batch)...")
+
+        fetched = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._fetch_stage, args=(batches, fetch_workers, fetched, stop), daemon=True)
+        producer.start()
+
+        pending = deque()
+        progress = tqdm(total=len(items))
+        try:
+            with ProcessPoolExecutor(max_workers=score_workers) as pool:
+                while True:
+                    entry = fetched.get()
+                    if entry is None:
+                        break
+                    if isinstance(entry, BaseException):
+                        raise entry
+                    batch, contents = entry
+                    jobs = [(source, targets, contents.get(source, "")) for source, targets in batch]
+                    for source, targets, content in jobs:
+                        self.record_source(source, targets, content)
+                    pending.append((batch, pool.submit(score_batch, jobs)))
+                    while len(pending) > score_workers * 2:
+                        self._apply_batch(*pending.popleft(), progress)
+                while pending:
+                    self._apply_batch(*pending.popleft(), progress)
+        finally:
+            stop.set()
+            progress.close()
+
+        print_stats()
         self.generate_inverse_edges()
         self.save_data()
+        self.save_manifest()
+
+    def _fetch_stage(self, batches, fetch_workers, fetched, stop):
+        """Luồng producer: giữ tối đa `fetch_workers` lượt gọi đang chạy, đẩy kết quả theo thứ tự batch."""
+        try:
+            with ThreadPoolExecutor(max_workers=fetch_workers) as pool:
+                window = deque()
+                for batch in batches:
+                    if stop.is_set():
+                        return
+                    window.append((batch, pool.submit(self.fetch_wikitext_batch, [s for s, _ in batch])))
+                    if len(window) >= fetch_workers:
+                        b, fut = window.popleft()
+                        fetched.put((b, fut.result()))
+                while window and not stop.is_set():
+                    b, fut = window.popleft()
+                    fetched.put((b, fut.result()))
+            fetched.put(None)
+        except BaseException as e:
+            fetched.put(e)
+
+    def _apply_batch(self, batch, future, progress):
+        for (source, _), (edges, skipped) in zip(batch, future.result()):
+            self.apply_scored(source, edges, skipped)
+        progress.update(len(batch))
+
+    # --- CHẾ ĐỘ TĂNG DẦN: chỉ chấm lại các nguồn có input thay đổi ---
+    def run_incremental(self):
+        """
+        So sánh từng nguồn với MANIFEST_FILE (hash wikitext, danh sách target, phiên bản luật):
+        - nguồn không đổi: giữ nguyên các cạnh thuận đã có trong OUTPUT_FINAL_FILE;
+        - nguồn mới / đổi: chấm điểm lại và ghép cạnh mới vào đúng vị trí của nguồn đó;
+        - nguồn bị xóa khỏi input: bỏ các cạnh của nó.
+        Quan hệ ngược chỉ sinh lại cho các cặp (A, B) có cạnh thuận bị ảnh hưởng; các cặp khác giữ nguyên.
+        Tập cạnh kết quả trùng với một lần chạy đầy đủ.
+        """
+        manifest = self.load_manifest()
+        if manifest is None or not os.path.exists(OUTPUT_FINAL_FILE):
+            print("ℹ️ Chưa có manifest / kết quả cũ => chạy đầy đủ.")
+            return self.run()
+        if not self.load_input(): return
+
+        forward_old = defaultdict(list)
+        inferred_old = []
+        with open(OUTPUT_FINAL_FILE, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                if is_inferred(row):
+                    inferred_old.append(row)
+                else:
+                    forward_old[row['source']].append(row)
+
+        # 1. Hash lại wikitext (batch WIKITEXT_BATCH_SIZE title / lượt gọi, thường trúng HTTP cache).
+        # Response trong HTTP cache không tự hết hạn => hỏi revid mới nhất trước (không qua cache) và
+        # bỏ các response cũ của trang đã đổi, để hash luôn tính trên bản hiện tại.
+        items = list(self.edges_map.items())
+        cache = get_cache()
+        if cache is not None and not cache.offline:
+            current = self.fetch_lastrevids(s for s, _ in items)
+            print(f"   > Bỏ {cache.invalidate_changed(current)} response cũ trong HTTP cache.")
+        contents = {}
+        for i in tqdm(range(0, len(items), WIKITEXT_BATCH_SIZE), desc="Kiểm tra wikitext"):
+            contents.update(self.fetch_wikitext_batch([s for s, _ in items[i:i + WIKITEXT_BATCH_SIZE]]))
+
+        old_sources = manifest.get("sources", {})
+        changed = set()
+        for source, targets in items:
+            self.record_source(source, targets, contents.get(source, ""))
+            entry = old_sources.get(source)
+            current = self.manifest_sources[source]
+            if entry is None or any(entry.get(k) != current[k] for k in ("content_hash", "targets", "rules_version")):
+                changed.add(source)
+            else:
+                current["skipped"] = entry.get("skipped", 0)
+        removed = set(old_sources) - set(self.edges_map)
+        print(f"🔹 {len(changed)} nguồn thay đổi / mới, {len(removed)} nguồn bị xóa, "
+              f"{len(items) - len(changed)} nguồn giữ nguyên.")
+
+        # 2. Cạnh thuận: giữ nguyên hoặc chấm lại, theo thứ tự nguồn trong input
+        affected_pairs = set()
+        for source in removed:
+            affected_pairs.update(frozenset((source, row['target'])) for row in forward_old.get(source, ()))
+        for source, targets in items:
+            if source in changed:
+                affected_pairs.update(frozenset((source, row['target'])) for row in forward_old.get(source, ()))
+                edges, skipped = self.score_wikitext(source, targets, contents.get(source, ""))
+                self.apply_scored(source, edges, skipped)
+                affected_pairs.update(frozenset((source, t)) for t, _, _ in edges)
+            else:
+                for row in forward_old.get(source, ()):
+                    self.add_edge(row['source'], row['target'], row['type'], row['evidence'])
+                self.skipped_no_mention += self.manifest_sources[source]["skipped"]
+
+        # 3. Quan hệ ngược: chỉ sinh lại cho các cặp bị ảnh hưởng
+        if manifest.get("inverse_version") != inverse_version():
+            self.generate_inverse_edges()
+        else:
+            for row in inferred_old:
+                if frozenset((row['source'], row['target'])) not in affected_pairs:
+                    self.add_edge(row['source'], row['target'], row['type'], row['evidence'])
+            self.generate_inverse_edges(pairs=affected_pairs)
+
+        print_stats()
+        self.save_data()
+        self.save_manifest()
+
+    def load_manifest(self):
+        try:
+            with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save_manifest(self):
+        manifest = {
+            "rules_version": rules_version(),
+            "inverse_version": inverse_version(),
+            "sources": self.manifest_sources,
+        }
+        tmp_path = MANIFEST_FILE + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, MANIFEST_FILE)
 
     def save_data(self):
         print(f"\n--- ĐANG LƯU KẾT QUẢ RA {OUTPUT_FINAL_FILE} ---")
@@ -360,11 +742,28 @@ class RelationRefiner:
             fieldnames = ["source", "target", "type", "evidence"]
             writer = csv.DictWriter(f, fieldnames=fieldnames)
             writer.writeheader()
-            writer.writerows(self.final_edges)
+            writer.writerows(self.edges.iter_rows())
         
-        print(f"✅ Hoàn tất! Tổng cộng {len(self.final_edges)} quan hệ đa chiều.")
+        print(f"✅ Hoàn tất! Tổng cộng {len(self.edges)} quan hệ đa chiều.")
         print(f"ℹ️ Đã bỏ qua {self.skipped_no_mention} edges vì không có mention (mention = 0).")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tinh chỉnh loại quan hệ từ ngữ cảnh câu.")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Chồng lấp fetch wikitext (thread, prop=revisions, batch WIKITEXT_BATCH_SIZE=50 title) "
+                             "với parse + chấm điểm (process pool)")
+    parser.add_argument("--fetch-workers", type=int, default=FETCH_WORKERS)
+    parser.add_argument("--score-workers", type=int, default=SCORE_WORKERS)
+    parser.add_argument("--prefetch", type=int, default=PREFETCH_BATCHES, help="Số batch đã fetch được xếp hàng tối đa")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Chỉ chấm lại các nguồn có wikitext / target / luật thay đổi so với manifest")
+    args = parser.parse_args()
+
     refiner = RelationRefiner()
-    refiner.run()
\ No newline at end of file
+    if args.incremental:
+        refiner.run_incremental()
+    elif args.pipeline:
+        refiner.run_pipelined(fetch_workers=args.fetch_workers, score_workers=args.score_workers,
+                              prefetch=args.prefetch)
+    else:
+        refiner.run()
\ No newline at end of file
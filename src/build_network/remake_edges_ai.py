@@ -1,11 +1,18 @@
+import hashlib
 import json
 import csv
 import re
+import sys
 import time
 from collections import defaultdict
+from pathlib import Path
 from tqdm import tqdm
 import requests
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.llm_cache import get_llm_cache
+from common.sentences import iter_sentences
+
 
 # --- ⚠️ CHÚ Ý: CẦN CÀI ĐẶT/CÓ MODULE PUTER ---
 # Giả định bạn đã có module 'puter' chứa class PuterAI như bạn cung cấp
@@ -63,6 +70,14 @@ RELATION_RULES = {
 # Danh sách Key hợp lệ để AI chọn
 VALID_RELATION_KEYS = list(RELATION_RULES.keys()) + ["LIÊN_KẾT_TỚI"]
 
+# Model hỏi khi Rule bó tay + khóa cache LLM (common/llm_cache.py).
+# Danh sách key nằm trong prompt => đổi danh sách thì câu trả lời cũ không còn dùng được.
+AI_PROVIDER = "openrouter"
+AI_MODEL = "google/gemini-2.0-flash-exp:free"
+AI_PROMPT_VERSION = "1-" + hashlib.sha256(
+    json.dumps(VALID_RELATION_KEYS, ensure_ascii=False).encode("utf-8")).hexdigest()[:8]
+LLM_CACHE_NAMESPACE = "remake_edges_ai"
+
 INVERSE_MAPPING = {
     "LÀ_CHA_CỦA": "LÀ_CON_CỦA", "LÀ_MẸ_CỦA": "LÀ_CON_CỦA", "LÀ_CON_CỦA": "LÀ_CHA_HOẶC_MẸ_CỦA", 
     "PHỐI_NGẪU_VỚI": "PHỐI_NGẪU_VỚI", "LÀ_ANH_CHỊ_EM_CỦA": "LÀ_ANH_CHỊ_EM_CỦA", 
@@ -119,7 +134,15 @@ class RelationRefiner:
         Dùng Puter AI để xác định quan hệ khi Rule bó tay.
         """
         if not self.has_ai or not context: return "LIÊN_KẾT_TỚI"
-        
+
+        # Cùng (A, B, văn bản) đã hỏi ở lần chạy trước => dùng lại câu trả lời
+        cache = get_llm_cache()
+        cache_inputs = {"source": source, "target": target, "context": context}
+        if cache is not None:
+            cached = cache.get(LLM_CACHE_NAMESPACE, AI_PROVIDER, AI_MODEL, AI_PROMPT_VERSION, cache_inputs)
+            if cached is not None:
+                return cached
+
         prompt = f"""
         Bạn là chuyên gia lịch sử Việt Nam. Dựa vào văn bản sau, hãy xác định quan hệ giữa:
         - A: {source}
@@ -146,7 +169,7 @@ class RelationRefiner:
                     "Content-Type": "application/json",
                 },
                 data=json.dumps({
-                    "model": "google/gemini-2.0-flash-exp:free",
+                    "model": AI_MODEL,
                     "messages": [
                     {
                         "role": "user",
@@ -167,10 +190,10 @@ class RelationRefiner:
             result = str(response).strip()
             result = re.sub(r'[^A-Z_À-Ỹ]', '', result) # Chỉ giữ lại ký tự chữ hoa và gạch dưới
             
-            if result in VALID_RELATION_KEYS:
-                return result
-            else:
-                return "LIÊN_KẾT_TỚI"
+            rel = result if result in VALID_RELATION_KEYS else "LIÊN_KẾT_TỚI"
+            if cache is not None:
+                cache.put(LLM_CACHE_NAMESPACE, AI_PROVIDER, AI_MODEL, AI_PROMPT_VERSION, cache_inputs, rel)
+            return rel
         
         except PuterAPIError as e:
             print(f"   [Puter API Error]: {e}")
@@ -189,7 +212,7 @@ class RelationRefiner:
         except: return ""
 
     def split_sentences(self, text):
-        return re.split(r'(?<=[.?!])\s+(?=[A-ZĐ])', text)
+        return list(iter_sentences(text))
 
     def refine_relation_direction(self, found_type, context):
         context_lower = context.lower()
@@ -305,6 +328,9 @@ class RelationRefiner:
 
         self.generate_inverse_edges()
         self.save_data()
+        cache = get_llm_cache()
+        if cache is not None:
+            cache.print_stats(LLM_CACHE_NAMESPACE)
 
     def save_data(self):
         print(f"\n--- ĐANG LƯU KẾT QUẢ RA {OUTPUT_FINAL_FILE} ---")
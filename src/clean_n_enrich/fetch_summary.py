@@ -1,8 +1,12 @@
-import requests
 import json
 import time
 from tqdm import tqdm
 import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.http_cache import CacheMiss, get_json, print_stats
 
 # --- CẤU HÌNH ---
 INPUT_NODES_FILE = "data/processed/nodes_metadata.json"  # File đầu vào từ Step 1
@@ -28,13 +32,8 @@ def fetch_wiki_summary(title):
     }
     
     try:
-        response = requests.get(url, params=params, headers=HEADERS, timeout=10)
-        
-        # Nếu gặp lỗi server (5xx) hoặc Client (4xx), trả về chuỗi rỗng để không chết chương trình
-        if response.status_code != 200:
-            return ""
-
-        data = response.json()
+        # Lỗi server (5xx) hoặc Client (4xx) => raise_for_status trong get_json, rơi vào except bên dưới
+        data = get_json(url, params, headers=HEADERS, timeout=10)
         
         # Xử lý kết quả trả về
         if 'query' not in data or 'pages' not in data['query']:
@@ -49,6 +48,8 @@ def fetch_wiki_summary(title):
         summary = page.get('extract', "")
         return summary
 
+    except CacheMiss:
+        raise
     except Exception as e:
         print(f"\n[Lỗi] {title}: {e}")
         return ""
@@ -83,6 +84,8 @@ def main():
         # Delay nhẹ 0.1s để tôn trọng server Wikipedia (tránh lỗi 429 Too Many Requests)
         time.sleep(0.1)
 
+    print_stats()
+
     # 3. Lưu kết quả
     print(f"\n--- ĐANG LƯU KẾT QUẢ RA {OUTPUT_NODES_FILE} ---")
     with open(OUTPUT_NODES_FILE, 'w', encoding='utf-8') as f:
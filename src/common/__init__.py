@@ -3,6 +3,9 @@ Common utilities and shared configuration for the wikihistovn project.
 
 This package currently exposes:
 - config_paths: central definition of data directories (raw/processed, etc.)
+- http_cache: persistent on-disk cache for Wikipedia API responses
+- xml_dump / bz2_dump: offline page sources backed by the XML dumps
+- page_store: mmap-backed binary page store (by page_id or title) built from a dump
 """
 
 
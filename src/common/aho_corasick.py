@@ -0,0 +1,86 @@
+"""
+Automaton Aho-Corasick thuần Python: tìm mọi lần xuất hiện của nhiều mẫu trong một lượt
+duyệt văn bản (O(độ dài văn bản + số kết quả)), thay cho vòng lặp `kw in text` trên từng mẫu.
+
+Mỗi mẫu được gán id = vị trí trong `patterns` (mẫu trùng nhau dùng chung id đầu tiên);
+người gọi tự ánh xạ id sang dữ liệu của mình (loại quan hệ, title, ...).
+"""
+
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+
+class AhoCorasick:
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        for pattern in patterns:
+            self._add(pattern)
+        self._build()
+
+    def _add(self, pattern: str):
+        if not pattern or pattern in self._ids:
+            return
+        pattern_id = len(self.patterns)
+        self.patterns.append(pattern)
+        self._ids[pattern] = pattern_id
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._out[state] = self._out[state] + (pattern_id,)
+
+    def _build(self):
+        """Tính failure link theo BFS và gộp output của trạng thái fail vào từng trạng thái."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def pattern_id(self, pattern: str) -> int:
+        return self._ids[pattern]
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """Yield (start, end, pattern_id) cho mọi lần xuất hiện (kể cả chồng lấn), theo thứ tự vị trí kết thúc."""
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self.patterns
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                end = i + 1
+                for pattern_id in out[state]:
+                    yield end - len(patterns[pattern_id]), end, pattern_id
+
+    def matched_ids(self, text: str) -> Set[int]:
+        """Tập id các mẫu xuất hiện ít nhất một lần trong `text`."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
@@ -0,0 +1,152 @@
+"""
+Đọc file bài viết JSONL (articles_raw*.jsonl: mỗi dòng một {title, page_id, text/wikitext})
+theo kiểu streaming, thay cho việc nạp toàn bộ file vào một list trước khi xử lý.
+
+- `iter_articles`: duyệt từng bài một; bộ nhớ tối đa ~ một bài. Dòng rỗng / JSON lỗi bị bỏ qua
+  (giống các bản `load_articles` cũ).
+- `build_article_index`: quét file một lượt, lưu title / page_id -> (byte offset, độ dài) của
+  từng dòng vào SQLite cạnh file (`<file>.index.sqlite`), kèm kích thước + mtime của file để
+  tự dựng lại khi file JSONL thay đổi.
+- `ArticleFile`: tra một bài theo title hoặc page_id qua index rồi đọc đúng dòng đó trên mmap.
+"""
+
+import json
+import mmap
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+
+def iter_articles(path: Path) -> Iterator[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except Exception:
+                continue
+
+
+def iter_article_offsets(path: Path) -> Iterator[Tuple[str, Optional[int], int, int]]:
+    """Yield (title, page_id, byte offset, độ dài) cho mỗi dòng hợp lệ có title."""
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            start, length = offset, len(line)
+            offset += length
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except Exception:
+                continue
+            title = item.get("title") if isinstance(item, dict) else None
+            if not title:
+                continue
+            page_id = item.get("page_id")
+            yield title, int(page_id) if page_id else None, start, length
+
+
+def default_index_path(path: Path) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + ".index.sqlite")
+
+
+def _file_signature(path: Path) -> Tuple[int, int]:
+    stat = Path(path).stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def index_is_fresh(path: Path, index_path: Optional[Path] = None) -> bool:
+    index_path = Path(index_path) if index_path else default_index_path(path)
+    if not index_path.exists():
+        return False
+    conn = sqlite3.connect(str(index_path))
+    try:
+        row = conn.execute("SELECT size, mtime_ns FROM meta").fetchone()
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        conn.close()
+    return row is not None and tuple(row) == _file_signature(path)
+
+
+def build_article_index(path: Path, index_path: Optional[Path] = None, batch_size: int = 10000) -> Path:
+    path = Path(path)
+    index_path = Path(index_path) if index_path else default_index_path(path)
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    print(f"🔎 Đang xây index cho '{path}'...")
+    size, mtime_ns = _file_signature(path)
+    conn = sqlite3.connect(str(tmp_path))
+    conn.execute("CREATE TABLE meta (size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL)")
+    conn.execute("INSERT INTO meta VALUES (?, ?)", (size, mtime_ns))
+    conn.execute(
+        "CREATE TABLE articles (title TEXT PRIMARY KEY, page_id INTEGER, "
+        "offset INTEGER NOT NULL, length INTEGER NOT NULL)"
+    )
+    rows = []
+    count = 0
+    for row in iter_article_offsets(path):
+        rows.append(row)
+        if len(rows) >= batch_size:
+            conn.executemany("INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?)", rows)
+            count += len(rows)
+            rows.clear()
+    conn.executemany("INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?)", rows)
+    count += len(rows)
+    conn.execute("CREATE INDEX idx_articles_page_id ON articles(page_id)")
+    conn.commit()
+    conn.close()
+    tmp_path.replace(index_path)
+    print(f"✅ Đã index {count} bài vào '{index_path}'")
+    return index_path
+
+
+class ArticleFile:
+    def __init__(self, path: Path, index_path: Optional[Path] = None):
+        self.path = Path(path)
+        self.index_path = Path(index_path) if index_path else default_index_path(self.path)
+        if not index_is_fresh(self.path, self.index_path):
+            build_article_index(self.path, self.index_path)
+        self._conn = sqlite3.connect(str(self.index_path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._file = open(self.path, "rb")
+        # mmap không nhận file rỗng
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.path.stat().st_size else b""
+
+    def _read(self, row) -> Optional[Dict]:
+        if row is None:
+            return None
+        offset, length = row
+        return json.loads(self._mm[offset:offset + length])
+
+    def _query_one(self, sql: str, args: tuple):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchone()
+
+    def get(self, title: str) -> Optional[Dict]:
+        return self._read(self._query_one("SELECT offset, length FROM articles WHERE title = ?", (title,)))
+
+    def get_by_page_id(self, page_id: int) -> Optional[Dict]:
+        return self._read(self._query_one("SELECT offset, length FROM articles WHERE page_id = ?", (int(page_id),)))
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter_articles(self.path)
+
+    def __len__(self) -> int:
+        return self._query_one("SELECT COUNT(*) FROM articles", ())[0]
+
+    def __contains__(self, title: str) -> bool:
+        return self._query_one("SELECT 1 FROM articles WHERE title = ?", (title,)) is not None
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+        self._conn.close()
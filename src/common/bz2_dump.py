@@ -0,0 +1,169 @@
+"""
+Đọc ngẫu nhiên dump bz2 multistream (pages-articles-multistream.xml.bz2) qua file index
+(pages-articles-multistream-index.txt.bz2, mỗi dòng "offset:page_id:title").
+
+Mỗi stream bz2 chứa ~100 trang và giải nén độc lập được, nên tra một trang chỉ cần
+seek tới offset của stream chứa nó và giải nén đúng stream đó. Các stream vừa giải nén
+được giữ trong LRU. Index text được chuyển một lần sang SQLite cạnh file index để
+các lần mở sau tra cứu ngay, không phải giải nén lại index.
+"""
+
+import bz2
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from common.xml_dump import MAX_REDIRECT_HOPS, normalize_title, parse_page_fragment
+
+STREAM_CACHE_SIZE = 32
+
+
+def default_index_path(dump_path: Path) -> Path:
+    """viwiki-...-multistream.xml.bz2 -> viwiki-...-multistream-index.txt.bz2"""
+    dump_path = Path(dump_path)
+    return dump_path.with_name(dump_path.name.replace(".xml.bz2", "-index.txt.bz2"))
+
+
+def build_sqlite_index(index_path: Path, sqlite_path: Path, batch_size: int = 50000) -> Path:
+    print(f"🔎 Đang chuyển index multistream '{index_path}' sang SQLite...")
+    tmp_path = sqlite_path.with_name(sqlite_path.name + ".tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+    conn = sqlite3.connect(str(tmp_path))
+    conn.execute("CREATE TABLE pages (title TEXT PRIMARY KEY, page_id INTEGER NOT NULL, offset INTEGER NOT NULL)")
+    rows = []
+    with bz2.open(index_path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            # title có thể chứa ':' => chỉ tách 2 lần
+            offset, page_id, title = line.split(":", 2)
+            rows.append((title, int(page_id), int(offset)))
+            if len(rows) >= batch_size:
+                conn.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?)", rows)
+                rows.clear()
+    conn.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?)", rows)
+    conn.execute("CREATE INDEX idx_pages_page_id ON pages(page_id)")
+    conn.execute("CREATE INDEX idx_pages_offset ON pages(offset)")
+    conn.commit()
+    conn.close()
+    tmp_path.replace(sqlite_path)
+    return sqlite_path
+
+
+def split_pages(xml_bytes: bytes) -> Iterable[bytes]:
+    """Cắt các đoạn <page>...</page> trong phần XML đã giải nén của một stream."""
+    pos = 0
+    while True:
+        start = xml_bytes.find(b"<page>", pos)
+        if start < 0:
+            return
+        end = xml_bytes.find(b"</page>", start)
+        if end < 0:
+            return
+        end += len(b"</page>")
+        yield xml_bytes[start:end]
+        pos = end
+
+
+class MultistreamDumpReader:
+    def __init__(self, dump_path: Path, index_path: Optional[Path] = None, cache_size: int = STREAM_CACHE_SIZE):
+        self.dump_path = Path(dump_path)
+        self.index_path = Path(index_path) if index_path else default_index_path(self.dump_path)
+        sqlite_path = self.index_path.with_name(self.index_path.name + ".sqlite")
+        if not sqlite_path.exists():
+            build_sqlite_index(self.index_path, sqlite_path)
+        self._conn = sqlite3.connect(str(sqlite_path), check_same_thread=False)
+        self._file = open(self.dump_path, "rb")
+        self._file_size = self.dump_path.stat().st_size
+        self._lock = threading.Lock()
+        self._streams: "OrderedDict[int, Dict[int, Dict]]" = OrderedDict()
+        self.cache_size = cache_size
+        self.streams_decoded = 0
+
+    # --- Index ---
+    def _stream_end(self, offset: int) -> int:
+        row = self._conn.execute("SELECT MIN(offset) FROM pages WHERE offset > ?", (offset,)).fetchone()
+        return row[0] if row and row[0] is not None else self._file_size
+
+    def locate_title(self, title: str) -> Optional[tuple]:
+        with self._lock:
+            return self._conn.execute("SELECT page_id, offset FROM pages WHERE title = ?", (title,)).fetchone()
+
+    def locate_id(self, page_id: int) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute("SELECT offset FROM pages WHERE page_id = ?", (page_id,)).fetchone()
+        return row[0] if row else None
+
+    # --- Stream ---
+    def read_stream(self, offset: int) -> Dict[int, Dict]:
+        """Giải nén (hoặc lấy từ LRU) stream tại `offset`, trả về {page_id: page}."""
+        with self._lock:
+            if offset in self._streams:
+                self._streams.move_to_end(offset)
+                return self._streams[offset]
+            end = self._stream_end(offset)
+            self._file.seek(offset)
+            data = self._file.read(end - offset)
+
+        pages = {}
+        for fragment in split_pages(bz2.decompress(data)):
+            page = parse_page_fragment(fragment)
+            pages[page["page_id"]] = page
+
+        with self._lock:
+            self.streams_decoded += 1
+            self._streams[offset] = pages
+            while len(self._streams) > self.cache_size:
+                self._streams.popitem(last=False)
+        return pages
+
+    # --- Tra cứu ---
+    def get_page_by_id(self, page_id: int) -> Optional[Dict]:
+        offset = self.locate_id(page_id)
+        if offset is None:
+            return None
+        return self.read_stream(offset).get(page_id)
+
+    def get_page(self, title: str) -> Optional[Dict]:
+        """Trang theo title (đã đi theo đổi hướng), cùng dạng với DumpPageSource.get_page."""
+        title = normalize_title(title)
+        for _ in range(MAX_REDIRECT_HOPS + 1):
+            if not title:
+                return None
+            located = self.locate_title(title)
+            if located is None:
+                return None
+            page_id, offset = located
+            page = self.read_stream(offset).get(page_id)
+            if page is None:
+                return None
+            if page.get("redirect"):
+                title = normalize_title(page["redirect"])
+                continue
+            return page
+        return None
+
+    def fetch_wikitext_batch(self, titles: Iterable[str]) -> Dict[str, Dict]:
+        results = {}
+        for title in titles:
+            page = self.get_page(title)
+            if page is None or not page["wikitext"]:
+                continue
+            results[title] = {
+                "page_id": page["page_id"],
+                "title": page["title"],
+                "lastrevid": page["lastrevid"],
+                "wikitext": page["wikitext"],
+            }
+        return results
+
+    def fetch_wikitext(self, title: str) -> Optional[Dict]:
+        return self.fetch_wikitext_batch([title]).get(title)
+
+    def close(self):
+        self._file.close()
+        self._conn.close()
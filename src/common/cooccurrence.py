@@ -0,0 +1,78 @@
+"""
+Tìm đồng thời từ khóa và title trong một lượt quét văn bản (một automaton Aho-Corasick chung),
+kèm vị trí của từng lần xuất hiện, rồi ghép cặp (từ khóa, title) đồng xuất hiện.
+
+`pairs(..., max_distance=d)` chỉ giữ các cặp có ít nhất một lần xuất hiện của từ khóa và của
+title cách nhau không quá d ký tự (khoảng trống giữa hai đoạn, 0 nếu chồng lấn).
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from common.aho_corasick import AhoCorasick
+
+Span = Tuple[int, int]
+
+
+def min_gap(a: List[Span], b: List[Span]) -> int:
+    """Khoảng cách ký tự nhỏ nhất giữa hai danh sách đoạn đã sắp theo vị trí bắt đầu."""
+    best = None
+    i = j = 0
+    while i < len(a) and j < len(b):
+        (a_start, a_end), (b_start, b_end) = a[i], b[j]
+        gap = max(0, b_start - a_end, a_start - b_end)
+        if best is None or gap < best:
+            best = gap
+            if best == 0:
+                break
+        # Tiến con trỏ của đoạn kết thúc sớm hơn
+        if a_end < b_end:
+            i += 1
+        else:
+            j += 1
+    return best
+
+
+class CooccurrenceEngine:
+    def __init__(self, keywords: Iterable[str], titles: Iterable[str]):
+        self.keywords: List[str] = list(keywords)
+        self.titles: List[str] = list(titles)
+        self.automaton = AhoCorasick(self.keywords + self.titles)
+        # pattern_id -> chỉ số từ khóa / title (một chuỗi có thể vừa là từ khóa vừa là title)
+        self._keyword_ids = defaultdict(list)
+        self._title_ids = defaultdict(list)
+        for idx, kw in enumerate(self.keywords):
+            if kw:
+                self._keyword_ids[self.automaton.pattern_id(kw)].append(idx)
+        for idx, title in enumerate(self.titles):
+            if title:
+                self._title_ids[self.automaton.pattern_id(title)].append(idx)
+
+    def scan(self, text: str) -> Tuple[Dict[int, List[Span]], Dict[int, List[Span]]]:
+        """Một lượt quét: ({chỉ số từ khóa: [(start, end)]}, {chỉ số title: [(start, end)]}), đoạn sắp theo start."""
+        keyword_hits = defaultdict(list)
+        title_hits = defaultdict(list)
+        for start, end, pattern_id in self.automaton.finditer(text):
+            for idx in self._keyword_ids.get(pattern_id, ()):
+                keyword_hits[idx].append((start, end))
+            for idx in self._title_ids.get(pattern_id, ()):
+                title_hits[idx].append((start, end))
+        for hits in (keyword_hits, title_hits):
+            for spans in hits.values():
+                spans.sort()
+        return keyword_hits, title_hits
+
+    def pairs(self, text: str, max_distance: Optional[int] = None) -> Iterator[Tuple[int, int, int]]:
+        """
+        Yield (chỉ số từ khóa, chỉ số title, khoảng cách nhỏ nhất) cho mọi cặp đồng xuất hiện,
+        theo thứ tự từ khóa rồi thứ tự title như khi khởi tạo.
+        """
+        keyword_hits, title_hits = self.scan(text)
+        titles_found = sorted(title_hits)
+        for kw_idx in sorted(keyword_hits):
+            kw_spans = keyword_hits[kw_idx]
+            for title_idx in titles_found:
+                distance = min_gap(kw_spans, title_hits[title_idx])
+                if max_distance is not None and distance > max_distance:
+                    continue
+                yield kw_idx, title_idx, distance
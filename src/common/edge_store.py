@@ -0,0 +1,125 @@
+"""
+Kho cạnh gọn cho pipeline quan hệ: node và loại quan hệ được intern thành số nguyên,
+mỗi thuộc tính của cạnh là một cột `array` (int32) thay vì một dict cho mỗi cạnh.
+
+- Khử trùng lặp O(1) bằng tập khóa số nguyên (source, target, type) đã đóng gói.
+- Evidence lưu theo tham chiếu: chỉ số vào bảng chuỗi đã intern; cạnh suy luận chỉ lưu
+  chỉ số cạnh gốc (`origin`), câu evidence được dựng lại khi xuất.
+- Duyệt cạnh theo chỉ số trên các cột, không sao chép danh sách (vd. khi sinh cạnh ngược
+  chỉ cần duyệt range(len(store)) lúc bắt đầu).
+"""
+
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+NO_EVIDENCE = -1
+NO_ORIGIN = -1
+# Đóng gói (source, target, type) vào một số nguyên: 26 bit cho node, 12 bit cho loại quan hệ
+NODE_BITS = 26
+TYPE_BITS = 12
+
+
+class Interner:
+    """Ánh xạ hai chiều chuỗi <-> số nguyên liên tiếp."""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.ids: Dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        idx = self.ids.get(value)
+        if idx is None:
+            idx = len(self.values)
+            self.ids[value] = idx
+            self.values.append(value)
+        return idx
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class EdgeStore:
+    def __init__(self, inferred_evidence: Optional[Callable[[str, str, str], str]] = None):
+        """
+        inferred_evidence(src, rel_type, tgt) dựng evidence cho cạnh suy luận từ cạnh gốc
+        src -[rel_type]-> tgt (chỉ gọi khi xuất).
+        """
+        self.nodes = Interner()
+        self.types = Interner()
+        self.evidences = Interner()
+        self.src = array("i")
+        self.tgt = array("i")
+        self.rel = array("i")
+        self.evidence = array("i")
+        self.origin = array("i")
+        self._keys = set()
+        self.inferred_evidence = inferred_evidence
+
+    def __len__(self) -> int:
+        return len(self.src)
+
+    @staticmethod
+    def _key(src: int, tgt: int, rel: int) -> int:
+        return (((src << NODE_BITS) | tgt) << TYPE_BITS) | rel
+
+    def contains(self, source: str, target: str, rel_type: str) -> bool:
+        ids = (self.nodes.ids.get(source), self.nodes.ids.get(target), self.types.ids.get(rel_type))
+        return None not in ids and self._key(*ids) in self._keys
+
+    def add(self, source: str, target: str, rel_type: str, evidence: Optional[str] = None) -> bool:
+        """Thêm cạnh nếu bộ ba (source, target, type) chưa có. Trả về True nếu đã thêm."""
+        src = self.nodes.intern(source)
+        tgt = self.nodes.intern(target)
+        rel = self.types.intern(rel_type)
+        key = self._key(src, tgt, rel)
+        if key in self._keys:
+            return False
+        # Chỉ intern evidence khi cạnh thực sự được thêm
+        self._append(key, src, tgt, rel, self.evidences.intern(evidence) if evidence is not None else NO_EVIDENCE,
+                     NO_ORIGIN)
+        return True
+
+    def add_ids(self, src: int, tgt: int, rel: int, evidence: int = NO_EVIDENCE, origin: int = NO_ORIGIN) -> bool:
+        """Như add() nhưng với id đã intern; origin >= 0 => cạnh suy luận, evidence tham chiếu tới cạnh gốc."""
+        key = self._key(src, tgt, rel)
+        if key in self._keys:
+            return False
+        self._append(key, src, tgt, rel, evidence, origin)
+        return True
+
+    def _append(self, key: int, src: int, tgt: int, rel: int, evidence: int, origin: int):
+        self._keys.add(key)
+        self.src.append(src)
+        self.tgt.append(tgt)
+        self.rel.append(rel)
+        self.evidence.append(evidence)
+        self.origin.append(origin)
+
+    # --- Đọc ---
+    def source_of(self, i: int) -> str:
+        return self.nodes.values[self.src[i]]
+
+    def target_of(self, i: int) -> str:
+        return self.nodes.values[self.tgt[i]]
+
+    def type_of(self, i: int) -> str:
+        return self.types.values[self.rel[i]]
+
+    def evidence_of(self, i: int) -> str:
+        origin = self.origin[i]
+        if origin != NO_ORIGIN and self.inferred_evidence is not None:
+            return self.inferred_evidence(self.source_of(origin), self.type_of(origin), self.target_of(origin))
+        evidence = self.evidence[i]
+        return self.evidences.values[evidence] if evidence != NO_EVIDENCE else ""
+
+    def row(self, i: int) -> Dict[str, str]:
+        return {
+            "source": self.source_of(i),
+            "target": self.target_of(i),
+            "type": self.type_of(i),
+            "evidence": self.evidence_of(i),
+        }
+
+    def iter_rows(self, indices: Optional[Iterable[int]] = None) -> Iterator[Dict[str, str]]:
+        for i in (range(len(self)) if indices is None else indices):
+            yield self.row(i)
@@ -0,0 +1,279 @@
+"""
+Cache HTTP trên đĩa (SQLite, body nén zlib) dùng chung cho mọi script gọi Wikipedia API.
+
+- Khóa: sha256 của (endpoint, params đã chuẩn hóa) => cùng một truy vấn ở stage nào cũng trúng cache.
+- Revision-aware: lưu revid của từng trang có trong response, cho phép xóa các entry đã cũ
+  khi biết revid mới nhất (xem `invalidate_changed`).
+- Giới hạn dung lượng với cơ chế loại bỏ LRU (theo thời điểm truy cập gần nhất).
+- Chế độ offline: cache miss => raise `CacheMiss` ngay, không gọi mạng.
+
+Cấu hình qua biến môi trường:
+    WIKI_CACHE_PATH     đường dẫn file SQLite (mặc định data/cache/wiki_http.sqlite)
+    WIKI_CACHE_MAX_MB   dung lượng tối đa (MB, tính trên body đã nén; mặc định 2048)
+    WIKI_CACHE_OFFLINE  "1" => chỉ đọc cache
+    WIKI_CACHE_DISABLE  "1" => bỏ qua cache, luôn gọi mạng
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import requests
+
+DEFAULT_CACHE_PATH = Path("data/cache/wiki_http.sqlite")
+DEFAULT_MAX_MB = 2048
+
+
+class CacheMiss(Exception):
+    """Raise khi ở chế độ offline mà truy vấn chưa có trong cache."""
+
+
+def normalize_params(params: Dict) -> Dict[str, str]:
+    """Chuẩn hóa params để hai truy vấn tương đương cho cùng một khóa."""
+    normalized = {}
+    for key, value in params.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            value = int(value)
+        value = str(value)
+        # Thứ tự title trong titles=A|B|... không ảnh hưởng nội dung trả về
+        if key in ("titles", "pageids", "revids"):
+            value = "|".join(sorted(value.split("|")))
+        normalized[str(key)] = value
+    return dict(sorted(normalized.items()))
+
+
+def cache_key(url: str, params: Dict) -> str:
+    payload = json.dumps([url, normalize_params(params)], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def extract_revids(data: Dict) -> Dict[str, int]:
+    """Lấy {title: revid} từ response action=query (formatversion 1 hoặc 2)."""
+    pages = (data.get("query") or {}).get("pages") or []
+    if isinstance(pages, dict):
+        pages = pages.values()
+    revids = {}
+    for page in pages:
+        title = page.get("title")
+        if not title:
+            continue
+        revid = page.get("lastrevid")
+        revs = page.get("revisions") or []
+        if revs and revs[0].get("revid"):
+            revid = revs[0]["revid"]
+        if revid:
+            revids[title] = int(revid)
+    return revids
+
+
+class HttpCache:
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+                 offline: bool = False):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                params TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at);
+            CREATE TABLE IF NOT EXISTS page_revisions (
+                key TEXT NOT NULL,
+                title TEXT NOT NULL,
+                revid INTEGER NOT NULL,
+                PRIMARY KEY (key, title)
+            );
+            CREATE INDEX IF NOT EXISTS idx_page_revisions_title ON page_revisions(title);
+            """
+        )
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    # --- Đọc / ghi ---
+    def get(self, url: str, params: Dict) -> Optional[Dict]:
+        key = cache_key(url, params)
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def put(self, url: str, params: Dict, data: Dict):
+        key = cache_key(url, params)
+        body = zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"), 6)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if old:
+                self._total_bytes -= old[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, url, params, body, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, url, json.dumps(normalize_params(params), ensure_ascii=False), body, len(body), now, now),
+            )
+            self._conn.execute("DELETE FROM page_revisions WHERE key = ?", (key,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO page_revisions (key, title, revid) VALUES (?, ?, ?)",
+                [(key, title, revid) for title, revid in extract_revids(data).items()],
+            )
+            self._total_bytes += len(body)
+            self._evict_locked()
+            self._conn.commit()
+
+    def get_json(self, url: str, params: Dict, headers: Optional[Dict] = None, timeout: float = 10,
+                 session: Optional[requests.Session] = None) -> Dict:
+        """
+        Trả về JSON của GET url?params, ưu tiên cache. Chỉ response HTTP 2xx không chứa
+        lỗi API mới được lưu. Offline + miss => CacheMiss.
+        """
+        cached = self.get(url, params)
+        if cached is not None:
+            return cached
+        if self.offline:
+            raise CacheMiss(f"Offline: chưa có trong cache {url} {normalize_params(params)}")
+
+        getter = session.get if session is not None else requests.get
+        resp = getter(url, params=params, headers=headers, timeout=timeout)
+        resp.raise_for_status()
+        data = resp.json()
+        if "error" not in data:
+            self.put(url, params, data)
+        return data
+
+    # --- Revision ---
+    def invalidate_changed(self, current_revids: Dict[str, int]) -> int:
+        """Xóa mọi entry chứa trang có revid khác với `current_revids` {title: revid}. Trả về số entry bị xóa."""
+        stale = set()
+        with self._lock:
+            for title, revid in current_revids.items():
+                rows = self._conn.execute(
+                    "SELECT key FROM page_revisions WHERE title = ? AND revid != ?", (title, int(revid))
+                ).fetchall()
+                stale.update(r[0] for r in rows)
+            self._delete_keys_locked(stale)
+            self._conn.commit()
+        return len(stale)
+
+    def invalidate_titles(self, titles: Iterable[str]) -> int:
+        """Xóa mọi entry có chứa một trong các trang `titles` (bất kể revid)."""
+        stale = set()
+        with self._lock:
+            for title in titles:
+                rows = self._conn.execute("SELECT key FROM page_revisions WHERE title = ?", (title,)).fetchall()
+                stale.update(r[0] for r in rows)
+            self._delete_keys_locked(stale)
+            self._conn.commit()
+        return len(stale)
+
+    # --- LRU ---
+    def _delete_keys_locked(self, keys: Iterable[str]):
+        for key in keys:
+            row = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._total_bytes -= row[0]
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.execute("DELETE FROM page_revisions WHERE key = ?", (key,))
+
+    def _evict_locked(self):
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key FROM responses ORDER BY accessed_at ASC LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for (key,) in rows:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._delete_keys_locked([key])
+                self.evictions += 1
+
+    # --- Thống kê ---
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": self._total_bytes,
+        }
+
+    def print_stats(self):
+        s = self.stats()
+        print(f"ℹ️ HTTP cache: {s['hits']} hit / {s['misses']} miss (hit rate {s['hit_rate']:.1%}), "
+              f"{s['entries']} entry, {s['bytes'] / 1024 / 1024:.1f} MB, {s['evictions']} bị loại (LRU)")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache: Optional[HttpCache] = None
+_default_lock = threading.Lock()
+
+
+def get_cache() -> Optional[HttpCache]:
+    """Cache mặc định của tiến trình (cấu hình bằng biến môi trường). None nếu WIKI_CACHE_DISABLE=1."""
+    global _default_cache
+    if os.environ.get("WIKI_CACHE_DISABLE") == "1":
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = HttpCache(
+                path=Path(os.environ.get("WIKI_CACHE_PATH", DEFAULT_CACHE_PATH)),
+                max_bytes=int(float(os.environ.get("WIKI_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024),
+                offline=os.environ.get("WIKI_CACHE_OFFLINE") == "1",
+            )
+        return _default_cache
+
+
+def get_json(url: str, params: Dict, headers: Optional[Dict] = None, timeout: float = 10,
+             session: Optional[requests.Session] = None, use_cache: bool = True) -> Dict:
+    """
+    GET JSON qua cache mặc định (hoặc gọi mạng trực tiếp nếu cache bị tắt / use_cache=False,
+    ví dụ khi hỏi revid mới nhất để kiểm tra độ mới của cache).
+    """
+    cache = get_cache() if use_cache else None
+    if cache is None:
+        getter = session.get if session is not None else requests.get
+        resp = getter(url, params=params, headers=headers, timeout=timeout)
+        resp.raise_for_status()
+        return resp.json()
+    return cache.get_json(url, params, headers=headers, timeout=timeout, session=session)
+
+
+def print_stats():
+    cache = get_cache()
+    if cache is not None:
+        cache.print_stats()
@@ -0,0 +1,101 @@
+"""
+Phân giải đích của [[link]] / tên trang về title chuẩn của node bằng các bảng băm dựng một lần,
+thay cho việc duyệt toàn bộ danh sách title cho mỗi link.
+
+Thứ tự thử (mỗi bước là một lần tra dict):
+1. khớp chính xác;
+2. chuẩn hóa kiểu MediaWiki (bỏ anchor "#...", '_' -> ' ', gộp khoảng trắng, viết hoa chữ đầu);
+3. không phân biệt hoa thường (casefold);
+4. đi theo trang đổi hướng (nếu có bảng redirect, ví dụ lấy từ page store), tối đa MAX_REDIRECT_HOPS bước.
+
+Dùng chung cho các bước enrich, crawler và script upload.
+"""
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from common.xml_dump import MAX_REDIRECT_HOPS, normalize_title
+
+
+def fold(title: str) -> str:
+    return normalize_title(title).casefold()
+
+
+def load_redirects(store_path: Path) -> Dict[str, str]:
+    """Bảng redirect {title nguồn: title đích} từ page store; rỗng nếu store chưa được dựng."""
+    store_path = Path(store_path)
+    if not store_path.exists():
+        return {}
+    from common.page_store import PageStore
+
+    store = PageStore(store_path)
+    try:
+        return dict(store.iter_redirects())
+    finally:
+        store.close()
+
+
+class LinkResolver:
+    def __init__(self, titles: Iterable[str], redirects: Optional[Dict[str, str]] = None):
+        """
+        titles: các title hợp lệ (node). redirects: {title trang đổi hướng: title đích}.
+        Nếu nhiều title trùng nhau sau casefold, title xuất hiện sau cùng được dùng (giống title_lookup cũ).
+        """
+        self.exact: Dict[str, str] = {}
+        self.folded: Dict[str, str] = {}
+        for title in titles:
+            if not title:
+                continue
+            self.exact[title] = title
+            self.exact.setdefault(normalize_title(title), title)
+            self.folded[fold(title)] = title
+        self.redirects: Dict[str, str] = {}
+        for source, target in (redirects or {}).items():
+            if source and target:
+                self.redirects[normalize_title(source)] = target
+                self.redirects.setdefault(fold(source), target)
+
+    def _lookup(self, link: str) -> Optional[str]:
+        title = self.exact.get(link)
+        if title is not None:
+            return title
+        normalized = normalize_title(link)
+        title = self.exact.get(normalized)
+        if title is not None:
+            return title
+        return self.folded.get(normalized.casefold())
+
+    def resolve(self, link: str) -> Optional[str]:
+        """Title node ứng với `link`, hoặc None nếu link không trỏ tới node nào."""
+        if not link:
+            return None
+        for _ in range(MAX_REDIRECT_HOPS + 1):
+            title = self._lookup(link)
+            if title is not None:
+                return title
+            normalized = normalize_title(link)
+            target = self.redirects.get(normalized) or self.redirects.get(normalized.casefold())
+            if not target or target == link:
+                return None
+            link = target
+        return None
+
+    def __contains__(self, link: str) -> bool:
+        return self.resolve(link) is not None
+
+
+def canonicalize_edges(edges: List[Dict], resolver: LinkResolver) -> Tuple[List[Dict], int]:
+    """
+    Đưa source/target của các cạnh về title node chuẩn; bỏ cạnh có đầu mút không phân giải được.
+    Trả về (danh sách cạnh đã chuẩn hóa, số cạnh bị bỏ).
+    """
+    kept = []
+    dropped = 0
+    for edge in edges:
+        source = resolver.resolve(edge.get("source", ""))
+        target = resolver.resolve(edge.get("target", ""))
+        if source is None or target is None:
+            dropped += 1
+            continue
+        kept.append({**edge, "source": source, "target": target})
+    return kept, dropped
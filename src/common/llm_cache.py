@@ -0,0 +1,188 @@
+"""
+Cache kết quả gọi LLM trên đĩa (SQLite) dùng chung cho llm_re, remake_edges_ai, generate_test_set...
+Chạy lại sau khi crash / đổi luật chỉ gọi model cho những input chưa gặp.
+
+- Khóa: sha256 của (namespace, provider, model, phiên bản prompt, input đã chuẩn hóa).
+  Input chuẩn hóa: chuỗi về NFC, gộp khoảng trắng; dict sắp theo khóa => cùng nội dung thì cùng khóa.
+- Namespace = tên script / tác vụ; `invalidate(namespace)` xóa cả namespace, hoặc chỉ các entry
+  khác phiên bản prompt hiện tại (`keep_version`).
+- Nhiều thread / tiến trình cùng đọc ghi: SQLite WAL + busy timeout, một khóa cho connection.
+- Thống kê hit / miss / ghi theo từng namespace (`stats`, `print_stats`).
+
+Cấu hình qua biến môi trường:
+    LLM_CACHE_PATH      đường dẫn file SQLite (mặc định data/cache/llm_responses.sqlite)
+    LLM_CACHE_DISABLE   "1" => bỏ qua cache, luôn gọi model
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+DEFAULT_CACHE_PATH = Path("data/cache/llm_responses.sqlite")
+
+
+def normalize_inputs(value: Any) -> Any:
+    """Chuẩn hóa input trước khi băm: NFC + gộp khoảng trắng cho chuỗi, đệ quy cho list / dict."""
+    if isinstance(value, str):
+        return " ".join(unicodedata.normalize("NFC", value).split())
+    if isinstance(value, dict):
+        return {str(k): normalize_inputs(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        return [normalize_inputs(v) for v in value]
+    return value
+
+
+def prompt_key(namespace: str, provider: str, model: str, version: str, inputs: Any) -> str:
+    payload = json.dumps([namespace, provider, model, version, normalize_inputs(inputs)],
+                         ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH):
+        self.path = Path(path)
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self.writes: Counter = Counter()
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # timeout: chờ khóa ghi khi tiến trình khác đang ghi cùng file
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                provider TEXT NOT NULL,
+                model TEXT NOT NULL,
+                version TEXT NOT NULL,
+                inputs TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_responses_namespace ON responses(namespace, version);
+            """
+        )
+        self._conn.commit()
+
+    # --- Đọc / ghi ---
+    def get(self, namespace: str, provider: str, model: str, version: str, inputs: Any) -> Optional[Any]:
+        """Kết quả đã lưu (đã giải mã JSON) hoặc None."""
+        key = prompt_key(namespace, provider, model, version, inputs)
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses[namespace] += 1
+                return None
+            self.hits[namespace] += 1
+        return json.loads(row[0])
+
+    def put(self, namespace: str, provider: str, model: str, version: str, inputs: Any, response: Any):
+        self.put_many(namespace, provider, model, version, [(inputs, response)])
+
+    def put_many(self, namespace: str, provider: str, model: str, version: str,
+                 entries: Iterable[Tuple[Any, Any]]):
+        """Ghi nhiều (inputs, response) trong một transaction."""
+        now = time.time()
+        rows = []
+        for inputs, response in entries:
+            normalized = normalize_inputs(inputs)
+            rows.append((
+                prompt_key(namespace, provider, model, version, normalized), namespace, provider, model, version,
+                json.dumps(normalized, ensure_ascii=False), json.dumps(response, ensure_ascii=False), now,
+            ))
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO responses (key, namespace, provider, model, version, inputs, response, "
+                "created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            self.writes[namespace] += len(rows)
+
+    def cached_call(self, namespace: str, provider: str, model: str, version: str, inputs: Any,
+                    call: Callable[[], Any]) -> Any:
+        """
+        Trả về kết quả đã lưu nếu có; nếu không thì gọi `call()` và lưu kết quả.
+        `call()` trả về None (lỗi / không dùng được) thì không lưu, lần sau sẽ gọi lại.
+        """
+        cached = self.get(namespace, provider, model, version, inputs)
+        if cached is not None:
+            return cached
+        response = call()
+        if response is not None:
+            self.put(namespace, provider, model, version, inputs, response)
+        return response
+
+    # --- Vô hiệu hóa ---
+    def invalidate(self, namespace: str, keep_version: Optional[str] = None) -> int:
+        """
+        Xóa các entry của `namespace` (chỉ các entry khác `keep_version` nếu có).
+        Trả về số entry bị xóa.
+        """
+        with self._lock:
+            if keep_version is None:
+                cur = self._conn.execute("DELETE FROM responses WHERE namespace = ?", (namespace,))
+            else:
+                cur = self._conn.execute("DELETE FROM responses WHERE namespace = ? AND version != ?",
+                                         (namespace, keep_version))
+            self._conn.commit()
+        return cur.rowcount
+
+    # --- Thống kê ---
+    def stats(self, namespace: Optional[str] = None) -> Dict:
+        with self._lock:
+            if namespace is None:
+                entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            else:
+                entries = self._conn.execute("SELECT COUNT(*) FROM responses WHERE namespace = ?",
+                                             (namespace,)).fetchone()[0]
+        if namespace is None:
+            hits, misses, writes = sum(self.hits.values()), sum(self.misses.values()), sum(self.writes.values())
+        else:
+            hits, misses, writes = self.hits[namespace], self.misses[namespace], self.writes[namespace]
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": (hits / total) if total else 0.0,
+            "writes": writes,
+            "entries": entries,
+        }
+
+    def print_stats(self, namespace: Optional[str] = None):
+        s = self.stats(namespace)
+        label = f"LLM cache [{namespace}]" if namespace else "LLM cache"
+        print(f"ℹ️ {label}: {s['hits']} hit / {s['misses']} miss (hit rate {s['hit_rate']:.1%}), "
+              f"{s['writes']} ghi mới, {s['entries']} entry")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache: Optional[LLMCache] = None
+_default_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Cache mặc định của tiến trình (cấu hình bằng biến môi trường). None nếu LLM_CACHE_DISABLE=1."""
+    global _default_cache
+    if os.environ.get("LLM_CACHE_DISABLE") == "1":
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache(Path(os.environ.get("LLM_CACHE_PATH", DEFAULT_CACHE_PATH)))
+        return _default_cache
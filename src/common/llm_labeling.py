@@ -0,0 +1,352 @@
+"""
+Gán nhãn quan hệ bằng LLM theo lô, chạy song song bằng asyncio.
+
+- Nhiều bộ (subject, target, sentence) được gói vào một prompt có cấu trúc (mỗi dòng một JSON
+  có id), LLM trả về một mảng JSON [{"id", "label"}] => số request giảm ~ batch_size lần.
+- Tối đa `concurrency` request cùng lúc; tốc độ giới hạn bởi token bucket theo request/phút
+  và token/phút (ước lượng từ độ dài prompt).
+- 429 / 5xx / lỗi mạng / phản hồi không đúng định dạng: thử lại với backoff lũy thừa có jitter
+  (tôn trọng header Retry-After nếu có); hết số lần thử thì cả lô nhận nhãn mặc định.
+- Có cache (common/llm_cache.py): cặp đã gán nhãn ở lần chạy trước không được gửi lại; nhãn được
+  lưu theo từng cặp nên cách chia lô không ảnh hưởng tới việc trúng cache.
+
+Backend gọi thẳng REST bằng requests (giống các script khác trong repo), không cần SDK:
+- `OpenAIChatBackend`: mọi endpoint tương thích OpenAI /chat/completions (OpenAI, OpenRouter,
+  server giả lập benchmarks/llm_stub_server.py...).
+- `GeminiBackend`: generateContent của Google AI; gặp 404 thì chuyển sang model kế tiếp.
+"""
+
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import requests
+
+DEFAULT_LABEL = "LIEN_KET"
+# Đổi khi nội dung prompt / cách đọc kết quả thay đổi
+PROMPT_VERSION = "2"
+# Bộ nhãn gợi ý trong prompt; nhãn luật của llm_re --cascade cũng được ánh xạ về bộ này
+LABELS = (
+    "DOI_DAU", "PHOI_NGAU", "LA_CHA_ME_CUA", "LA_CON_CUA", "KE_NHIEM", "CHI_HUY", "THAM_GIA", "PHUC_VU",
+    "DUOC_BO_NHIEM_BOI", "KY_HIEP_UOC", "SINH_TAI", "MAT_TAI",
+)
+LABEL_EXAMPLES = ", ".join(LABELS)
+
+BATCH_PROMPT_TEMPLATE = """
+Bạn là hệ thống gán nhãn quan hệ. Mỗi dòng dưới đây là một JSON gồm id, subject (chủ đề bài viết),
+target và sentence. Với từng dòng, dựa vào sentence hãy xác định quan hệ giữa subject và target.
+Mỗi nhãn ngắn gọn dạng SNAKE_CASE, viết hoa. Nếu không rõ, dùng LIEN_KET.
+Ví dụ nhãn: {examples}.
+Chỉ trả về một mảng JSON, mỗi dòng một phần tử {{"id": <id>, "label": "<NHÃN>"}}, không giải thích.
+{items}
+"""
+
+# Ước lượng token từ số ký tự (tiếng Việt có dấu ~ 3 ký tự / token) cho token bucket
+CHARS_PER_TOKEN = 3
+MAX_TOKENS_PER_ITEM = 20
+
+DEFAULT_OPENAI_BASE_URL = "https://api.openai.com/v1"
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+
+class PairItem(NamedTuple):
+    subject: str
+    target: str
+    sentence: str
+
+
+class LLMError(Exception):
+    """Lỗi khi gọi LLM; `retryable` cho biết có nên thử lại (429, 5xx, mạng, phản hồi hỏng)."""
+
+    def __init__(self, message: str, status: Optional[int] = None, retryable: bool = False,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+def is_retryable_status(status: int) -> bool:
+    return status == 429 or status >= 500
+
+
+def _retry_after(response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    try:
+        return max(float(value), 0.0) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _raise_for_status(response):
+    if response.status_code == 200:
+        return
+    raise LLMError(f"HTTP {response.status_code}: {response.text[:200]}", status=response.status_code,
+                   retryable=is_retryable_status(response.status_code), retry_after=_retry_after(response))
+
+
+# --- Prompt / kết quả ---
+def normalize_label(text: str) -> str:
+    words = (text or "").split()
+    label = re.sub(r"[^A-Z_]", "", words[0].upper()) if words else ""
+    return label if label else DEFAULT_LABEL
+
+
+def build_batch_prompt(items: List[PairItem]) -> str:
+    lines = [
+        json.dumps({"id": i, "subject": item.subject, "target": item.target, "sentence": item.sentence},
+                   ensure_ascii=False)
+        for i, item in enumerate(items, 1)
+    ]
+    return BATCH_PROMPT_TEMPLATE.format(examples=LABEL_EXAMPLES, items="\n".join(lines))
+
+
+def parse_batch_labels(text: str, count: int) -> List[Optional[str]]:
+    """
+    Đọc mảng [{"id", "label"}] trong phản hồi (bỏ qua ```json ... ``` hay chữ thừa quanh mảng).
+    Trả về list dài `count`, None ở các id không có trong phản hồi.
+    Phản hồi không đọc được => LLMError (retryable).
+    """
+    start, end = (text or "").find("["), (text or "").rfind("]")
+    try:
+        data = json.loads(text[start:end + 1]) if 0 <= start < end else None
+    except json.JSONDecodeError:
+        data = None
+    if not isinstance(data, list):
+        raise LLMError(f"Phản hồi không phải mảng JSON: {(text or '')[:200]!r}", retryable=True)
+
+    labels: List[Optional[str]] = [None] * count
+    for entry in data:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            idx = int(entry.get("id"))
+        except (TypeError, ValueError):
+            continue
+        if 1 <= idx <= count:
+            labels[idx - 1] = normalize_label(str(entry.get("label", "")))
+    return labels
+
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    return len(prompt) // CHARS_PER_TOKEN + max_tokens
+
+
+# --- Backend ---
+class OpenAIChatBackend:
+    provider = "openai"
+
+    def __init__(self, api_key: str, model: str, base_url: str = DEFAULT_OPENAI_BASE_URL, timeout: float = 60):
+        self.model = model
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["Content-Type"] = "application/json"
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def complete(self, prompt: str, max_tokens: int) -> str:
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.0,
+            "max_tokens": max_tokens,
+        }
+        try:
+            resp = self.session.post(self.url, json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise LLMError(f"Lỗi kết nối: {e}", retryable=True)
+        _raise_for_status(resp)
+        try:
+            return resp.json()["choices"][0]["message"]["content"] or ""
+        except (ValueError, KeyError, IndexError, TypeError):
+            raise LLMError(f"Phản hồi lạ: {resp.text[:200]}", retryable=True)
+
+
+class GeminiBackend:
+    provider = "gemini"
+
+    def __init__(self, api_key: str, models: List[str], base_url: str = GEMINI_BASE_URL, timeout: float = 60):
+        self.api_key = api_key
+        self.models = list(models)
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._model_index = 0
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> str:
+        return self.models[min(self._model_index, len(self.models) - 1)]
+
+    def _next_model(self, failed: str):
+        with self._lock:
+            # Các request song song có thể cùng gặp 404 với một model: chỉ chuyển một lần
+            if self.model == failed and self._model_index < len(self.models) - 1:
+                self._model_index += 1
+                print(f"  ! Gemini model '{failed}' không dùng được, chuyển sang '{self.model}'")
+                return True
+            return self.model != failed
+
+    def complete(self, prompt: str, max_tokens: int) -> str:
+        model = self.model
+        payload = {
+            "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": {"temperature": 0.0, "maxOutputTokens": max_tokens,
+                                 "response_mime_type": "application/json"},
+        }
+        try:
+            resp = self.session.post(f"{self.base_url}/models/{model}:generateContent",
+                                     params={"key": self.api_key}, json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise LLMError(f"Lỗi kết nối: {e}", retryable=True)
+        if resp.status_code == 404:
+            # Thử ngay model kế tiếp nếu còn
+            raise LLMError(f"Model '{model}' không tồn tại", status=404,
+                           retryable=self._next_model(model), retry_after=0.0)
+        _raise_for_status(resp)
+        try:
+            parts = resp.json()["candidates"][0]["content"]["parts"]
+            return "".join(part.get("text", "") for part in parts)
+        except (ValueError, KeyError, IndexError, TypeError):
+            raise LLMError(f"Phản hồi lạ: {resp.text[:200]}", retryable=True)
+
+
+# --- Giới hạn tốc độ ---
+class TokenBucket:
+    """
+    Token bucket cho asyncio (chỉ dùng trên một event loop, không cần khóa).
+    `per_minute` <= 0 => không giới hạn.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        # Mặc định cho phép dồn tối đa lượng của ~10 giây
+        self.capacity = capacity if capacity is not None else max(per_minute / 6.0, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self, amount: float = 1.0):
+        if self.rate <= 0:
+            return
+        # Yêu cầu lớn hơn sức chứa vẫn phải đi qua được (đợi bucket đầy)
+        amount = min(amount, self.capacity)
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    it = iter(items)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+# --- Engine ---
+class BatchLabeler:
+    def __init__(self, backend, batch_size: int = 20, concurrency: int = 8, requests_per_minute: float = 0,
+                 tokens_per_minute: float = 0, max_retries: int = 5, backoff_base: float = 1.0,
+                 backoff_max: float = 60.0, cache=None, namespace: str = "llm_labeling"):
+        self.backend = backend
+        self.batch_size = max(batch_size, 1)
+        self.concurrency = max(concurrency, 1)
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # common/llm_cache.LLMCache (hoặc None): nhãn lưu theo từng cặp, không theo lô
+        self.cache = cache
+        self.namespace = namespace
+        self.stats = {"items": 0, "cached": 0, "requests": 0, "retries": 0, "failed_batches": 0, "missing": 0}
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    async def _label_batch(self, batch: List[PairItem]) -> List[Optional[str]]:
+        """Nhãn của từng cặp; None nếu cả lô lỗi hoặc phản hồi thiếu cặp đó (không lưu cache)."""
+        prompt = build_batch_prompt(batch)
+        max_tokens = MAX_TOKENS_PER_ITEM * len(batch) + 16
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            await self._request_bucket.acquire(1)
+            await self._token_bucket.acquire(estimate_tokens(prompt, max_tokens))
+            self.stats["requests"] += 1
+            try:
+                text = await loop.run_in_executor(self._executor, self.backend.complete, prompt, max_tokens)
+                labels = parse_batch_labels(text, len(batch))
+            except LLMError as e:
+                if not e.retryable or attempt == self.max_retries:
+                    print(f"  ! LLM lỗi, bỏ lô {len(batch)} cặp: {e}")
+                    self.stats["failed_batches"] += 1
+                    return [None] * len(batch)
+                self.stats["retries"] += 1
+                await asyncio.sleep(e.retry_after if e.retry_after is not None else self._backoff(attempt))
+                continue
+            self.stats["missing"] += sum(1 for label in labels if label is None)
+            return labels
+
+    def _uncached(self, items: Iterable[PairItem], on_result) -> Iterator[Tuple[int, PairItem]]:
+        """Yield (index, cặp) chưa có nhãn trong cache; cặp đã có thì trả kết quả ngay."""
+        for index, item in enumerate(items):
+            self.stats["items"] += 1
+            if self.cache is not None:
+                label = self.cache.get(self.namespace, self.backend.provider, self.backend.model,
+                                       PROMPT_VERSION, item._asdict())
+                if label is not None:
+                    self.stats["cached"] += 1
+                    on_result(index, item, label)
+                    continue
+            yield index, item
+
+    async def _run(self, items: Iterable[PairItem], on_result: Callable[[int, PairItem, str], None]):
+        self._request_bucket = TokenBucket(self.requests_per_minute)
+        self._token_bucket = TokenBucket(self.tokens_per_minute)
+
+        async def label_one(batch):
+            return batch, await self._label_batch([item for _, item in batch])
+
+        def deliver(done):
+            # Chạy trên thread của event loop => callback không cần khóa
+            for task in done:
+                batch, labels = task.result()
+                if self.cache is not None:
+                    self.cache.put_many(self.namespace, self.backend.provider, self.backend.model, PROMPT_VERSION,
+                                        [(item._asdict(), label)
+                                         for (_, item), label in zip(batch, labels) if label is not None])
+                for (index, item), label in zip(batch, labels):
+                    on_result(index, item, label or DEFAULT_LABEL)
+
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as self._executor:
+            for batch in batched(self._uncached(items, on_result), self.batch_size):
+                if len(pending) >= self.concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    deliver(done)
+                pending.add(asyncio.ensure_future(label_one(batch)))
+            if pending:
+                done, _ = await asyncio.wait(pending)
+                deliver(done)
+
+    def run(self, items: Iterable[PairItem], on_result: Callable[[int, PairItem, str], None]):
+        """
+        Gán nhãn toàn bộ `items` (đọc dần, không cần nạp hết vào bộ nhớ).
+        `on_result(index, item, label)` được gọi cho từng cặp, index = vị trí trong `items`;
+        thứ tự gọi theo thứ tự các lô hoàn thành, không theo index.
+        """
+        asyncio.run(self._run(items, on_result))
+        return self.stats
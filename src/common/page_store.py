@@ -0,0 +1,180 @@
+"""
+Kho trang nhị phân (page store) dùng chung cho các bước enrich: chuyển đổi một lần từ dump
+(hoặc JSONL wikitext), sau đó mọi script mở lại bằng mmap và lấy trang theo page_id / title
+mà không phải parse lại JSONL hay XML.
+
+Cấu trúc thư mục store:
+    data.bin      các blob UTF-8 (wikitext, plaintext) nối liền nhau, đọc qua mmap
+    index.sqlite  bảng pages(page_id, ns, title, redirect, offset/độ dài của từng blob)
+
+Tra theo title dùng cùng quy tắc chuẩn hóa với `xml_dump.normalize_title` và đi theo
+trang đổi hướng (nếu store có chứa trang đổi hướng).
+"""
+
+import mmap
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from common.xml_dump import MAX_REDIRECT_HOPS, normalize_title
+
+DATA_FILE = "data.bin"
+INDEX_FILE = "index.sqlite"
+
+
+class PageStoreWriter:
+    """Ghi store vào thư mục tạm `<path>.tmp`, chỉ thay thế `path` khi close() thành công."""
+
+    def __init__(self, path: Path, batch_size: int = 5000):
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(self.path.name + ".tmp")
+        if self.tmp_path.exists():
+            shutil.rmtree(self.tmp_path)
+        self.tmp_path.mkdir(parents=True)
+        self._data = open(self.tmp_path / DATA_FILE, "wb")
+        self._offset = 0
+        self._conn = sqlite3.connect(str(self.tmp_path / INDEX_FILE))
+        self._conn.execute(
+            "CREATE TABLE pages (page_id INTEGER PRIMARY KEY, ns INTEGER NOT NULL, title TEXT NOT NULL, "
+            "redirect TEXT, wikitext_offset INTEGER NOT NULL, wikitext_length INTEGER NOT NULL, "
+            "plaintext_offset INTEGER, plaintext_length INTEGER)"
+        )
+        self._rows = []
+        self.batch_size = batch_size
+        self.count = 0
+
+    def _write_blob(self, text: Optional[str]):
+        if text is None:
+            return None, None
+        raw = text.encode("utf-8")
+        offset = self._offset
+        self._data.write(raw)
+        self._offset += len(raw)
+        return offset, len(raw)
+
+    def add(self, page: Dict):
+        """page: {page_id, title, ns?, redirect?, wikitext, plaintext?}"""
+        wt_offset, wt_length = self._write_blob(page.get("wikitext") or "")
+        pt_offset, pt_length = self._write_blob(page.get("plaintext"))
+        self._rows.append((int(page["page_id"]), int(page.get("ns") or 0), page["title"], page.get("redirect"),
+                           wt_offset, wt_length, pt_offset, pt_length))
+        self.count += 1
+        if len(self._rows) >= self.batch_size:
+            self._flush_rows()
+
+    def _flush_rows(self):
+        self._conn.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)", self._rows)
+        self._rows.clear()
+
+    def close(self):
+        self._flush_rows()
+        self._conn.execute("CREATE INDEX idx_pages_title ON pages(title)")
+        self._conn.commit()
+        self._conn.close()
+        self._data.close()
+        if self.path.exists():
+            shutil.rmtree(self.path)
+        self.tmp_path.replace(self.path)
+
+
+class PageStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._conn = sqlite3.connect(str(self.path / INDEX_FILE), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._file = open(self.path / DATA_FILE, "rb")
+        size = (self.path / DATA_FILE).stat().st_size
+        # mmap không nhận file rỗng
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def _text(self, offset: Optional[int], length: Optional[int]) -> Optional[str]:
+        if offset is None:
+            return None
+        return self._mm[offset:offset + length].decode("utf-8")
+
+    def _row_to_page(self, row) -> Dict:
+        page_id, ns, title, redirect, wt_offset, wt_length, pt_offset, pt_length = row
+        return {
+            "page_id": page_id,
+            "ns": ns,
+            "title": title,
+            "redirect": redirect,
+            "wikitext": self._text(wt_offset, wt_length),
+            "plaintext": self._text(pt_offset, pt_length),
+        }
+
+    def _query_one(self, sql: str, args: tuple):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchone()
+
+    def get(self, page_id: int) -> Optional[Dict]:
+        row = self._query_one("SELECT * FROM pages WHERE page_id = ?", (int(page_id),))
+        return self._row_to_page(row) if row else None
+
+    def get_by_title(self, title: str, follow_redirects: bool = True) -> Optional[Dict]:
+        title = normalize_title(title)
+        for _ in range(MAX_REDIRECT_HOPS + 1):
+            if not title:
+                return None
+            row = self._query_one("SELECT * FROM pages WHERE title = ?", (title,))
+            if row is None:
+                return None
+            page = self._row_to_page(row)
+            if follow_redirects and page["redirect"]:
+                title = normalize_title(page["redirect"])
+                continue
+            return page
+        return None
+
+    def get_many(self, titles: Iterable[str]) -> Dict[str, Dict]:
+        """{title yêu cầu: trang} cho các title có trong store (bỏ qua trang rỗng)."""
+        results = {}
+        for title in titles:
+            page = self.get_by_title(title)
+            if page is not None and page["wikitext"]:
+                results[title] = page
+        return results
+
+    def iter_pages(self, ns: Optional[int] = 0, include_redirects: bool = False) -> Iterator[Dict]:
+        """Duyệt các trang theo thứ tự page_id."""
+        sql = "SELECT * FROM pages"
+        conditions = []
+        args = []
+        if ns is not None:
+            conditions.append("ns = ?")
+            args.append(ns)
+        if not include_redirects:
+            conditions.append("redirect IS NULL")
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY page_id"
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        for row in rows:
+            yield self._row_to_page(row)
+
+    def iter_redirects(self, ns: Optional[int] = 0) -> Iterator[Tuple[str, str]]:
+        """Duyệt (title trang đổi hướng, title đích); chỉ đọc index, không chạm tới data.bin."""
+        sql = "SELECT title, redirect FROM pages WHERE redirect IS NOT NULL"
+        args = []
+        if ns is not None:
+            sql += " AND ns = ?"
+            args.append(ns)
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        for title, redirect in rows:
+            yield title, redirect
+
+    def __len__(self) -> int:
+        return self._query_one("SELECT COUNT(*) FROM pages", ())[0]
+
+    def __contains__(self, title: str) -> bool:
+        return self.get_by_title(title) is not None
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+        self._conn.close()
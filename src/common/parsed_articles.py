@@ -0,0 +1,300 @@
+"""
+Kho kết quả parse wikitext dùng chung cho các bước enrich: mỗi bài chỉ chạy
+`mwparserfromhell.parse(...).strip_code()` một lần, các bước sau đọc lại kết quả.
+
+Mỗi mục (khóa = sha256 của wikitext, nên tự mất hiệu lực khi bài thay đổi) gồm:
+- plaintext: đúng bằng `strip_code()` của wikitext;
+- sentences: (start, end) của từng câu trong plaintext (common/sentences.py);
+- links: (start, end, title) của từng [[wikilink]] có hiển thị trong plaintext
+  (vị trí phần chữ hiển thị của link trên plaintext).
+
+Cấu trúc thư mục store (giống page_store):
+    data.bin      plaintext UTF-8 + mảng int32 vị trí câu / link, nối liền nhau, đọc qua mmap
+    index.sqlite  bảng parsed(hash, offset/độ dài của từng blob, title các link) + bảng meta(version)
+
+Câu được lấy bằng cách cắt plaintext theo vị trí, không dựng sẵn danh sách chuỗi câu.
+"""
+
+import hashlib
+import mmap
+import re
+import shutil
+import sqlite3
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import mwparserfromhell
+from mwparserfromhell.nodes import ExternalLink, Heading, Tag, Wikilink
+from mwparserfromhell.definitions import is_visible
+
+from common.sentences import SEGMENTER_VERSION, sentence_spans
+
+# Đổi khi cách render plaintext / lấy link thay đổi; cùng với SEGMENTER_VERSION quyết định store cũ
+# còn dùng được hay không
+PARSER_VERSION = "1"
+STORE_VERSION = f"{PARSER_VERSION}-{SEGMENTER_VERSION}"
+DATA_FILE = "data.bin"
+INDEX_FILE = "index.sqlite"
+STRIP_KWARGS = {"normalize": True, "collapse": True, "keep_template_params": False}
+
+Span = Tuple[int, int]
+LinkSpan = Tuple[int, int, str]
+
+
+def wikitext_hash(wikitext: str) -> str:
+    return hashlib.sha256((wikitext or "").encode("utf-8")).hexdigest()
+
+
+# --- Render plaintext kèm vị trí link ---
+def _collapse(text: str, links: List[LinkSpan]) -> Tuple[str, List[LinkSpan]]:
+    """
+    Như bước collapse của Wikicode.strip_code: bỏ '\\n' ở hai đầu, mọi dãy >= 3 '\\n' còn 2;
+    đồng thời dời vị trí link cho khớp văn bản mới.
+    """
+    lead = len(text) - len(text.lstrip("\n"))
+    body = text.strip("\n")
+    # (vị trí trong body, số ký tự đã bỏ tính tới hết dãy đó)
+    cuts = []
+    removed = 0
+    pieces = []
+    pos = 0
+    for m in re.finditer(r"\n{3,}", body):
+        pieces.append(body[pos:m.start() + 2])
+        removed += len(m.group()) - 2
+        cuts.append((m.start() + 2, m.end(), removed))
+        pos = m.end()
+    pieces.append(body[pos:])
+    collapsed = "".join(pieces)
+    if not links:
+        return collapsed, links
+
+    cut_starts = [start for start, _, _ in cuts]
+
+    def shift(offset: int) -> int:
+        offset = min(max(offset - lead, 0), len(body))
+        i = bisect_right(cut_starts, offset) - 1
+        if i < 0:
+            return offset
+        start, end, removed_total = cuts[i]
+        if offset < end:
+            # nằm trong phần bị bỏ: kẹp về cuối phần còn giữ
+            return start - (removed_total - (end - start))
+        return offset - removed_total
+
+    shifted = []
+    for start, end, title in links:
+        new_start, new_end = shift(start), shift(end)
+        if new_end > new_start:
+            shifted.append((new_start, new_end, title))
+    return collapsed, shifted
+
+
+def _render(code) -> Tuple[str, List[LinkSpan]]:
+    """Tương đương code.strip_code() nhưng trả thêm vị trí các link trong kết quả."""
+    parts = []
+    links: List[LinkSpan] = []
+    pos = 0
+    for node in code.nodes:
+        inner: List[LinkSpan] = []
+        if isinstance(node, Wikilink):
+            text, inner = _render(node.text if node.text is not None else node.title)
+            if text:
+                inner = [(0, len(text), str(node.title).strip())] + inner
+        elif isinstance(node, Tag):
+            text, inner = _render(node.contents) if node.contents and is_visible(str(node.tag)) else ("", [])
+        elif isinstance(node, Heading):
+            text, inner = _render(node.title)
+        elif isinstance(node, ExternalLink):
+            if node.brackets:
+                text, inner = _render(node.title) if node.title else ("", [])
+            else:
+                text, inner = _render(node.url)
+        else:
+            stripped = node.__strip__(**STRIP_KWARGS)
+            text = str(stripped) if stripped else ""
+        if not text:
+            continue
+        parts.append(text)
+        # vị trí trong `text` -> vị trí trong chuỗi ghép của cả đoạn
+        links.extend((start + pos, end + pos, title) for start, end, title in inner)
+        pos += len(text)
+    return _collapse("".join(parts), links)
+
+
+class ParsedArticle:
+    def __init__(self, plaintext: str, sentence_spans: List[Span], links: List[LinkSpan]):
+        self.plaintext = plaintext
+        self.sentence_spans = sentence_spans
+        self.links = links
+
+    def sentences(self) -> Iterator[str]:
+        for start, end in self.sentence_spans:
+            yield self.plaintext[start:end]
+
+    def links_in(self, start: int, end: int) -> List[LinkSpan]:
+        """Các link nằm trọn trong đoạn [start, end) của plaintext, theo thứ tự xuất hiện."""
+        found = []
+        # (start,) đứng trước mọi (start, end, title) => link đầu tiên có vị trí bắt đầu >= start
+        for i in range(bisect_left(self.links, (start,)), len(self.links)):
+            link = self.links[i]
+            if link[0] >= end:
+                break
+            if link[1] <= end:
+                found.append(link)
+        return found
+
+
+def parse_article(wikitext: str) -> ParsedArticle:
+    plaintext, links = _render(mwparserfromhell.parse(wikitext or ""))
+    links.sort(key=lambda link: (link[0], link[1]))
+    return ParsedArticle(plaintext, sentence_spans(plaintext), links)
+
+
+def hash_and_parse(wikitext: str) -> Tuple[str, ParsedArticle]:
+    return wikitext_hash(wikitext), parse_article(wikitext)
+
+
+# --- Store ---
+def _pack_spans(spans) -> bytes:
+    flat = array("i")
+    for span in spans:
+        flat.append(span[0])
+        flat.append(span[1])
+    return flat.tobytes()
+
+
+def _unpack_spans(raw: bytes) -> List[Span]:
+    flat = array("i")
+    flat.frombytes(raw)
+    return list(zip(flat[0::2], flat[1::2]))
+
+
+class ParsedArticleWriter:
+    """Ghi store vào thư mục tạm `<path>.tmp`, chỉ thay thế `path` khi close() thành công."""
+
+    def __init__(self, path: Path, batch_size: int = 5000):
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(self.path.name + ".tmp")
+        if self.tmp_path.exists():
+            shutil.rmtree(self.tmp_path)
+        self.tmp_path.mkdir(parents=True)
+        self._data = open(self.tmp_path / DATA_FILE, "wb")
+        self._offset = 0
+        self._conn = sqlite3.connect(str(self.tmp_path / INDEX_FILE))
+        self._conn.execute("CREATE TABLE meta (version TEXT NOT NULL)")
+        self._conn.execute("INSERT INTO meta VALUES (?)", (STORE_VERSION,))
+        self._conn.execute(
+            "CREATE TABLE parsed (hash TEXT PRIMARY KEY, text_offset INTEGER NOT NULL, text_length INTEGER NOT NULL, "
+            "sent_offset INTEGER NOT NULL, sent_length INTEGER NOT NULL, "
+            "link_offset INTEGER NOT NULL, link_length INTEGER NOT NULL, link_titles TEXT NOT NULL)"
+        )
+        self._rows = []
+        self._seen = set()
+        self.batch_size = batch_size
+        self.count = 0
+
+    def _write_blob(self, raw: bytes) -> Tuple[int, int]:
+        offset = self._offset
+        self._data.write(raw)
+        self._offset += len(raw)
+        return offset, len(raw)
+
+    def add(self, key: str, parsed: ParsedArticle):
+        if key in self._seen:
+            return
+        self._seen.add(key)
+        text = self._write_blob(parsed.plaintext.encode("utf-8"))
+        # Mảng int32 ghi ngay sau plaintext; căn 4 byte cho gọn
+        padding = -self._offset % 4
+        if padding:
+            self._write_blob(b"\0" * padding)
+        sents = self._write_blob(_pack_spans(parsed.sentence_spans))
+        links = self._write_blob(_pack_spans(parsed.links))
+        titles = "\n".join(title for _, _, title in parsed.links)
+        self._rows.append((key, *text, *sents, *links, titles))
+        self.count += 1
+        if len(self._rows) >= self.batch_size:
+            self._flush_rows()
+
+    def _flush_rows(self):
+        self._conn.executemany("INSERT OR REPLACE INTO parsed VALUES (?, ?, ?, ?, ?, ?, ?, ?)", self._rows)
+        self._rows.clear()
+
+    def close(self):
+        self._flush_rows()
+        self._conn.commit()
+        self._conn.close()
+        self._data.close()
+        if self.path.exists():
+            shutil.rmtree(self.path)
+        self.tmp_path.replace(self.path)
+
+
+class ParsedArticleStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._conn = sqlite3.connect(str(self.path / INDEX_FILE), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._file = open(self.path / DATA_FILE, "rb")
+        size = (self.path / DATA_FILE).stat().st_size
+        # mmap không nhận file rỗng
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        row = self._query_one("SELECT version FROM meta", ())
+        self.version = row[0] if row else None
+
+    @classmethod
+    def open_if_current(cls, path: Path) -> Optional["ParsedArticleStore"]:
+        """Mở store nếu tồn tại và cùng STORE_VERSION; ngược lại trả về None."""
+        path = Path(path)
+        if not (path / INDEX_FILE).exists():
+            return None
+        store = cls(path)
+        if store.version != STORE_VERSION:
+            store.close()
+            return None
+        return store
+
+    def _query_one(self, sql: str, args: tuple):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchone()
+
+    def get(self, key: str) -> Optional[ParsedArticle]:
+        row = self._query_one("SELECT text_offset, text_length, sent_offset, sent_length, link_offset, link_length, "
+                              "link_titles FROM parsed WHERE hash = ?", (key,))
+        if row is None:
+            return None
+        text_offset, text_length, sent_offset, sent_length, link_offset, link_length, link_titles = row
+        mm = self._mm
+        plaintext = mm[text_offset:text_offset + text_length].decode("utf-8")
+        sent_spans = _unpack_spans(mm[sent_offset:sent_offset + sent_length])
+        link_spans = _unpack_spans(mm[link_offset:link_offset + link_length])
+        titles = link_titles.split("\n") if link_spans else []
+        links = [(start, end, title) for (start, end), title in zip(link_spans, titles)]
+        return ParsedArticle(plaintext, sent_spans, links)
+
+    def get_for(self, wikitext: str) -> Optional[ParsedArticle]:
+        return self.get(wikitext_hash(wikitext))
+
+    def __contains__(self, key: str) -> bool:
+        return self._query_one("SELECT 1 FROM parsed WHERE hash = ?", (key,)) is not None
+
+    def __len__(self) -> int:
+        return self._query_one("SELECT COUNT(*) FROM parsed", ())[0]
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+        self._conn.close()
+
+
+def parsed_or_parse(store: Optional[ParsedArticleStore], wikitext: str) -> ParsedArticle:
+    """Lấy kết quả từ store nếu có, nếu không thì parse ngay (không ghi lại vào store)."""
+    if store is not None:
+        parsed = store.get_for(wikitext)
+        if parsed is not None:
+            return parsed
+    return parse_article(wikitext)
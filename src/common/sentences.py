@@ -0,0 +1,96 @@
+"""
+Tách câu tiếng Việt dùng chung cho cả pipeline: trả về (start, end) của từng câu trong văn bản
+gốc (đã bỏ khoảng trắng hai đầu), không sao chép từng câu thành chuỗi mới. Người gọi tự cắt
+`text[start:end]` khi cần (evidence, gom mention theo câu...).
+
+Ranh giới câu (một lượt quét bằng regex đã biên dịch):
+- dấu kết câu . ! ? … (có thể kèm ngoặc / nháy đóng) rồi khoảng trắng, và chữ kế tiếp không
+  phải chữ thường (vd. "v.v. và" không bị cắt);
+- không cắt sau chữ viết tắt thông dụng ("TP.", "GS.", "ThS."...) hay chữ cái viết tắt tên ("H. Maspero");
+  riêng I / V / X thường là số La Mã cuối câu ("Rama I.", "khóa X.") nên vẫn cắt;
+- không cắt bên trong [[...]] / {{...}} (khi tách trực tiếp trên wikitext);
+- một dòng trống luôn là ranh giới (đoạn văn, tiêu đề mục).
+
+Khác với các bộ tách cũ mà module này thay thế (ranh giới câu đổi ở mọi nơi gọi):
+- parsed_articles => sentence_re, llm_re, context_link_classify: trước cắt sau mọi . ! ? kể cả khi chữ
+  tiếp theo là chữ thường hay sau chữ viết tắt; nay không cắt ở các chỗ đó, thêm ranh giới ở dòng trống
+  và sau "…".
+- remake_edges, remake_edges_ai: trước chỉ cắt khi chữ tiếp theo là A-Z / Đ, nên không bao giờ cắt trước
+  "Ông", "Ở", "Năm"... (chữ hoa có dấu); nay cắt ở đó => câu ngắn hơn, số lần đồng xuất hiện theo câu giảm.
+"""
+
+import re
+from bisect import bisect_right
+from typing import Iterator, List, Tuple
+
+# Đổi khi quy tắc tách câu thay đổi (kết quả dựng sẵn theo câu cần tính lại)
+SEGMENTER_VERSION = "2"
+
+ABBREVIATIONS = (
+    "TP", "Tp", "tp", "TX", "GS", "PGS", "TS", "ThS", "BS", "KS", "NXB", "Nxb",
+    "St", "Th", "Ph", "Tr", "tr", "ss", "Mr", "Mrs", "Dr", "Jr", "Sr", "vs", "No",
+)
+# Chữ thường tiếng Việt (văn bản Wikipedia ở dạng NFC)
+LOWERCASE = "a-zàáảãạăằắẳẵặâầấẩẫậèéẻẽẹêềếểễệìíỉĩịòóỏõọôồốổỗộơờớởỡợùúủũụưừứửữựỳýỷỹỵđ"
+
+# '.' sau chữ viết tắt / một chữ cái hoa (viết tắt tên, trừ số La Mã I / V / X) không kết thúc câu
+# (lookbehind đặt sau dấu '.' để chỉ được xét khi đã gặp dấu chấm)
+_NOT_ABBREVIATION = "".join(rf"(?<!\b{re.escape(a)}\.)" for a in ABBREVIATIONS) + r"(?<!\b[A-HJ-UWYZĐ]\.)"
+BOUNDARY_RE = re.compile(
+    rf"(?P<end>(?:\.{_NOT_ABBREVIATION}|[.!?…]{{2,}}|[!?…])[\"'”’»)\]]*)(?P<gap>\s+)(?![\s{LOWERCASE}])"
+    r"|(?P<para>[ \t]*\n[ \t]*\n\s*)"
+)
+MARKUP_RE = re.compile(r"\[\[.*?\]\]|\{\{.*?\}\}", re.S)
+
+Span = Tuple[int, int]
+
+
+def _markup_ranges(text: str) -> Tuple[List[int], List[int]]:
+    if "[[" not in text and "{{" not in text:
+        return [], []
+    starts, ends = [], []
+    for m in MARKUP_RE.finditer(text):
+        starts.append(m.start())
+        ends.append(m.end())
+    return starts, ends
+
+
+def _strip_span(text: str, start: int, end: int):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if end > start else None
+
+
+def iter_sentence_spans(text: str) -> Iterator[Span]:
+    """Yield (start, end) của từng câu (đã bỏ khoảng trắng hai đầu) theo thứ tự trong text."""
+    markup_starts, markup_ends = _markup_ranges(text)
+    pos = 0
+    for m in BOUNDARY_RE.finditer(text):
+        end = m.end("end")
+        if end < 0:
+            cut = m.start()
+        else:
+            if markup_starts:
+                i = bisect_right(markup_starts, m.start()) - 1
+                if i >= 0 and m.start() < markup_ends[i]:
+                    continue
+            # Dấu kết câu thuộc về câu trước; khoảng trắng sau nó bị bỏ
+            cut = end
+        span = _strip_span(text, pos, cut)
+        if span is not None:
+            yield span
+        pos = m.end()
+    span = _strip_span(text, pos, len(text))
+    if span is not None:
+        yield span
+
+
+def sentence_spans(text: str) -> List[Span]:
+    return list(iter_sentence_spans(text))
+
+
+def iter_sentences(text: str) -> Iterator[str]:
+    for start, end in iter_sentence_spans(text):
+        yield text[start:end]
@@ -0,0 +1,72 @@
+"""
+Tìm mọi lần nhắc tới các title (node) trong một văn bản bằng một lượt quét Aho-Corasick,
+thay cho vòng lặp `title in text` trên từng title.
+
+- Dựng một lần từ danh sách title; kết quả trả về chỉ số title trong danh sách đó.
+- Tùy chọn `lowercase`: so khớp không phân biệt hoa thường (văn bản được hạ chữ thường
+  nhưng giữ nguyên độ dài => vị trí khớp dùng được trên văn bản gốc).
+- Tùy chọn `word_boundary`: chỉ nhận lần khớp đứng trọn âm tiết, tức ký tự liền trước / liền sau
+  không phải chữ, số hay dấu kết hợp (vd. "Huế" không khớp trong "Huếch").
+"""
+
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from common.aho_corasick import AhoCorasick
+
+
+def lower_same_length(text: str) -> str:
+    """text.lower() nhưng luôn giữ nguyên độ dài (vài ký tự như 'İ' khi hạ thường thành 2 ký tự)."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(ch.lower()[0] for ch in text)
+
+
+def is_word_char(ch: str) -> bool:
+    return ch.isalnum() or unicodedata.category(ch).startswith("M")
+
+
+def at_syllable_boundary(text: str, start: int, end: int) -> bool:
+    """True nếu text[start:end] không dính liền với chữ / số ở hai bên."""
+    if start > 0 and is_word_char(text[start - 1]):
+        return False
+    if end < len(text) and is_word_char(text[end]):
+        return False
+    return True
+
+
+class TitleMatcher:
+    def __init__(self, titles: Iterable[str], lowercase: bool = False, word_boundary: bool = False):
+        self.titles: List[str] = list(titles)
+        self.lowercase = lowercase
+        self.word_boundary = word_boundary
+        keys = [lower_same_length(t) if lowercase else t for t in self.titles]
+        self.automaton = AhoCorasick(keys)
+        # Nhiều title có thể cùng một mẫu (vd. khác nhau chỉ ở hoa thường)
+        self._title_ids: Dict[int, List[int]] = defaultdict(list)
+        for idx, key in enumerate(keys):
+            if key:
+                self._title_ids[self.automaton.pattern_id(key)].append(idx)
+
+    def prepare(self, text: str) -> str:
+        return lower_same_length(text) if self.lowercase else text
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """Yield (start, end, chỉ số title) cho mọi lần nhắc tới (kể cả chồng lấn), theo vị trí kết thúc."""
+        haystack = self.prepare(text)
+        for start, end, pattern_id in self.automaton.finditer(haystack):
+            if self.word_boundary and not at_syllable_boundary(haystack, start, end):
+                continue
+            for idx in self._title_ids[pattern_id]:
+                yield start, end, idx
+
+    def matched_ids(self, text: str) -> Set[int]:
+        """Tập chỉ số các title xuất hiện ít nhất một lần trong `text`."""
+        if self.word_boundary:
+            return {idx for _, _, idx in self.finditer(text)}
+        found = set()
+        for pattern_id in self.automaton.matched_ids(self.prepare(text)):
+            found.update(self._title_ids[pattern_id])
+        return found
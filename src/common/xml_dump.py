@@ -0,0 +1,287 @@
+"""
+Nguồn trang từ file dump XML đã giải nén (viwiki-latest-pages-articles.xml), không cần mạng.
+
+- `build_index`: quét dump một lượt, lưu title -> (byte offset, độ dài) của từng <page> vào SQLite.
+- `stream_pages`: đọc tuần tự cả dump với bộ nhớ cố định (expat), bỏ qua sớm namespace không cần
+  và trang đổi hướng trước khi nội dung của chúng được dựng.
+- `DumpPageSource`: tra cứu theo title bằng index, seek thẳng tới <page> trên đĩa và parse riêng
+  đoạn đó. Có cùng giao diện `fetch_wikitext_batch` / `fetch_wikitext` với DirectGraphCrawler
+  (chuẩn hóa title và đi theo trang đổi hướng như API).
+"""
+
+import bz2
+import sqlite3
+import threading
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional
+from xml.parsers import expat
+from xml.sax.saxutils import unescape
+
+XML_ENTITIES = {"&quot;": '"', "&apos;": "'"}
+MAX_REDIRECT_HOPS = 3
+
+
+def default_index_path(dump_path: Path) -> Path:
+    dump_path = Path(dump_path)
+    return dump_path.with_name(dump_path.name + ".index.sqlite")
+
+
+def normalize_title(title: str) -> str:
+    """Chuẩn hóa title như MediaWiki: bỏ anchor, '_' -> ' ', gộp khoảng trắng, viết hoa chữ đầu."""
+    title = title.split("#", 1)[0].replace("_", " ")
+    title = " ".join(title.split())
+    if not title:
+        return ""
+    return title[0].upper() + title[1:]
+
+
+def _tag_text(line: bytes, tag: bytes) -> Optional[str]:
+    start = line.find(b"<" + tag + b">")
+    if start < 0:
+        return None
+    start += len(tag) + 2
+    end = line.find(b"</" + tag + b">", start)
+    if end < 0:
+        return None
+    return unescape(line[start:end].decode("utf-8"), XML_ENTITIES)
+
+
+def _redirect_target(line: bytes) -> Optional[str]:
+    start = line.find(b'<redirect title="')
+    if start < 0:
+        return None
+    start += len(b'<redirect title="')
+    end = line.find(b'"', start)
+    return unescape(line[start:end].decode("utf-8"), XML_ENTITIES)
+
+
+def iter_page_offsets(dump_path: Path):
+    """
+    Quét dump theo dòng (chế độ nhị phân), yield (title, page_id, ns, redirect, offset, length)
+    cho từng <page>. Dựa vào định dạng chuẩn của dump: mỗi thẻ <page>, <title>, <ns>, <id>,
+    <redirect> nằm trên một dòng riêng.
+    """
+    offset = 0
+    page_start = None
+    title = page_id = ns = redirect = None
+    in_revision = False
+    with open(dump_path, "rb") as f:
+        for line in f:
+            stripped = line.strip()
+            if stripped == b"<page>":
+                page_start = offset
+                title = page_id = ns = redirect = None
+                in_revision = False
+            elif page_start is not None:
+                if stripped.startswith(b"<title>"):
+                    title = _tag_text(stripped, b"title")
+                elif stripped.startswith(b"<ns>"):
+                    ns = int(_tag_text(stripped, b"ns"))
+                elif stripped.startswith(b"<id>") and not in_revision and page_id is None:
+                    page_id = int(_tag_text(stripped, b"id"))
+                elif stripped.startswith(b"<redirect"):
+                    redirect = _redirect_target(stripped)
+                elif stripped.startswith(b"<revision>"):
+                    in_revision = True
+                elif stripped == b"</page>":
+                    end = offset + len(line)
+                    if title is not None:
+                        yield title, page_id, ns, redirect, page_start, end - page_start
+                    page_start = None
+            offset += len(line)
+
+
+def build_index(dump_path: Path, index_path: Optional[Path] = None, batch_size: int = 10000) -> Path:
+    dump_path = Path(dump_path)
+    index_path = Path(index_path) if index_path else default_index_path(dump_path)
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    print(f"🔎 Đang xây index cho dump '{dump_path}'...")
+    conn = sqlite3.connect(str(tmp_path))
+    conn.execute(
+        "CREATE TABLE pages (title TEXT PRIMARY KEY, page_id INTEGER, ns INTEGER, "
+        "redirect TEXT, offset INTEGER NOT NULL, length INTEGER NOT NULL)"
+    )
+    rows = []
+    count = 0
+    for row in iter_page_offsets(dump_path):
+        rows.append(row)
+        if len(rows) >= batch_size:
+            conn.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)", rows)
+            count += len(rows)
+            rows.clear()
+            if count % 500000 == 0:
+                print(f"  > Đã index {count} trang...")
+    conn.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)", rows)
+    count += len(rows)
+    conn.execute("CREATE INDEX idx_pages_page_id ON pages(page_id)")
+    conn.commit()
+    conn.close()
+    tmp_path.replace(index_path)
+    print(f"✅ Đã index {count} trang vào '{index_path}'")
+    return index_path
+
+
+STREAM_CHUNK_SIZE = 256 * 1024
+PAGE_FIELDS = {"title", "ns", "id", "text"}
+
+
+def stream_pages(dump_path: Path, namespaces: Optional[Iterable[int]] = (0,), skip_redirects: bool = True,
+                 want: Optional[Callable[[int, str], bool]] = None) -> Iterator[Dict]:
+    """
+    Duyệt các trang của dump XML với bộ nhớ cố định: parser expat được nạp từng khối
+    STREAM_CHUNK_SIZE, không giữ lại cây XML nào sau khi một <page> đã xử lý xong.
+
+    Trang bị loại sớm (chưa kịp gom ký tự của <text>) nếu: ns không thuộc `namespaces`
+    (None = mọi namespace), là trang đổi hướng (khi skip_redirects), hoặc `want(page_id, title)`
+    trả về False. Yield {page_id, title, ns, redirect, lastrevid, wikitext}.
+    Đọc được cả file .xml.bz2 (kể cả multistream) mà không cần giải nén ra đĩa.
+    """
+    namespaces = set(namespaces) if namespaces is not None else None
+    ready = []
+    state = {"page": None, "field": None, "buf": [], "in_revision": False, "skip": False}
+
+    def start(name, attrs):
+        if name == "page":
+            state.update(page={"page_id": None, "title": None, "ns": 0, "redirect": None,
+                               "lastrevid": None, "wikitext": ""},
+                         in_revision=False, skip=False)
+        elif state["page"] is None:
+            return
+        elif name == "redirect":
+            state["page"]["redirect"] = attrs.get("title")
+            if skip_redirects:
+                state["skip"] = True
+        elif name == "revision":
+            state["in_revision"] = True
+        elif name in PAGE_FIELDS and not state["skip"]:
+            state["field"] = name
+            state["buf"] = []
+
+    def chars(data):
+        if state["field"] is not None:
+            state["buf"].append(data)
+
+    def end(name):
+        page = state["page"]
+        if page is None:
+            return
+        if name == "page":
+            if not state["skip"]:
+                ready.append(page)
+            state["page"] = None
+            return
+        if state["field"] != name:
+            return
+        value = "".join(state["buf"])
+        state["field"] = None
+        state["buf"] = []
+        if name == "title":
+            page["title"] = value
+        elif name == "ns":
+            page["ns"] = int(value)
+            if namespaces is not None and page["ns"] not in namespaces:
+                state["skip"] = True
+        elif name == "id" and state["in_revision"]:
+            if page["lastrevid"] is None:
+                page["lastrevid"] = int(value)
+        elif name == "id":
+            page["page_id"] = int(value)
+            if want is not None and not want(page["page_id"], page["title"]):
+                state["skip"] = True
+        elif name == "text":
+            page["wikitext"] = value
+
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.CharacterDataHandler = chars
+    parser.EndElementHandler = end
+
+    opener = bz2.open if str(dump_path).endswith(".bz2") else open
+    with opener(dump_path, "rb") as f:
+        while True:
+            chunk = f.read(STREAM_CHUNK_SIZE)
+            parser.Parse(chunk, not chunk)
+            yield from ready
+            ready.clear()
+            if not chunk:
+                break
+
+
+def parse_page_fragment(fragment: bytes) -> Dict:
+    """Parse một đoạn <page>...</page> (không có namespace vì xmlns khai báo ở thẻ gốc)."""
+    elem = ET.fromstring(fragment)
+    revision = elem.find("revision")
+    revid = revision.findtext("id") if revision is not None else None
+    redirect = elem.find("redirect")
+    return {
+        "page_id": int(elem.findtext("id")),
+        "title": elem.findtext("title"),
+        "ns": int(elem.findtext("ns") or 0),
+        "redirect": redirect.get("title") if redirect is not None else None,
+        "lastrevid": int(revid) if revid else None,
+        "wikitext": (revision.findtext("text") if revision is not None else None) or "",
+    }
+
+
+class DumpPageSource:
+    def __init__(self, dump_path: Path, index_path: Optional[Path] = None):
+        self.dump_path = Path(dump_path)
+        self.index_path = Path(index_path) if index_path else default_index_path(self.dump_path)
+        if not self.index_path.exists():
+            build_index(self.dump_path, self.index_path)
+        self._conn = sqlite3.connect(str(self.index_path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._file = open(self.dump_path, "rb")
+
+    def lookup(self, title: str) -> Optional[tuple]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT title, page_id, redirect, offset, length FROM pages WHERE title = ?", (title,)
+            ).fetchone()
+
+    def read_fragment(self, offset: int, length: int) -> bytes:
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.read(length)
+
+    def get_page(self, title: str) -> Optional[Dict]:
+        """Trả về trang (đã đi theo đổi hướng) dạng {page_id, title, ns, lastrevid, wikitext}, hoặc None."""
+        title = normalize_title(title)
+        for _ in range(MAX_REDIRECT_HOPS + 1):
+            if not title:
+                return None
+            row = self.lookup(title)
+            if row is None:
+                return None
+            _, _, redirect, offset, length = row
+            if redirect:
+                title = normalize_title(redirect)
+                continue
+            return parse_page_fragment(self.read_fragment(offset, length))
+        return None
+
+    def fetch_wikitext_batch(self, titles: Iterable[str]) -> Dict[str, Dict]:
+        results = {}
+        for title in titles:
+            page = self.get_page(title)
+            if page is None or not page["wikitext"]:
+                continue
+            results[title] = {
+                "page_id": page["page_id"],
+                "title": page["title"],
+                "lastrevid": page["lastrevid"],
+                "wikitext": page["wikitext"],
+            }
+        return results
+
+    def fetch_wikitext(self, title: str) -> Optional[Dict]:
+        return self.fetch_wikitext_batch([title]).get(title)
+
+    def close(self):
+        self._file.close()
+        self._conn.close()
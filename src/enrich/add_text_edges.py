@@ -1,7 +1,13 @@
+import argparse
 import json
+import sys
 from pathlib import Path
 from typing import Dict, List, Set, Tuple
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.article_jsonl import iter_articles
+from common.title_matcher import TitleMatcher
+
 # Thêm cạnh "NHẮC_ĐẾN" từ văn bản bài viết tới các node đã có, dựa trên so khớp tiêu đề.
 # Yêu cầu: đã có các file filtered và articles_raw.filtered.jsonl.
 
@@ -23,20 +29,6 @@ def load_json(path: Path):
     return json.load(open(path, "r", encoding="utf-8"))
 
 
-def load_articles(path: Path) -> List[Dict]:
-    articles = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                articles.append(json.loads(line))
-            except Exception:
-                continue
-    return articles
-
-
 def build_rel_set(rels: List[Dict]) -> Set[Tuple[str, str, str]]:
     s = set()
     for r in rels:
@@ -87,7 +79,7 @@ def save_csv_rels(rels: List[Dict], path: Path):
             writer.writerow([r.get("source", ""), r.get("target", ""), r.get("type", "")])
 
 
-def main():
+def main(word_boundary: bool = False):
     if not (NODES_IN.exists() and RELS_IN.exists() and ARTICLES_IN.exists()):
         print("❌ Thiếu file input. Yêu cầu các file filtered và articles_raw.filtered.jsonl")
         return
@@ -95,7 +87,7 @@ def main():
     print("Đang tải nodes, relationships, articles...")
     nodes = load_json(NODES_IN)
     rels = load_json(RELS_IN)
-    articles = load_articles(ARTICLES_IN)
+    articles = iter_articles(ARTICLES_IN)
 
     title_to_title = {}
     for n in nodes:
@@ -105,6 +97,11 @@ def main():
 
     rel_set = build_rel_set(rels)
 
+    # bỏ qua target quá ngắn/dễ nhiễu
+    targets = [t for t in title_to_title if len(t) >= 4]
+    # Dựng automaton một lần cho mọi title; mỗi bài chỉ quét text một lượt
+    matcher = TitleMatcher(targets, word_boundary=word_boundary)
+
     added = 0
     for art in articles:
         src_title = art.get("title", "")
@@ -113,16 +110,13 @@ def main():
             continue
         src_title_lower = src_title.lower()
 
-        for tgt_lower, tgt_title in title_to_title.items():
+        # Duyệt theo thứ tự node như trước => thứ tự cạnh không đổi
+        for idx in sorted(matcher.matched_ids(text)):
+            tgt_lower = targets[idx]
             if tgt_lower == src_title_lower:
                 continue
-            # bỏ qua target quá ngắn/dễ nhiễu
-            if len(tgt_lower) < 4:
-                continue
-            if tgt_lower in text:
-                add_relationship(src_title, tgt_title, "NHẮC_ĐẾN", rels, rel_set)
-                added += 1
-        # giảm tải: text chỉ 1 lần per article, vòng lặp hoàn tất
+            add_relationship(src_title, title_to_title[tgt_lower], "NHẮC_ĐẾN", rels, rel_set)
+            added += 1
 
     print(f"Đã thêm {added} cạnh NHẮC_ĐẾN từ văn bản.")
 
@@ -142,5 +136,9 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Thêm cạnh NHẮC_ĐẾN từ văn bản bài viết tới các node đã có.")
+    parser.add_argument("--word-boundary", action="store_true",
+                        help="Chỉ nhận title đứng trọn âm tiết (mặc định: so khớp chuỗi con như trước)")
+    args = parser.parse_args()
+    main(word_boundary=args.word_boundary)
 
@@ -0,0 +1,85 @@
+"""
+Parse wikitext của các bài (JSONL của collect_wikitext) song song trên nhiều tiến trình và ghi
+kết quả (plaintext, vị trí câu, vị trí link) vào kho dùng chung common/parsed_articles.py.
+
+Các mục đã có trong store cũ (cùng STORE_VERSION, cùng hash wikitext) được chép lại, không parse lại;
+store chỉ giữ các bài có trong file đầu vào.
+
+Ví dụ:
+    python src/enrich/build_parsed_articles.py --workers 8
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.article_jsonl import iter_articles
+from common.parsed_articles import ParsedArticleStore, ParsedArticleWriter, hash_and_parse, wikitext_hash
+
+ROOT_DIR = Path(__file__).resolve().parents[3]
+DATA_DIR = ROOT_DIR / "data" / "processed"
+
+DEFAULT_INPUT = DATA_DIR / "articles_raw_wikitext.filtered.jsonl"
+DEFAULT_STORE = DATA_DIR / "parsed_articles"
+
+# Số bài gửi cho mỗi tiến trình trong một lượt (giới hạn lượng wikitext nằm trong bộ nhớ)
+BATCH_PER_WORKER = 64
+
+
+def build_parsed_store(source: Path, store_path: Path, workers: int) -> int:
+    old_store = ParsedArticleStore.open_if_current(store_path)
+    writer = ParsedArticleWriter(store_path)
+    reused = parsed = 0
+    pending = []
+
+    def flush(executor):
+        nonlocal parsed
+        for key, article in executor.map(hash_and_parse, pending, chunksize=8):
+            writer.add(key, article)
+            parsed += 1
+        pending.clear()
+        print(f"  > Đã parse {parsed} bài, dùng lại {reused} bài...")
+
+    print(f"⚙️ Parse '{source}' -> '{store_path}' ({workers} tiến trình)...")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        queued = set()
+        for art in iter_articles(source):
+            wikitext = art.get("wikitext", "")
+            if not wikitext:
+                continue
+            key = wikitext_hash(wikitext)
+            if key in queued:
+                continue
+            queued.add(key)
+            cached = old_store.get(key) if old_store is not None else None
+            if cached is not None:
+                writer.add(key, cached)
+                reused += 1
+                continue
+            pending.append(wikitext)
+            if len(pending) >= workers * BATCH_PER_WORKER:
+                flush(executor)
+        if pending:
+            flush(executor)
+
+    if old_store is not None:
+        old_store.close()
+    writer.close()
+    print(f"✅ Store có {writer.count} bài (parse mới {parsed}, dùng lại {reused}) tại '{store_path}'")
+    return writer.count
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Parse wikitext một lần, lưu plaintext + vị trí câu / link.")
+    parser.add_argument("--input", default=str(DEFAULT_INPUT), help="JSONL {title, page_id, wikitext}")
+    parser.add_argument("--store", default=str(DEFAULT_STORE), help="Thư mục store kết quả")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    build_parsed_store(Path(args.input), Path(args.store), max(args.workers, 1))
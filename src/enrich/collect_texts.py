@@ -1,9 +1,11 @@
 import json
+import sys
 import time
 from pathlib import Path
 from typing import Dict, List
 
-import requests
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.http_cache import CacheMiss, get_json, print_stats
 
 HEADERS = {
     "User-Agent": "VietnameseHistoryNetwork/1.0 (Project for university; contact: 22024527@vnu.edu.vn)"
@@ -38,13 +40,14 @@ def fetch_batch(titles: List[str]) -> List[Dict]:
         "formatversion": "2",
     }
     try:
-        resp = requests.get(API_URL, params=params, headers=HEADERS, timeout=30)
-        resp.raise_for_status()
+        data = get_json(API_URL, params, headers=HEADERS, timeout=30)
+    except CacheMiss:
+        raise
     except Exception as e:
         print(f"  ! Lỗi gọi API cho batch {len(titles)} mục: {e}")
         return []
 
-    pages = resp.json().get("query", {}).get("pages", [])
+    pages = data.get("query", {}).get("pages", [])
     results = []
     for page in pages:
         if "missing" in page:
@@ -90,6 +93,7 @@ def main(input_path: Path = DEFAULT_INPUT, output_path: Path = DEFAULT_OUTPUT):
             print(f"  > Đã xử lý {processed}/{total} title, giữ {kept}")
 
     out_f.close()
+    print_stats()
     print("Hoàn tất thu thập văn bản.")
     print(f"- Tổng title yêu cầu: {total}")
     print(f"- Số bài ghi được  : {kept}")
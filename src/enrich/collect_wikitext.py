@@ -1,9 +1,12 @@
 import json
+import sys
 import time
 from pathlib import Path
 from typing import Dict, List
 
-import requests
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.http_cache import CacheMiss, get_json, print_stats
+from common.page_store import PageStore
 
 HEADERS = {
     "User-Agent": "VietnameseHistoryNetwork/1.0 (Project for university; contact: 22024527@vnu.edu.vn)"
@@ -14,6 +17,8 @@ ROOT_DIR = Path(__file__).resolve().parents[3]
 DATA_DIR = ROOT_DIR / "data" / "processed"
 DEFAULT_INPUT = DATA_DIR / "network_nodes_full.filtered.json"
 DEFAULT_OUTPUT = DATA_DIR / "articles_raw_wikitext.filtered.jsonl"
+# Page store dựng từ dump (src/seed/build_page_store.py); nếu có thì chỉ gọi API cho title thiếu
+DEFAULT_STORE = DATA_DIR / "page_store"
 
 
 def chunked(items: List[str], size: int):
@@ -32,13 +37,14 @@ def fetch_batch(titles: List[str]) -> List[Dict]:
         "formatversion": "2",
     }
     try:
-        resp = requests.get(API_URL, params=params, headers=HEADERS, timeout=30)
-        resp.raise_for_status()
+        data = get_json(API_URL, params, headers=HEADERS, timeout=30)
+    except CacheMiss:
+        raise
     except Exception as e:
         print(f"  ! Lỗi gọi API: {e}")
         return []
 
-    pages = resp.json().get("query", {}).get("pages", [])
+    pages = data.get("query", {}).get("pages", [])
     results = []
     for page in pages:
         if "missing" in page:
@@ -61,7 +67,19 @@ def fetch_batch(titles: List[str]) -> List[Dict]:
     return results
 
 
-def main(input_path: Path = DEFAULT_INPUT, output_path: Path = DEFAULT_OUTPUT):
+def fetch_from_store(store: PageStore, titles: List[str]) -> Dict[str, Dict]:
+    results = {}
+    for title, page in store.get_many(titles).items():
+        results[title] = {
+            "title": page["title"],
+            "page_id": page["page_id"],
+            "wikitext": page["wikitext"],
+            "source": "dump",
+        }
+    return results
+
+
+def main(input_path: Path = DEFAULT_INPUT, output_path: Path = DEFAULT_OUTPUT, store_path: Path = DEFAULT_STORE):
     if not input_path.exists():
         print(f"❌ Không tìm thấy file input: {input_path}")
         return
@@ -78,17 +96,27 @@ def main(input_path: Path = DEFAULT_INPUT, output_path: Path = DEFAULT_OUTPUT):
 
     processed = 0
     kept = 0
+    store = PageStore(store_path) if store_path.exists() else None
+    if store is not None:
+        print(f"Đọc wikitext từ page store: {store_path} ({len(store)} trang)")
     for batch in chunked(titles, 50):
         processed += len(batch)
-        items = fetch_batch(batch)
+        from_store = fetch_from_store(store, batch) if store is not None else {}
+        items = list(from_store.values())
+        missing = [t for t in batch if t not in from_store]
+        if missing:
+            items += fetch_batch(missing)
+            time.sleep(0.5)
         kept += len(items)
         for obj in items:
             out_f.write(json.dumps(obj, ensure_ascii=False) + "\n")
-        time.sleep(0.5)
         if processed % 500 == 0:
             print(f"  > Đã xử lý {processed}/{total}, giữ {kept}")
 
     out_f.close()
+    if store is not None:
+        store.close()
+    print_stats()
     print("Hoàn tất thu thập wikitext.")
     print(f"- Tổng title yêu cầu: {total}")
     print(f"- Số bài ghi được  : {kept}")
@@ -1,11 +1,16 @@
 import json
-import re
+import sys
 from pathlib import Path
 from typing import Dict, List, Set, Tuple
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.article_jsonl import iter_articles
+from common.link_resolver import LinkResolver, load_redirects
+from common.parsed_articles import ParsedArticle, ParsedArticleStore, parsed_or_parse
+
 # Scan-Link-Filter-Classify (rule-based, không LLM):
-# 1) Quét wikitext, tách câu
-# 2) Tìm [[link]] trong câu
+# 1) Lấy plaintext + vị trí câu / [[link]] của bài (parsed store hoặc parse ngay)
+# 2) Tìm [[link]] nằm trong câu
 # 3) Lọc: chỉ giữ link tới node có nhãn quan tâm
 # 4) Phân loại quan hệ dựa trên từ khóa trong câu (evidence)
 
@@ -15,6 +20,10 @@ DATA_DIR = ROOT_DIR / "data" / "processed"
 ARTICLES_IN = DATA_DIR / "articles_raw_wikitext.filtered.jsonl"
 NODES_IN = DATA_DIR / "network_nodes_full.enriched.json"
 RELS_IN = DATA_DIR / "network_relationships_full.enriched.json"
+# Page store (nếu đã dựng) cung cấp bảng trang đổi hướng cho việc phân giải link
+PAGE_STORE = DATA_DIR / "page_store"
+# Kết quả parse dựng sẵn bởi build_parsed_articles.py (nếu có)
+PARSED_STORE = DATA_DIR / "parsed_articles"
 
 RELS_OUT = DATA_DIR / "network_relationships_full.context.json"
 RELS_CSV_OUT = DATA_DIR / "relationships_for_neo4j.context.csv"
@@ -51,20 +60,6 @@ RULES = [
 DEFAULT_TYPE = "MENTIONED_IN"
 
 
-def load_articles(path: Path) -> List[Dict]:
-    items = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                items.append(json.loads(line))
-            except Exception:
-                continue
-    return items
-
-
 def load_json(path: Path):
     return json.load(open(path, "r", encoding="utf-8"))
 
@@ -85,20 +80,16 @@ def save_rels_csv(path: Path, rels: List[Dict]):
             w.writerow([r.get("source", ""), r.get("target", ""), r.get("type", ""), r.get("evidence", "")])
 
 
-def split_sentences_wikitext(wikitext: str) -> List[str]:
-    return [s.strip() for s in re.split(r"(?<=[.!?])\s+", wikitext) if s.strip()]
-
-
-def extract_links_in_sentence(sentence: str) -> List[str]:
-    matches = re.findall(r"\[\[(.*?)(?:\|(.*?))?\]\]", sentence)
+def extract_links_in_span(parsed: ParsedArticle, start: int, end: int) -> List[str]:
+    """Title các [[link]] hiển thị trong đoạn [start, end) của plaintext (bỏ link có namespace)."""
     targets = []
-    for m in matches:
-        target = m[0].strip()
-        if not target:
+    for _, _, title in parsed.links_in(start, end):
+        title = title.strip()
+        if not title:
             continue
-        if ":" in target.lower():
+        if ":" in title.lower():
             continue
-        targets.append(target)
+        targets.append(title)
     return targets
 
 
@@ -116,17 +107,24 @@ def main():
         return
 
     print("Đang tải dữ liệu...")
-    articles = load_articles(ARTICLES_IN)
+    articles = iter_articles(ARTICLES_IN)
     nodes = load_json(NODES_IN)
     rels = load_json(RELS_IN)
 
-    title_lookup: Dict[str, Tuple[str, str]] = {}
+    # Dựng một lần: mỗi link được phân giải bằng vài lần tra bảng băm
+    title_labels: Dict[str, str] = {}
     for n in nodes:
         t = n.get("title")
         if t:
-            title_lookup[t.lower()] = (t, n.get("label", ""))
+            title_labels[t] = n.get("label", "")
+    redirects = load_redirects(PAGE_STORE)
+    resolver = LinkResolver(title_labels, redirects)
+    print(f"Bộ phân giải link: {len(title_labels)} title, {len(redirects)} trang đổi hướng.")
 
     rel_set: Set[Tuple[str, str, str]] = {(r.get("source", ""), r.get("target", ""), r.get("type", "")) for r in rels}
+    parsed_store = ParsedArticleStore.open_if_current(PARSED_STORE)
+    if parsed_store is not None:
+        print(f"Dùng parsed store '{PARSED_STORE}' ({len(parsed_store)} bài).")
 
     added = 0
     for art in articles:
@@ -134,32 +132,23 @@ def main():
         wikitext = art.get("wikitext", "")
         if not src or not wikitext:
             continue
-        sentences = split_sentences_wikitext(wikitext)[:MAX_SENT_PER_ARTICLE]
-        for sent in sentences:
-            if len(sent) < SENT_MIN_LEN:
+        parsed = parsed_or_parse(parsed_store, wikitext)
+        for start, end in parsed.sentence_spans[:MAX_SENT_PER_ARTICLE]:
+            if end - start < SENT_MIN_LEN:
                 continue
-            if len(sent) > SENT_MAX_LEN:
-                sent = sent[:SENT_MAX_LEN] + "..."
-            targets = extract_links_in_sentence(sent)
+            # Evidence giữ tối đa SENT_MAX_LEN ký tự; chỉ xét link trong phần được giữ
+            cut = min(end, start + SENT_MAX_LEN)
+            sent = parsed.plaintext[start:cut] + ("..." if cut < end else "")
+            targets = extract_links_in_span(parsed, start, cut)
             if not targets:
                 continue
             targets = targets[:MAX_TARGETS_PER_SENT]
             rel_type = classify_sentence(sent)
             for tgt in targets:
-                tgt_norm = tgt.lower()
-                tgt_title = None
-                tgt_label = None
-
-                # ranh giới từ
-                for norm, (t_full, lbl) in title_lookup.items():
-                    if norm in tgt_norm or tgt_norm in norm:
-                        # ưu tiên match exact lower
-                        if tgt_norm == norm or re.search(rf"\\b{re.escape(norm)}\\b", sent.lower()):
-                            tgt_title, tgt_label = t_full, lbl
-                            break
-
+                tgt_title = resolver.resolve(tgt)
                 if not tgt_title:
                     continue
+                tgt_label = title_labels[tgt_title]
                 # Lọc nhãn quan tâm
                 if tgt_label not in LABEL_WHITELIST:
                     continue
@@ -177,6 +166,8 @@ def main():
                 })
                 added += 1
 
+    if parsed_store is not None:
+        parsed_store.close()
     print(f"Đã thêm {added} cạnh (scan-link-filter-classify, rule-based).")
     save_rels_json(RELS_OUT, rels)
     save_rels_csv(RELS_CSV_OUT, rels)
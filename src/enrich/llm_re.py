@@ -5,25 +5,43 @@ Pipeline:
 1) Đọc wikitext đã thu thập: articles_raw_wikitext.filtered.jsonl
 2) Đọc graph hiện tại: network_nodes_full.enriched.json / relationships_full.enriched.json
 3) Với mỗi bài viết:
-   - Parse wikitext -> plain text, tách câu
+   - Parse wikitext -> plain text, tách câu (lấy từ parsed store nếu đã dựng bằng build_parsed_articles.py)
    - Với mỗi câu, tìm các node khác xuất hiện trong câu (string match)
-   - Hỏi LLM phân loại quan hệ giữa subject (bài viết) và target (node)
-   - Nếu LLM trả về LIEN_KET hoặc trống, bỏ qua; ngược lại thêm cạnh, kèm evidence
-4) Ghi đè relationships_enriched (JSON/CSV)
-
-Yêu cầu: đặt biến môi trường OPENAI_API_KEY (hoặc chỉnh hàm call_llm để dùng provider khác).
-Mặc định model: gpt-4o-mini. Bạn có thể đổi trong hàm call_llm.
+   - Mỗi (subject, target, câu) thành một cặp cần gán nhãn
+4) Gán nhãn các cặp bằng common/llm_labeling.BatchLabeler: gói nhiều cặp vào một prompt,
+   nhiều request song song trong giới hạn request/phút + token/phút, retry 429/5xx có backoff
+   Nhãn của từng cặp được lưu vào cache LLM (common/llm_cache.py, namespace "llm_re"): chạy lại
+   chỉ gửi các cặp chưa gặp; `--refresh-cache` xóa cache của namespace này trước khi chạy.
+   `--cascade`: chấm từng cặp bằng luật từ khóa trước (sentence_re.classify_relation +
+   context_link_classify.RULES); chỉ cặp có độ tin cậy < `--threshold` (kể cả khi không luật nào khớp)
+   hoặc hai bộ luật mâu thuẫn mới gửi LLM. Một mẫu nhỏ (`--audit-rate`) cặp do luật quyết cũng được gửi LLM để đo độ khớp.
+5) Nhãn LIEN_KET hoặc trống thì bỏ qua; ngược lại thêm cạnh (theo thứ tự các cặp), kèm evidence
+6) Ghi đè relationships_enriched (JSON/CSV)
+
+Provider chọn trong LLM_PROVIDER.txt ("openai" | "gemini"), key trong OPENAI_API_KEY.txt /
+GOOGLE_API_KEY.txt. Mặc định model: gpt-4o-mini. `--base-url` trỏ tới endpoint bất kỳ tương thích
+OpenAI (vd. server giả lập benchmarks/llm_stub_server.py, khi đó không cần key).
+
+Ví dụ:
+    python src/enrich/llm_re.py --batch-size 20 --concurrency 8 --rpm 500 --tpm 200000
 """
 
+import argparse
+import hashlib
 import json
-import re
-import time
+import sys
+from collections import Counter
 from pathlib import Path
-from typing import Dict, List, Set, Tuple, Iterable
+from typing import Callable, Dict, Iterable, Iterator, List, Set, Tuple
 
-import mwparserfromhell
-from openai import OpenAI
-import google.generativeai as genai
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.article_jsonl import iter_articles
+from common.llm_cache import get_llm_cache
+from common.llm_labeling import DEFAULT_LABEL, DEFAULT_OPENAI_BASE_URL, BatchLabeler, GeminiBackend, \
+    OpenAIChatBackend, PairItem
+from common.parsed_articles import ParsedArticleStore, parsed_or_parse
+from enrich.context_link_classify import RULES as CONTEXT_RULES, classify_sentence
+from enrich.sentence_re import classify_relation
 
 ROOT_DIR = Path(__file__).resolve().parents[3]
 DATA_DIR = ROOT_DIR / "data" / "processed"
@@ -31,6 +49,8 @@ DATA_DIR = ROOT_DIR / "data" / "processed"
 ARTICLES_IN = DATA_DIR / "articles_raw_wikitext.filtered.jsonl"
 NODES_IN = DATA_DIR / "network_nodes_full.enriched.json"
 RELS_IN = DATA_DIR / "network_relationships_full.enriched.json"
+# Kết quả parse dựng sẵn bởi build_parsed_articles.py (nếu có)
+PARSED_STORE = DATA_DIR / "parsed_articles"
 
 RELS_OUT = DATA_DIR / "network_relationships_full.enriched.json"
 RELS_CSV_OUT = DATA_DIR / "relationships_for_neo4j.enriched.csv"
@@ -44,21 +64,40 @@ DEFAULT_GEMINI_MODELS = [
     "gemini-1.0-pro",
     "gemini-pro",
 ]
-RATE_LIMIT_DELAY = 0.5  # seconds between calls
-
-
-def load_articles(path: Path) -> List[Dict]:
-    items = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                items.append(json.loads(line))
-            except Exception:
-                continue
-    return items
+LLM_CACHE_NAMESPACE = "llm_re"
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_CONCURRENCY = 8
+# Mặc định theo hạn mức tier 1 của gpt-4o-mini
+DEFAULT_RPM = 500
+DEFAULT_TPM = 200000
+
+# --- Cascade luật -> LLM ---
+# Nhãn của các bộ luật -> nhãn trong bộ nhãn của prompt (llm_labeling.LABELS), để so được với nhãn LLM.
+# Nhãn luật không có trong bảng này không được tính là một phiếu.
+RULE_LABEL_MAP = {
+    "PHỐI_NGẪU_VỚI": "PHOI_NGAU",
+    "LÀ_CHA_MẸ_CỦA": "LA_CHA_ME_CUA",
+    "LÀ_CON_CỦA": "LA_CON_CUA",
+    "KẾ_NHIỆM_LIÊN_QUAN": "KE_NHIEM",
+    "ĐỐI_ĐẦU": "DOI_DAU",
+    "CHỈ_HUY": "CHI_HUY",
+    "THAM_GIA_SỰ_KIỆN": "THAM_GIA",
+    "PHỤC_VỤ": "PHUC_VU",
+    "ĐƯỢC_BỔ_NHIỆM_BỞI": "DUOC_BO_NHIEM_BOI",
+    "KÝ_HIỆP_ƯỚC_VỚI": "KY_HIEP_UOC",
+    "SINH_TẠI": "SINH_TAI",
+    "MẤT_TẠI": "MAT_TAI",
+}
+# Độ tin cậy của kết quả luật theo từng trường hợp
+RULE_CONFIDENCE = {
+    "agree": 0.9,            # hai bộ luật cùng nhãn, câu chỉ khớp một loại quan hệ
+    "none": 0.0,             # không bộ luật nào khớp: luật không biết gì về cặp này => hỏi LLM
+    "agree_ambiguous": 0.6,  # cùng nhãn nhưng câu khớp từ khóa của nhiều loại quan hệ
+    "single": 0.5,           # chỉ một bộ luật khớp
+    "conflict": 0.0,         # hai bộ luật cho nhãn khác nhau
+}
+DEFAULT_CASCADE_THRESHOLD = 0.7
+DEFAULT_AUDIT_RATE = 0.05
 
 
 def load_json(path: Path):
@@ -84,55 +123,6 @@ def build_rel_set(rels: List[Dict]) -> Set[Tuple[str, str, str]]:
     return {(r.get("source", ""), r.get("target", ""), r.get("type", "")) for r in rels}
 
 
-def split_sentences(text: str) -> List[str]:
-    return [s.strip() for s in re.split(r"(?<=[.!?])\s+", text) if s.strip()]
-
-
-PROMPT_TEMPLATE = """
-Bạn là hệ thống gán nhãn quan hệ. Dựa vào câu sau, hãy xác định quan hệ giữa "{subject}" (chủ đề bài viết) và "{target}".
-Chỉ trả về một nhãn ngắn gọn dạng SNAKE_CASE, viết hoa. Nếu không rõ, trả về LIEN_KET.
-Câu: "{sentence}"
-Ví dụ nhãn: DOI_DAU, PHOI_NGAU, LA_CON_CUA, KE_NHIEM, CHI_HUY, THAM_GIA, KY_HIEP_UOC, SINH_TAI, MAT_TAI.
-"""
-
-
-def call_llm_openai(client: OpenAI, subject: str, target: str, sentence: str) -> str:
-    prompt = PROMPT_TEMPLATE.format(subject=subject, target=target, sentence=sentence)
-    try:
-        resp = client.chat.completions.create(
-            model=MODEL_NAME_OPENAI,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.0,
-            max_tokens=20,
-        )
-        text = resp.choices[0].message.content.strip()
-        label = re.split(r"\s|\n", text)[0]
-        label = re.sub(r"[^A-Z_]", "", label.upper())
-        return label if label else "LIEN_KET"
-    except Exception as e:
-        print(f"  ! LLM OpenAI lỗi: {e}")
-        return "LIEN_KET"
-
-
-def call_llm_gemini(subject: str, target: str, sentence: str, model_name: str) -> Tuple[str, bool]:
-    """
-    Trả về (label, is_404). is_404 dùng để biết có nên thử model kế tiếp.
-    """
-    prompt = PROMPT_TEMPLATE.format(subject=subject, target=target, sentence=sentence)
-    try:
-        model = genai.GenerativeModel(model_name)
-        res = model.generate_content(prompt)
-        text = (res.text or "").strip()
-        label = re.split(r"\s|\n", text)[0]
-        label = re.sub(r"[^A-Z_]", "", label.upper())
-        return (label if label else "LIEN_KET", False)
-    except Exception as e:
-        msg = str(e)
-        print(f"  ! LLM Gemini lỗi ({model_name}): {msg}")
-        is_404 = "404" in msg or "not found" in msg.lower()
-        return "LIEN_KET", is_404
-
-
 def read_api_key(path: Path) -> str:
     try:
         return Path(path).read_text(encoding="utf-8").strip()
@@ -149,28 +139,133 @@ def load_gemini_models() -> List[str]:
     return DEFAULT_GEMINI_MODELS
 
 
-def main():
-    provider_file = Path("LLM_PROVIDER.txt")
-    provider = provider_file.read_text(encoding="utf-8").strip().lower() if provider_file.exists() else "openai"
-    client = None
-    gemini_models: List[str] = []
+def iter_candidate_pairs(articles: Iterable[Dict], title_lookup: Dict[str, str],
+                         parsed_store) -> Iterator[PairItem]:
+    for art in articles:
+        src_title = art.get("title", "")
+        wikitext = art.get("wikitext", "")
+        if not src_title or not wikitext:
+            continue
+
+        # Plaintext + vị trí câu: lấy từ parsed store nếu đã dựng, nếu không thì parse ngay
+        parsed = parsed_or_parse(parsed_store, wikitext)
+
+        for sent in parsed.sentences():
+            sent_low = sent.lower()
+            # tìm target xuất hiện trong câu
+            for tgt_low, tgt_title in title_lookup.items():
+                if tgt_title != src_title and tgt_low in sent_low and len(tgt_low) >= 4:
+                    yield PairItem(src_title, tgt_title, sent)
+
+
+def rule_vote(sentence: str) -> Tuple[str, float, str]:
+    """(nhãn theo luật, độ tin cậy, trường hợp trong RULE_CONFIDENCE) của một câu."""
+    a = RULE_LABEL_MAP.get(classify_relation(sentence))
+    b = RULE_LABEL_MAP.get(classify_sentence(sentence))
+    if a is None and b is None:
+        case = "none"
+    elif a is not None and b is not None and a != b:
+        case = "conflict"
+    elif a is None or b is None:
+        case = "single"
+    else:
+        low = sentence.lower()
+        matched = {rel for kws, rel in CONTEXT_RULES if any(k in low for k in kws)}
+        case = "agree" if len(matched) == 1 else "agree_ambiguous"
+    label = b or a or DEFAULT_LABEL
+    return label, RULE_CONFIDENCE[case], case
+
+
+def audit_fraction(item: PairItem) -> float:
+    """Số cố định trong [0, 1) cho mỗi cặp => chạy lại chọn đúng mẫu kiểm tra cũ (trúng cache LLM)."""
+    digest = hashlib.sha256("\t".join(item).encode("utf-8")).hexdigest()
+    return int(digest[:8], 16) / 2 ** 32
 
+
+class RuleCascade:
+    """
+    Chấm từng cặp bằng luật trước: cặp đủ tin cậy lấy nhãn luật, không gửi LLM; cặp tin cậy thấp /
+    luật mâu thuẫn được đưa vào hàng đợi LLM. Cặp do luật quyết nằm trong mẫu kiểm tra vẫn giữ nhãn
+    luật, nhãn LLM của chúng chỉ dùng để đo độ khớp luật - LLM.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_CASCADE_THRESHOLD, audit_rate: float = DEFAULT_AUDIT_RATE):
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self.stats = Counter()
+        # vị trí trong luồng gửi LLM -> (index của cặp, nhãn luật, là mẫu kiểm tra)
+        self._pending: Dict[int, Tuple[int, str, bool]] = {}
+
+    def route(self, pairs: Iterable[PairItem],
+              on_result: Callable[[int, PairItem, str], None]) -> Iterator[PairItem]:
+        """Yield các cặp cần hỏi LLM; cặp do luật quyết được trả ngay qua `on_result`."""
+        llm_index = 0
+        for index, item in enumerate(pairs):
+            self.stats["pairs"] += 1
+            label, confidence, case = rule_vote(item.sentence)
+            self.stats[f"case_{case}"] += 1
+            to_llm = case == "conflict" or confidence < self.threshold
+            audited = not to_llm and audit_fraction(item) < self.audit_rate
+            if to_llm:
+                self.stats["llm"] += 1
+            else:
+                self.stats["rule"] += 1
+                on_result(index, item, label)
+                if not audited:
+                    continue
+                self.stats["audited"] += 1
+            self._pending[llm_index] = (index, label, audited)
+            llm_index += 1
+            yield item
+
+    def on_llm_result(self, llm_index: int, item: PairItem, label: str,
+                      on_result: Callable[[int, PairItem, str], None]):
+        index, rule_label, audited = self._pending.pop(llm_index)
+        prefix = "audit" if audited else "routed"
+        self.stats[f"{prefix}_compared"] += 1
+        self.stats[f"{prefix}_agree"] += rule_label == label
+        if not audited:
+            on_result(index, item, label)
+
+    def print_report(self):
+        s = self.stats
+        pairs = max(s["pairs"], 1)
+        sent = s["llm"] + s["audited"]
+        print(f"Cascade (ngưỡng {self.threshold}): {s['pairs']} cặp, luật quyết {s['rule']} "
+              f"({s['rule'] / pairs:.1%}), gửi LLM {s['llm']} (mâu thuẫn {s['case_conflict']}) "
+              f"+ {s['audited']} mẫu kiểm tra")
+        print(f"  > Tiết kiệm {1 - sent / pairs:.1%} số cặp phải hỏi LLM")
+        for prefix, name in (("audit", "mẫu kiểm tra (luật đủ tin cậy)"), ("routed", "cặp gửi LLM")):
+            if s[f"{prefix}_compared"]:
+                print(f"  > Độ khớp luật - LLM trên {name}: "
+                      f"{s[f'{prefix}_agree'] / s[f'{prefix}_compared']:.1%} ({s[f'{prefix}_compared']} cặp)")
+
+
+def make_backend(provider: str, base_url: str):
     if provider == "openai":
         api_key = read_api_key(Path("OPENAI_API_KEY.txt"))
-        if not api_key:
+        # Endpoint tự chỉ định (stub / proxy) có thể không cần key
+        if not api_key and base_url == DEFAULT_OPENAI_BASE_URL:
             print("❌ Thiếu OPENAI_API_KEY (file OPENAI_API_KEY.txt).")
-            return
-        client = OpenAI(api_key=api_key)
-    elif provider == "gemini":
+            return None
+        return OpenAIChatBackend(api_key, MODEL_NAME_OPENAI, base_url=base_url)
+    if provider == "gemini":
         api_key = read_api_key(Path("GOOGLE_API_KEY.txt"))
         if not api_key:
             print("❌ Thiếu GOOGLE_API_KEY (file GOOGLE_API_KEY.txt).")
-            return
+            return None
         gemini_models = load_gemini_models()
-        genai.configure(api_key=api_key)
         print(f"Gemini models sẽ thử lần lượt: {gemini_models}")
-    else:
-        print("❌ LLM_PROVIDER không hợp lệ. Dùng 'openai' hoặc 'gemini'.")
+        return GeminiBackend(api_key, gemini_models)
+    print("❌ LLM_PROVIDER không hợp lệ. Dùng 'openai' hoặc 'gemini'.")
+    return None
+
+
+def main(args):
+    provider_file = Path("LLM_PROVIDER.txt")
+    provider = provider_file.read_text(encoding="utf-8").strip().lower() if provider_file.exists() else "openai"
+    backend = make_backend(provider, args.base_url)
+    if backend is None:
         return
 
     if not (ARTICLES_IN.exists() and NODES_IN.exists() and RELS_IN.exists()):
@@ -178,7 +273,7 @@ def main():
         return
 
     print("Đang tải dữ liệu...")
-    articles = load_articles(ARTICLES_IN)
+    articles = iter_articles(ARTICLES_IN)
     nodes = load_json(NODES_IN)
     rels = load_json(RELS_IN)
 
@@ -189,63 +284,64 @@ def main():
             title_lookup[t.lower()] = t
 
     rel_set = build_rel_set(rels)
-    added = 0
-    calls = 0
+    parsed_store = ParsedArticleStore.open_if_current(PARSED_STORE)
+    if parsed_store is not None:
+        print(f"Dùng parsed store '{PARSED_STORE}' ({len(parsed_store)} bài).")
+
+    cache = get_llm_cache()
+    if cache is not None and args.refresh_cache:
+        print(f"Đã xóa {cache.invalidate(LLM_CACHE_NAMESPACE)} nhãn trong cache LLM '{LLM_CACHE_NAMESPACE}'.")
+
+    labeler = BatchLabeler(
+        backend,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        cache=cache,
+        namespace=LLM_CACHE_NAMESPACE,
+    )
+    # index của cặp -> (cặp, nhãn); các lô xong không theo thứ tự nên gom lại rồi thêm cạnh theo index
+    labeled: Dict[int, Tuple[PairItem, str]] = {}
+
+    def on_result(index: int, item: PairItem, label: str):
+        if label and label != DEFAULT_LABEL:
+            labeled[index] = (item, label)
+        if (index + 1) % 1000 == 0:
+            print(f"  > Đã gán nhãn {len(labeled)} / {index + 1} cặp...")
+
+    pairs = iter_candidate_pairs(articles, title_lookup, parsed_store)
+    cascade = RuleCascade(args.threshold, args.audit_rate) if args.cascade else None
+    print(f"Gán nhãn theo lô {labeler.batch_size} cặp, tối đa {labeler.concurrency} request song song...")
+    if cascade is None:
+        stats = labeler.run(pairs, on_result)
+    else:
+        stats = labeler.run(cascade.route(pairs, on_result),
+                            lambda i, item, label: cascade.on_llm_result(i, item, label, on_result))
+    if parsed_store is not None:
+        parsed_store.close()
 
-    for art in articles:
-        src_title = art.get("title", "")
-        wikitext = art.get("wikitext", "")
-        if not src_title or not wikitext:
+    added = 0
+    for index in sorted(labeled):
+        item, rel_type = labeled[index]
+        key = (item.subject, item.target, rel_type)
+        if key in rel_set:
             continue
-
-        wikicode = mwparserfromhell.parse(wikitext)
-        plain_text = wikicode.strip_code()
-        sentences = split_sentences(plain_text)
-
-        for sent in sentences:
-            sent_low = sent.lower()
-            # tìm target xuất hiện trong câu
-            matched_targets = [
-                tgt_title for tgt_low, tgt_title in title_lookup.items()
-                if tgt_title != src_title and tgt_low in sent_low and len(tgt_low) >= 4
-            ]
-            if not matched_targets:
-                continue
-
-            for tgt_title in matched_targets:
-                rel_type = "LIEN_KET"
-                if provider == "openai":
-                    rel_type = call_llm_openai(client, src_title, tgt_title, sent)
-                    calls += 1
-                else:
-                    # thử lần lượt các model cho đến khi hết hoặc không 404
-                    for model_name in gemini_models:
-                        rel_type, is_404 = call_llm_gemini(src_title, tgt_title, sent, model_name)
-                        calls += 1
-                        if is_404:
-                            time.sleep(RATE_LIMIT_DELAY)
-                            continue
-                        else:
-                            break
-
-                if rel_type in ("", "LIEN_KET"):
-                    time.sleep(RATE_LIMIT_DELAY)
-                    continue
-                key = (src_title, tgt_title, rel_type)
-                if key in rel_set:
-                    time.sleep(RATE_LIMIT_DELAY)
-                    continue
-                rel_set.add(key)
-                rels.append({
-                    "source": src_title,
-                    "target": tgt_title,
-                    "type": rel_type,
-                    "evidence": sent,
-                })
-                added += 1
-                time.sleep(RATE_LIMIT_DELAY)
-
-    print(f"Đã thêm {added} cạnh ngữ nghĩa bằng LLM (tổng số call: {calls}).")
+        rel_set.add(key)
+        rels.append({
+            "source": item.subject,
+            "target": item.target,
+            "type": rel_type,
+            "evidence": item.sentence,
+        })
+        added += 1
+
+    print(f"Đã thêm {added} cạnh ngữ nghĩa bằng LLM ({stats['items']} cặp, {stats['cached']} lấy từ cache, "
+          f"{stats['requests']} call, {stats['retries']} retry, {stats['failed_batches']} lô lỗi).")
+    if cascade is not None:
+        cascade.print_report()
+    if cache is not None:
+        cache.print_stats(LLM_CACHE_NAMESPACE)
     save_rels_json(RELS_OUT, rels)
     save_rels_csv(RELS_CSV_OUT, rels)
     print("Đã lưu:")
@@ -253,6 +349,23 @@ def main():
     print(f"- {RELS_CSV_OUT}")
 
 
-if __name__ == "__main__":
-    main()
+def parse_args():
+    parser = argparse.ArgumentParser(description="Gán nhãn quan hệ theo câu bằng LLM (theo lô, song song).")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Số cặp trong một prompt")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Số request song song tối đa")
+    parser.add_argument("--rpm", type=float, default=DEFAULT_RPM, help="Giới hạn request / phút (0 = không)")
+    parser.add_argument("--tpm", type=float, default=DEFAULT_TPM, help="Giới hạn token / phút (0 = không)")
+    parser.add_argument("--base-url", default=DEFAULT_OPENAI_BASE_URL,
+                        help="Endpoint tương thích OpenAI (provider openai)")
+    parser.add_argument("--cascade", action="store_true",
+                        help="Chấm bằng luật trước, chỉ gửi LLM cặp tin cậy thấp / luật mâu thuẫn")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_CASCADE_THRESHOLD,
+                        help="Cascade: độ tin cậy tối thiểu để dùng nhãn luật (xem RULE_CONFIDENCE)")
+    parser.add_argument("--audit-rate", type=float, default=DEFAULT_AUDIT_RATE,
+                        help="Cascade: tỉ lệ cặp do luật quyết vẫn gửi LLM để đo độ khớp")
+    parser.add_argument("--refresh-cache", action="store_true", help="Xóa nhãn đã lưu trong cache LLM của llm_re")
+    return parser.parse_args()
+
 
+if __name__ == "__main__":
+    main(parse_args())
@@ -1,7 +1,13 @@
+import argparse
 import json
 import re
+import sys
 from pathlib import Path
-from typing import Dict, List, Set, Tuple
+from typing import Dict, List, Optional, Set, Tuple
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.article_jsonl import iter_articles
+from common.cooccurrence import CooccurrenceEngine
 
 ROOT_DIR = Path(__file__).resolve().parents[3]
 DATA_DIR = ROOT_DIR / "data" / "processed"
@@ -33,20 +39,6 @@ PATTERNS = {
 }
 
 
-def load_articles(path: Path) -> List[Dict]:
-    articles = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                articles.append(json.loads(line))
-            except Exception:
-                continue
-    return articles
-
-
 def load_json(path: Path):
     return json.load(open(path, "r", encoding="utf-8"))
 
@@ -73,13 +65,13 @@ def save_rels_csv(path: Path, rels: List[Dict]):
             w.writerow([r.get("source", ""), r.get("target", ""), r.get("type", "")])
 
 
-def main():
+def main(max_distance: Optional[int] = None):
     if not (ARTICLES_IN.exists() and NODES_IN.exists() and RELS_IN.exists()):
         print("❌ Thiếu file input (articles/nodes/rels).")
         return
 
     print("Đang tải dữ liệu...")
-    articles = load_articles(ARTICLES_IN)
+    articles = iter_articles(ARTICLES_IN)
     nodes = load_json(NODES_IN)
     rels = load_json(RELS_IN)
 
@@ -91,6 +83,11 @@ def main():
 
     rel_set = build_rel_set(rels)
 
+    # Từ khóa và title được tìm cùng lúc trong một lượt quét mỗi bài
+    keywords = list(PATTERNS)
+    targets = list(title_lookup.items())
+    engine = CooccurrenceEngine(keywords, [tgt_low for tgt_low, _ in targets])
+
     added = 0
     for art in articles:
         src_title = art.get("title", "")
@@ -98,20 +95,19 @@ def main():
         if not src_title or not text:
             continue
         text_low = text.lower()
-        # Với mỗi pattern, nếu keyword và target title cùng xuất hiện, tạo quan hệ
-        for kw, rel_type in PATTERNS.items():
-            if kw not in text_low:
+        # Với mỗi pattern, nếu keyword và target title cùng xuất hiện (trong phạm vi max_distance
+        # ký tự nếu có), tạo quan hệ
+        for kw_idx, tgt_idx, _ in engine.pairs(text_low, max_distance=max_distance):
+            rel_type = PATTERNS[keywords[kw_idx]]
+            tgt_title = targets[tgt_idx][1]
+            if tgt_title == src_title:
+                continue
+            key = (src_title, tgt_title, rel_type)
+            if key in rel_set:
                 continue
-            for tgt_low, tgt_title in title_lookup.items():
-                if tgt_title == src_title:
-                    continue
-                if tgt_low in text_low:
-                    key = (src_title, tgt_title, rel_type)
-                    if key in rel_set:
-                        continue
-                    rel_set.add(key)
-                    rels.append({"source": src_title, "target": tgt_title, "type": rel_type})
-                    added += 1
+            rel_set.add(key)
+            rels.append({"source": src_title, "target": tgt_title, "type": rel_type})
+            added += 1
 
     print(f"Đã thêm {added} cạnh ngữ nghĩa (rule-based).")
     save_rels_json(RELS_OUT, rels)
@@ -122,5 +118,9 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Trích quan hệ rule-based: từ khóa đồng xuất hiện với title.")
+    parser.add_argument("--max-distance", type=int, default=None,
+                        help="Chỉ ghép từ khóa và title cách nhau tối đa N ký tự (mặc định: cả bài như trước)")
+    args = parser.parse_args()
+    main(max_distance=args.max_distance)
 
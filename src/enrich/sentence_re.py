@@ -1,9 +1,15 @@
 import json
-import re
+import sys
+from bisect import bisect_right
+from collections import defaultdict
 from pathlib import Path
-from typing import Dict, List, Set, Tuple
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
-import mwparserfromhell
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.article_jsonl import iter_articles
+from common.parsed_articles import ParsedArticleStore, parsed_or_parse
+from common.sentences import sentence_spans
+from common.title_matcher import TitleMatcher
 
 ROOT_DIR = Path(__file__).resolve().parents[3]
 DATA_DIR = ROOT_DIR / "data" / "processed"
@@ -11,6 +17,8 @@ DATA_DIR = ROOT_DIR / "data" / "processed"
 ARTICLES_IN = DATA_DIR / "articles_raw_wikitext.filtered.jsonl"
 NODES_IN = DATA_DIR / "network_nodes_full.enriched.json"
 RELS_IN = DATA_DIR / "network_relationships_full.enriched.json"
+# Kết quả parse dựng sẵn bởi build_parsed_articles.py (nếu có)
+PARSED_STORE = DATA_DIR / "parsed_articles"
 
 NODES_OUT = DATA_DIR / "network_nodes_full.enriched.json"  # giữ nguyên node
 RELS_OUT = DATA_DIR / "network_relationships_full.enriched.json"  # ghi đè bổ sung
@@ -43,20 +51,6 @@ def classify_relation(sentence: str) -> str:
     return "NHẮC_ĐẾN_CÂU"
 
 
-def load_articles(path: Path) -> List[Dict]:
-    articles = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                articles.append(json.loads(line))
-            except Exception:
-                continue
-    return articles
-
-
 def load_json(path: Path):
     return json.load(open(path, "r", encoding="utf-8"))
 
@@ -83,9 +77,33 @@ def save_rels_csv(path: Path, rels: List[Dict]):
             w.writerow([r.get("source", ""), r.get("target", ""), r.get("type", "")])
 
 
-def split_sentences(text: str) -> List[str]:
-    # đơn giản, đủ dùng cho rule
-    return [s.strip() for s in re.split(r"(?<=[.!?])\s+", text) if s.strip()]
+def build_target_matcher(title_lookup: Dict[str, str]) -> Tuple[TitleMatcher, List[Tuple[str, str]]]:
+    # bỏ qua target quá ngắn/dễ nhiễu
+    targets = [(tgt_low, tgt_title) for tgt_low, tgt_title in title_lookup.items() if len(tgt_low) >= 4]
+    return TitleMatcher([tgt_low for tgt_low, _ in targets], lowercase=True), targets
+
+
+def sentence_candidates(plain_text: str, src_title: str, matcher: TitleMatcher,
+                        targets: List[Tuple[str, str]],
+                        spans: Optional[List[Tuple[int, int]]] = None) -> Iterator[Tuple[str, List[str]]]:
+    """
+    Tìm mention của mọi target trên cả bài một lần, rồi chia vào câu theo vị trí ký tự.
+    Yield (câu, [target title theo thứ tự node]) cho các câu có ít nhất một target.
+    spans: vị trí câu đã tính sẵn (vd. từ parsed store); mặc định tách câu trên plain_text.
+    """
+    if spans is None:
+        spans = sentence_spans(plain_text)
+    starts = [start for start, _ in spans]
+    buckets = defaultdict(set)
+    for start, end, idx in matcher.finditer(plain_text):
+        i = bisect_right(starts, start) - 1
+        # chỉ nhận mention nằm trọn trong một câu
+        if i >= 0 and end <= spans[i][1]:
+            buckets[i].add(idx)
+    for i in sorted(buckets):
+        matched_targets = [targets[idx][1] for idx in sorted(buckets[i]) if targets[idx][1] != src_title]
+        if matched_targets:
+            yield plain_text[spans[i][0]:spans[i][1]], matched_targets
 
 
 def main():
@@ -94,7 +112,7 @@ def main():
         return
 
     print("Đang tải dữ liệu...")
-    articles = load_articles(ARTICLES_IN)
+    articles = iter_articles(ARTICLES_IN)
     nodes = load_json(NODES_IN)
     rels = load_json(RELS_IN)
 
@@ -105,6 +123,10 @@ def main():
             title_lookup[t.lower()] = t
 
     rel_set = build_rel_set(rels)
+    matcher, targets = build_target_matcher(title_lookup)
+    parsed_store = ParsedArticleStore.open_if_current(PARSED_STORE)
+    if parsed_store is not None:
+        print(f"Dùng parsed store '{PARSED_STORE}' ({len(parsed_store)} bài).")
 
     added = 0
     for art in articles:
@@ -113,20 +135,13 @@ def main():
         if not src_title or not wikitext:
             continue
 
-        # Parse wikitext -> plain text and wikilinks
-        wikicode = mwparserfromhell.parse(wikitext)
-        plain_text = wikicode.strip_code()
-        sentences = split_sentences(plain_text)
-
-        # Collect candidate targets by simple string match per sentence
-        for sent in sentences:
-            sent_low = sent.lower()
-            matched_targets = [
-                tgt_title for tgt_low, tgt_title in title_lookup.items()
-                if tgt_title != src_title and tgt_low in sent_low and len(tgt_low) >= 4
-            ]
-            if not matched_targets:
-                continue
+        # Plaintext + vị trí câu: lấy từ parsed store nếu đã dựng, nếu không thì parse ngay
+        parsed = parsed_or_parse(parsed_store, wikitext)
+
+        # Mention của target được tìm một lần trên cả bài rồi chia theo câu;
+        # chỉ phân loại những câu có target
+        for sent, matched_targets in sentence_candidates(parsed.plaintext, src_title, matcher, targets,
+                                                         parsed.sentence_spans):
             rel_type = classify_relation(sent)
             for tgt_title in matched_targets:
                 key = (src_title, tgt_title, rel_type)
@@ -136,6 +151,8 @@ def main():
                 rels.append({"source": src_title, "target": tgt_title, "type": rel_type})
                 added += 1
 
+    if parsed_store is not None:
+        parsed_store.close()
     print(f"Đã thêm {added} cạnh ngữ nghĩa ở mức câu (rule-based).")
     save_rels_json(RELS_OUT, rels)
     save_rels_csv(RELS_CSV_OUT, rels)
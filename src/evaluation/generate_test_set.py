@@ -1,10 +1,16 @@
 import os
 import json
+import sys
 import time
 import re
+from pathlib import Path
+
 import requests
 from tqdm import tqdm
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.llm_cache import get_llm_cache
+
 # --- CẤU HÌNH ---
 
 # ⚠️ DÁN TOÀN BỘ API KEY CỦA BẠN VÀO DANH SÁCH NÀY
@@ -20,6 +26,11 @@ OUTPUT_DATASET_FILE = 'data/processed/evaluation_dataset_yes_no.json'
 NUM_RELATIONS_TO_PROCESS = 10 
 DELAY_BETWEEN_CALLS = 0.5 # Giảm delay vì có nhiều key để backup
 
+GEMINI_MODEL = "gemini-2.0-flash"
+# Đổi khi sửa prompt trong generate_tf_pairs => câu hỏi cũ trong cache LLM không được dùng lại
+TF_PROMPT_VERSION = "1"
+LLM_CACHE_NAMESPACE = "generate_test_set"
+
 # Biến toàn cục theo dõi Key đang dùng
 current_key_index = 0
 
@@ -47,7 +58,7 @@ def call_gemini_direct(prompt):
     """
     Gọi API với cơ chế tự động đổi Key khi gặp lỗi 429.
     """
-    model_name = "gemini-2.0-flash"
+    model_name = GEMINI_MODEL
     
     # Vòng lặp Retry: Nếu lỗi 429 -> Đổi Key -> Thử lại ngay lập tức
     while True:
@@ -88,6 +99,14 @@ def generate_tf_pairs(fact_triple):
     target = fact_triple.get('target', 'B')
     rel_type = fact_triple.get('type', 'LIÊN_KẾT')
     rel_text = rel_type.replace('_', ' ').lower()
+
+    # Dữ kiện đã sinh câu hỏi ở lần chạy trước => dùng lại, không gọi API
+    cache = get_llm_cache()
+    cache_inputs = {"source": source, "target": target, "type": rel_type}
+    if cache is not None:
+        cached = cache.get(LLM_CACHE_NAMESPACE, "gemini", GEMINI_MODEL, TF_PROMPT_VERSION, cache_inputs)
+        if cached is not None:
+            return cached
     
     # Prompt tối giản: Chỉ lấy question và expected_answer
     prompt = f"""
@@ -109,7 +128,8 @@ def generate_tf_pairs(fact_triple):
     """
     
     api_response = call_gemini_direct(prompt)
-    
+    time.sleep(DELAY_BETWEEN_CALLS)
+
     if not api_response:
         return None
 
@@ -123,6 +143,8 @@ def generate_tf_pairs(fact_triple):
         data = json.loads(raw_text)
         
         # Không thêm origin_fact hay explanation nữa
+        if cache is not None:
+            cache.put(LLM_CACHE_NAMESPACE, "gemini", GEMINI_MODEL, TF_PROMPT_VERSION, cache_inputs, data)
         return data
 
     except (json.JSONDecodeError, KeyError, IndexError):
@@ -130,7 +152,10 @@ def generate_tf_pairs(fact_triple):
         try:
              json_match = re.search(r'\[.*\]', raw_text, re.DOTALL)
              if json_match:
-                 return json.loads(json_match.group(0))
+                 data = json.loads(json_match.group(0))
+                 if cache is not None:
+                     cache.put(LLM_CACHE_NAMESPACE, "gemini", GEMINI_MODEL, TF_PROMPT_VERSION, cache_inputs, data)
+                 return data
         except:
             pass
         return None
@@ -154,8 +179,6 @@ def main():
         questions = generate_tf_pairs(rel)
         if questions:
             final_dataset.extend(questions)
-        
-        time.sleep(DELAY_BETWEEN_CALLS)
 
     print(f"\n--- HOÀN TẤT: Đã tạo {len(final_dataset)} câu hỏi ---")
     
@@ -163,6 +186,9 @@ def main():
         json.dump(final_dataset, f, ensure_ascii=False, indent=4)
     
     print(f"✅ File đã lưu tại: {OUTPUT_DATASET_FILE}")
+    cache = get_llm_cache()
+    if cache is not None:
+        cache.print_stats(LLM_CACHE_NAMESPACE)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
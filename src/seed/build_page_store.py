@@ -0,0 +1,84 @@
+"""
+Chuyển dump (XML, .xml.bz2 multistream) hoặc file JSONL wikitext sang page store nhị phân
+(common/page_store.py) để các bước enrich mở bằng mmap thay vì parse lại JSONL.
+
+Ví dụ:
+    # Toàn bộ namespace 0 (kèm trang đổi hướng để tra theo tên cũ)
+    python src/seed/build_page_store.py data/raw/viwiki-latest-pages-articles-multistream.xml.bz2 data/processed/page_store
+
+    # Chỉ các node của mạng, kèm plaintext đã render
+    python src/seed/build_page_store.py data/raw/viwiki-latest-pages-articles.xml data/processed/page_store \\
+        --nodes data/processed/network_nodes_full.filtered.json --plaintext
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Set
+
+import mwparserfromhell
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.page_store import PageStoreWriter
+from common.xml_dump import normalize_title, stream_pages
+
+
+def load_node_titles(nodes_path: Path) -> Set[str]:
+    nodes = json.load(open(nodes_path, "r", encoding="utf-8"))
+    return {normalize_title(n["title"]) for n in nodes if n.get("title")}
+
+
+def iter_jsonl_pages(path: Path) -> Iterator[Dict]:
+    """JSONL của collect_wikitext: mỗi dòng {title, page_id, wikitext, ...}."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            yield {"page_id": obj.get("page_id", 0), "title": obj.get("title", ""), "ns": 0,
+                   "redirect": None, "wikitext": obj.get("wikitext", "")}
+
+
+def iter_source_pages(source: Path, titles: Optional[Set[str]] = None) -> Iterator[Dict]:
+    if source.suffix == ".jsonl":
+        for page in iter_jsonl_pages(source):
+            if titles is None or normalize_title(page["title"]) in titles:
+                yield page
+        return
+    want = (lambda page_id, title: normalize_title(title) in titles) if titles is not None else None
+    yield from stream_pages(source, namespaces=(0,), skip_redirects=False, want=want)
+
+
+def build_page_store(source: Path, store_path: Path, titles: Optional[Set[str]] = None,
+                     with_plaintext: bool = False) -> int:
+    print(f"⚙️ Chuyển '{source}' sang page store '{store_path}'...")
+    writer = PageStoreWriter(store_path)
+    for page in iter_source_pages(source, titles):
+        if with_plaintext and not page.get("redirect"):
+            page["plaintext"] = mwparserfromhell.parse(page["wikitext"]).strip_code().strip()
+        writer.add(page)
+        if writer.count % 100000 == 0:
+            print(f"  > Đã ghi {writer.count} trang...")
+    writer.close()
+    print(f"✅ Đã ghi {writer.count} trang vào '{store_path}'")
+    return writer.count
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Chuyển dump / JSONL wikitext sang page store nhị phân.")
+    parser.add_argument("source", help="Dump .xml, .xml.bz2 hoặc JSONL {title, page_id, wikitext}")
+    parser.add_argument("store", help="Thư mục page store kết quả")
+    parser.add_argument("--nodes", default=None, help="Chỉ giữ các title có trong file node JSON này")
+    parser.add_argument("--plaintext", action="store_true", help="Lưu thêm plaintext (strip_code của wikitext)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    titles = load_node_titles(Path(args.nodes)) if args.nodes else None
+    build_page_store(Path(args.source), Path(args.store), titles=titles, with_plaintext=args.plaintext)
@@ -1,7 +1,12 @@
-import xml.etree.cElementTree as ET
 import mwparserfromhell
 import json
 import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.bz2_dump import MultistreamDumpReader
+from common.xml_dump import stream_pages
 
 # --- ĐÃ CẬP NHẬT THEO YÊU CẦU ---
 # Tập hạt giống: Dictionary chứa tên và Page ID của 13 vị vua triều Nguyễn.
@@ -36,6 +41,46 @@ def extract_infobox_data(wikicode):
             data[key] = value
     return data
 
+def build_seed_record(page_id, title, wikitext):
+    """Phân tích wikitext của một trang hạt giống thành bản ghi {page_id, title, infobox, links}."""
+    wikicode = mwparserfromhell.parse(wikitext)
+    infobox = extract_infobox_data(wikicode)
+    links = [link.title.strip() for link in wikicode.filter_wikilinks()]
+    return {
+        'page_id': page_id,
+        'title': title,
+        'infobox': infobox,
+        'links': links
+    }
+
+def save_seed_data(seed_data, output_path):
+    print(f"\n✅ Hoàn thành! Tìm thấy {len(seed_data)}/{len(NGUYEN_KINGS_PAGES)} nhân vật.")
+
+    # Lưu danh sách ban đầu vào một file JSON mới
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(seed_data, f, indent=4, ensure_ascii=False)
+    
+    print(f"Danh sách hạt giống ban đầu đã được lưu tại: '{output_path}'")
+
+def create_seed_list_from_multistream(dump_path, seed_ids, output_path, index_path=None):
+    """
+    Giống create_seed_list_from_xml nhưng đọc thẳng dump bz2 multistream qua file index:
+    chỉ giải nén các stream chứa page_id cần tìm, không quét cả dump.
+    """
+    print(f"👑 Tra cứu tập hạt giống trong dump multistream '{dump_path}'...")
+    reader = MultistreamDumpReader(dump_path, index_path)
+    seed_data = []
+    for page_id in seed_ids:
+        page = reader.get_page_by_id(page_id)
+        if page is None or not page['wikitext']:
+            print(f"  ⚠️ Không tìm thấy ID {page_id} ({seed_ids[page_id]})")
+            continue
+        print(f"  -> Tìm thấy: {page['title']} (ID: {page_id})")
+        seed_data.append(build_seed_record(page_id, page['title'], page['wikitext']))
+    reader.close()
+    print(f"   (Đã giải nén {reader.streams_decoded} stream)")
+    save_seed_data(seed_data, output_path)
+
 def create_seed_list_from_xml(dump_path, seed_ids, output_path):
     """
     Quét file XML, tìm các bài viết trong tập hạt giống bằng Page ID,
@@ -49,72 +94,40 @@ def create_seed_list_from_xml(dump_path, seed_ids, output_path):
     # Nơi lưu trữ dữ liệu của các vua tìm được
     seed_data = []
     
-    # Mở file XML để đọc
-    with open(dump_path, 'r', encoding='utf-8') as f:
-        # Sử dụng iterparse để đọc XML theo từng phần, tiết kiệm bộ nhớ
-        context = ET.iterparse(f, events=('end',))
+    # Đọc tuần tự bằng expat, bộ nhớ cố định: trang khác namespace 0, trang đổi hướng
+    # và trang không thuộc tập hạt giống bị bỏ qua trước khi nội dung <text> được gom lại
+    pages = stream_pages(dump_path, namespaces=(0,), skip_redirects=True,
+                         want=lambda page_id, title: page_id in target_ids)
+    for page in pages:
+        if not page['wikitext']:
+            continue
+        page_id = page['page_id']
+        title = page['title']
+        print(f"  -> Tìm thấy: {title} (ID: {page_id})")
         
-        for event, elem in context:
-            # Namespace của MediaWiki XML
-            namespace = '{http://www.mediawiki.org/xml/export-0.10/}'
-            
-            # Khi một thẻ <page> kết thúc, chúng ta xử lý nó
-            if elem.tag == f'{namespace}page':
-                id_elem = elem.find(f'{namespace}id')
-                page_id = int(id_elem.text)
-                
-                # Kiểm tra xem page_id có nằm trong tập hạt giống không
-                if page_id in target_ids:
-                    title_elem = elem.find(f'{namespace}title')
-                    text_elem = elem.find(f'{namespace}revision/{namespace}text')
-                    
-                    if title_elem is None or text_elem is None or text_elem.text is None:
-                        elem.clear()
-                        continue
-                        
-                    title = title_elem.text
-                    print(f"  -> Tìm thấy: {title} (ID: {page_id})")
-                    
-                    # Phân tích wikitext
-                    wikicode = mwparserfromhell.parse(text_elem.text)
-                    
-                    # Trích xuất dữ liệu
-                    infobox = extract_infobox_data(wikicode)
-                    links = [link.title.strip() for link in wikicode.filter_wikilinks()]
-                    
-                    # Thêm dữ liệu vào danh sách kết quả
-                    seed_data.append({
-                        'page_id': page_id,
-                        'title': title,
-                        'infobox': infobox,
-                        'links': links
-                    })
-                    
-                    # Xóa ID đã tìm thấy để tăng tốc và dừng sớm
-                    target_ids.remove(page_id)
-                    
-                # Giải phóng bộ nhớ
-                elem.clear()
-                
-                # Nếu đã tìm thấy tất cả, dừng việc đọc file
-                if not target_ids:
-                    print("\n🎉 Đã tìm thấy tất cả các vị vua trong tập hạt giống! Dừng xử lý.")
-                    break
-    
-    print(f"\n✅ Hoàn thành! Tìm thấy {len(seed_data)}/{len(NGUYEN_KINGS_PAGES)} nhân vật.")
-
-    # Lưu danh sách ban đầu vào một file JSON mới
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(seed_data, f, indent=4, ensure_ascii=False)
+        # Phân tích wikitext, trích xuất dữ liệu và thêm vào danh sách kết quả
+        seed_data.append(build_seed_record(page_id, title, page['wikitext']))
+        
+        # Xóa ID đã tìm thấy để tăng tốc và dừng sớm
+        target_ids.remove(page_id)
+        
+        # Nếu đã tìm thấy tất cả, dừng việc đọc file
+        if not target_ids:
+            print("\n🎉 Đã tìm thấy tất cả các vị vua trong tập hạt giống! Dừng xử lý.")
+            break
     
-    print(f"Danh sách hạt giống ban đầu đã được lưu tại: '{output_path}'")
+    save_seed_data(seed_data, output_path)
 
 if __name__ == '__main__':
     XML_DUMP_PATH = '../../data/raw/viwiki-latest-pages-articles.xml'
+    MULTISTREAM_DUMP_PATH = '../../data/raw/viwiki-latest-pages-articles-multistream.xml.bz2'
     OUTPUT_SEED_PATH = '../../data/processed/seed_data_nguyen_kings.json'
     
-    if not os.path.exists(XML_DUMP_PATH):
+    if os.path.exists(MULTISTREAM_DUMP_PATH):
+        # Ưu tiên dump multistream (tra cứu trực tiếp, không cần giải nén toàn bộ)
+        create_seed_list_from_multistream(MULTISTREAM_DUMP_PATH, NGUYEN_KINGS_PAGES, OUTPUT_SEED_PATH)
+    elif not os.path.exists(XML_DUMP_PATH):
         print(f"❌ Lỗi: Không tìm thấy file XML tại '{XML_DUMP_PATH}'.")
-        print("Hãy chắc chắn rằng bạn đã giải nén file dump vào đúng thư mục.")
+        print("Hãy chắc chắn rằng bạn đã giải nén file dump vào đúng thư mục (hoặc đặt bản multistream .bz2).")
     else:
         create_seed_list_from_xml(XML_DUMP_PATH, NGUYEN_KINGS_PAGES, OUTPUT_SEED_PATH)
\ No newline at end of file
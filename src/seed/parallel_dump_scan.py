@@ -0,0 +1,181 @@
+"""
+Quét toàn bộ dump song song trên nhiều tiến trình, ghi kết quả theo shard rồi gộp lại.
+
+- Dump XML đã giải nén: chia file thành các khoảng byte, mỗi ranh giới được dời tới đầu thẻ <page> kế tiếp.
+- Dump bz2 multistream: chia theo ranh giới stream lấy từ file index (mỗi shard = một dãy stream liên tiếp).
+
+Mỗi worker parse các trang trong shard của mình (mwparserfromhell) và ghi ra shard_XXXXX.jsonl;
+cuối cùng các shard được nối theo đúng thứ tự trong file => output ổn định, không phụ thuộc
+tiến trình nào xong trước.
+
+Ví dụ:
+    python src/seed/parallel_dump_scan.py data/raw/viwiki-latest-pages-articles.xml \\
+        data/processed/pages_extracted.jsonl --workers 32
+"""
+
+import argparse
+import bz2
+import json
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.bz2_dump import default_index_path, split_pages
+from common.xml_dump import parse_page_fragment
+from seed.build_seed_file_from_xml import build_seed_record
+
+READ_BLOCK_SIZE = 8 * 1024 * 1024
+SHARDS_PER_WORKER = 4
+
+
+# --- Chia shard ---
+def xml_shards(dump_path: Path, num_shards: int) -> List[Tuple[int, int]]:
+    """Chia dump XML thành các khoảng [start, end) bắt đầu đúng tại một thẻ <page>."""
+    size = dump_path.stat().st_size
+    step = max(size // max(num_shards, 1), 1)
+    boundaries = []
+    with open(dump_path, "rb") as f:
+        for i in range(num_shards):
+            f.seek(i * step)
+            window = f.read(READ_BLOCK_SIZE)
+            pos = window.find(b"<page>")
+            while pos < 0 and window:
+                # Trang rất dài: đọc tiếp tới khi gặp <page>
+                chunk = f.read(READ_BLOCK_SIZE)
+                if not chunk:
+                    break
+                window += chunk
+                pos = window.find(b"<page>")
+            if pos >= 0:
+                boundaries.append(i * step + pos)
+    boundaries = sorted(set(boundaries))
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:] + [size]) if end > start]
+
+
+def multistream_shards(dump_path: Path, index_path: Path, num_shards: int) -> List[List[Tuple[int, int]]]:
+    """Chia dump multistream thành các shard, mỗi shard là danh sách stream (offset, end)."""
+    offsets = set()
+    with bz2.open(index_path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                offsets.add(int(line.split(":", 1)[0]))
+    offsets = sorted(offsets)
+    streams = list(zip(offsets, offsets[1:] + [dump_path.stat().st_size]))
+    per_shard = max(-(-len(streams) // max(num_shards, 1)), 1)
+    return [streams[i:i + per_shard] for i in range(0, len(streams), per_shard)]
+
+
+# --- Worker ---
+def iter_xml_range(dump_path: Path, start: int, end: int):
+    """Yield các đoạn <page>...</page> nằm trong [start, end) của dump XML."""
+    with open(dump_path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        buffer = b""
+        while remaining > 0:
+            chunk = f.read(min(READ_BLOCK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            buffer += chunk
+            last_end = buffer.rfind(b"</page>")
+            if last_end < 0:
+                continue
+            last_end += len(b"</page>")
+            yield from split_pages(buffer[:last_end])
+            buffer = buffer[last_end:]
+
+
+def iter_multistream_range(dump_path: Path, streams: List[Tuple[int, int]]):
+    with open(dump_path, "rb") as f:
+        for start, end in streams:
+            f.seek(start)
+            yield from split_pages(bz2.decompress(f.read(end - start)))
+
+
+def extract_page(fragment: bytes, page_ids: Optional[Set[int]]) -> Optional[Dict]:
+    page = parse_page_fragment(fragment)
+    if page_ids is not None and page["page_id"] not in page_ids:
+        return None
+    if page["ns"] != 0 or page["redirect"] or not page["wikitext"]:
+        return None
+    return build_seed_record(page["page_id"], page["title"], page["wikitext"])
+
+
+def scan_shard(job: Dict) -> Tuple[int, int]:
+    """Chạy trong tiến trình con: parse một shard và ghi ra file JSONL riêng."""
+    dump_path = Path(job["dump_path"])
+    page_ids = set(job["page_ids"]) if job["page_ids"] is not None else None
+    if job["streams"] is not None:
+        fragments = iter_multistream_range(dump_path, job["streams"])
+    else:
+        fragments = iter_xml_range(dump_path, job["start"], job["end"])
+
+    kept = 0
+    with open(job["shard_path"], "w", encoding="utf-8") as out:
+        for fragment in fragments:
+            record = extract_page(fragment, page_ids)
+            if record is None:
+                continue
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            kept += 1
+    return job["shard"], kept
+
+
+# --- Điều phối ---
+def parallel_scan(dump_path: Path, output_path: Path, workers: int = os.cpu_count() or 1,
+                  page_ids: Optional[Set[int]] = None, shard_dir: Optional[Path] = None,
+                  keep_shards: bool = False) -> int:
+    dump_path = Path(dump_path)
+    output_path = Path(output_path)
+    shard_dir = Path(shard_dir) if shard_dir else output_path.with_name(output_path.name + ".shards")
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    num_shards = max(workers * SHARDS_PER_WORKER, 1)
+
+    jobs = []
+    base = {"dump_path": str(dump_path), "page_ids": sorted(page_ids) if page_ids is not None else None}
+    if dump_path.suffix == ".bz2":
+        for i, streams in enumerate(multistream_shards(dump_path, default_index_path(dump_path), num_shards)):
+            jobs.append({**base, "shard": i, "streams": streams, "shard_path": str(shard_dir / f"shard_{i:05d}.jsonl")})
+    else:
+        for i, (start, end) in enumerate(xml_shards(dump_path, num_shards)):
+            jobs.append({**base, "shard": i, "streams": None, "start": start, "end": end,
+                         "shard_path": str(shard_dir / f"shard_{i:05d}.jsonl")})
+
+    print(f"⚙️ Quét '{dump_path}' với {workers} tiến trình, {len(jobs)} shard...")
+    total = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for shard, kept in pool.map(scan_shard, jobs):
+            total += kept
+
+    # Gộp theo thứ tự shard => cùng thứ tự với file dump
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "wb") as out:
+        for job in jobs:
+            with open(job["shard_path"], "rb") as f:
+                shutil.copyfileobj(f, out)
+    if not keep_shards:
+        shutil.rmtree(shard_dir)
+
+    print(f"✅ Đã ghi {total} trang vào '{output_path}'")
+    return total
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Quét dump Wikipedia song song, ghi JSONL {page_id, title, infobox, links}.")
+    parser.add_argument("dump", help="Dump XML đã giải nén hoặc *-multistream.xml.bz2")
+    parser.add_argument("output", help="File JSONL kết quả")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--ids", default=None, help="Chỉ lấy các page_id này (phân tách bởi dấu phẩy)")
+    parser.add_argument("--keep-shards", action="store_true", help="Giữ lại các file shard sau khi gộp")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    ids = {int(x) for x in args.ids.split(",")} if args.ids else None
+    parallel_scan(Path(args.dump), Path(args.output), workers=args.workers, page_ids=ids, keep_shards=args.keep_shards)
@@ -1,8 +1,13 @@
 import json
 import csv
 import os
+import sys
+from pathlib import Path
 from neo4j import GraphDatabase
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.link_resolver import LinkResolver, canonicalize_edges
+
 # --- ⚠️ BƯỚC 1: CẤU HÌNH LOCAL (Thay đổi mật khẩu của bạn) ---
 LOCAL_URI = "neo4j://127.0.0.1:7687"
 LOCAL_USER = "neo4j"
@@ -155,6 +160,13 @@ if __name__ == "__main__":
                     if 'page_id' not in node:
                         node['page_id'] = node.get('title')
 
+                # Đưa source/target của cạnh về đúng title node (hoa thường, '_', anchor...),
+                # nếu không MATCH theo title sẽ bỏ qua cạnh mà không báo
+                resolver = LinkResolver(node.get('title') for node in nodes_list)
+                rels_list, dropped = canonicalize_edges(rels_list, resolver)
+                if dropped:
+                    print(f"   ⚠️ Bỏ {dropped} cạnh có đầu mút không khớp node nào.")
+
                 # Chạy hàm upload
                 upload_graph_to_local(LOCAL_URI, LOCAL_USER, LOCAL_PASSWORD, nodes_list, rels_list)
                 print("\n--- 🎉 HOÀN TẤT! Hãy mở Neo4j Browser để kiểm tra. ---")
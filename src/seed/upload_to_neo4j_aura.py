@@ -1,8 +1,13 @@
 import json
 import os
+import sys
+from pathlib import Path
 from neo4j import GraphDatabase
 from typing import List, Dict
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.link_resolver import LinkResolver, canonicalize_edges
+
 # --- ⚠️ BƯỚC 1: ĐIỀN THÔNG TIN CỦA BẠN VÀO ĐÂY ---
 AURA_URI = "neo4j+s://70915764.databases.neo4j.io"
 AURA_USER = "neo4j"
@@ -114,6 +119,11 @@ if __name__ == "__main__":
                     elif 'infobox' not in node or not isinstance(node['infobox'], str):
                         # Đảm bảo thuộc tính tồn tại và là string
                         node['infobox'] = "{}"
+                # Đưa source/target của cạnh về đúng title node trước khi MATCH theo title
+                resolver = LinkResolver(node.get('title') for node in nodes_list)
+                rels_list, dropped = canonicalize_edges(rels_list, resolver)
+                if dropped:
+                    print(f" > Bỏ {dropped} cạnh có đầu mút không khớp node nào.")
                 print(" > Chuẩn bị dữ liệu hoàn tất.")
                 # --- KẾT THÚC PHẦN SỬA LỖI ---
 